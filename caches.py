@@ -0,0 +1,147 @@
+# ==============================================================================
+# About
+# ==============================================================================
+#
+# caches.py contains caches that sit in front of API requests
+# - LRUCache: a bounded, in-memory cache that evicts the least recently used items
+# - VideoGameCache: a disk-backed cache of {video_id: game_name} with an LRUCache in front of it
+# - a shared LRUCache of IGDB covers {game_id: cover_url} (see get_shared_cover_cache())
+#
+
+# Imports ----------------------------------------------------------------------
+
+import dbm
+import threading
+
+from collections import OrderedDict
+
+
+# ==============================================================================
+# LRUCache
+# ==============================================================================
+
+# thread safe, in-memory cache that holds at most max_size items
+class LRUCache():
+
+    def __init__(self, max_size = 10000):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.items = OrderedDict()
+
+    # returns the cached value, or False if key isn't cached
+    def get(self, key):
+        with self.lock:
+            if (key not in self.items):
+                return False
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while (len(self.items) > self.max_size):
+                self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# ==============================================================================
+# VideoGameCache
+# ==============================================================================
+
+# Once a video is published, the game played in it never changes
+# -> so TwitchAPI.get_game_name_in_video() can check this cache before asking the v5 API
+# - lookups go to the in-memory LRUCache first, then to the dbm file on disk
+# - the dbm file is opened the first time it is needed. If it can't be opened, the cache runs in memory only
+class VideoGameCache():
+
+    def __init__(self, filename, max_in_memory = 100000):
+        self.filename = filename
+        self.memory = LRUCache(max_in_memory)
+        self.lock = threading.Lock()
+        self.disk = False
+        self.disk_failed = False
+
+
+    # returns the open dbm file, or False if we can't use one
+    # -> caller must hold self.lock
+    def __get_disk(self):
+        if ((self.disk == False) and (not self.disk_failed)):
+            try:
+                self.disk = dbm.open(self.filename, 'c')
+            except dbm.error: # <- dbm.error is a tuple that includes OSError
+                print('could not open', self.filename, '; video games will only be cached in memory')
+                self.disk_failed = True
+        return self.disk
+
+
+    # returns the name of the game played in video_id, or False if it isn't cached
+    def get(self, video_id):
+        key = str(video_id)
+        game = self.memory.get(key)
+        if (game != False):
+            return game
+
+        with self.lock:
+            disk = self.__get_disk()
+            if ((disk == False) or (key not in disk)):
+                return False
+            game = disk[key].decode('utf-8')
+
+        self.memory.set(key, game)
+        return game
+
+
+    def set(self, video_id, game_name):
+        key = str(video_id)
+        self.memory.set(key, game_name)
+        with self.lock:
+            disk = self.__get_disk()
+            if (disk != False):
+                disk[key] = game_name.encode('utf-8')
+
+
+    # flushes writes to disk (only some dbm implementations buffer them)
+    def sync(self):
+        with self.lock:
+            if ((self.disk != False) and hasattr(self.disk, 'sync')):
+                self.disk.sync()
+
+    def close(self):
+        with self.lock:
+            if (self.disk != False):
+                self.disk.close()
+                self.disk = False
+
+
+# Shared VideoGameCaches -------------------------------------------------------
+
+_shared_video_game_caches = {}
+_shared_video_game_caches_lock = threading.Lock()
+
+# returns the process-wide VideoGameCache for a file
+# -> most dbm implementations can only be opened once per process, so every Scraper has to share the same instance
+def get_shared_video_game_cache(filename):
+    with _shared_video_game_caches_lock:
+        if (filename not in _shared_video_game_caches):
+            _shared_video_game_caches[filename] = VideoGameCache(filename)
+        return _shared_video_game_caches[filename]
+
+
+# ==============================================================================
+# Cover Cache
+# ==============================================================================
+
+_shared_cover_cache = False
+_shared_cover_cache_lock = threading.Lock()
+
+# returns the process-wide LRUCache of {game_id: cover_url} that IGDBAPI checks before asking IGDB for covers
+# -> games without a cover are cached as "", so we don't keep asking for them
+def get_shared_cover_cache():
+    global _shared_cover_cache
+    with _shared_cover_cache_lock:
+        if (_shared_cover_cache == False):
+            _shared_cover_cache = LRUCache(200000)
+        return _shared_cover_cache
@@ -0,0 +1,432 @@
+# ==============================================================================
+# About
+# ==============================================================================
+#
+# cassettes.py lets the scraper run without talking to the real Twitch and IGDB APIs
+# - Cassette: a JSON file of recorded requests and the responses (with headers) they got back
+# - RecordingTransport: a Transport that records every request it sends into a Cassette
+# - StandInServer: a local HTTP server that replays Cassettes, and can serve made up collections
+#   (ie: livestreams, or IGDB games) with pagination, latency and Twitch style ratelimit headers
+# - StandInTransport: a Transport that sends requests for Twitch and IGDB to a StandInServer instead
+#
+
+# Imports ----------------------------------------------------------------------
+
+import re
+import json
+import time
+import threading
+import requests
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from network import *
+
+
+# Constants --------------------------------------------------------------------
+
+# hosts that a StandInTransport sends to the StandInServer instead
+stand_in_hosts = ['https://api.twitch.tv', 'https://id.twitch.tv', 'https://api-v3.igdb.com']
+
+# these never get written to a cassette
+redacted_params = ['client_id', 'client_secret']
+redacted_response_fields = ['access_token', 'refresh_token']
+
+# response headers worth replaying (the rest are things like Date and Server)
+recorded_headers = ['Content-Type', 'Ratelimit-Limit', 'Ratelimit-Remaining', 'Ratelimit-Reset', 'Retry-After']
+
+
+# ==============================================================================
+# Cassette
+# ==============================================================================
+
+# returns the key that a request is recorded and replayed under: "METHOD /path?sorted&query\nbody"
+# -> query is a list of (key, value) tuples, with secrets already redacted
+def get_interaction_key(method, path, query, body = ''):
+    query = sorted(_redact_query(query))
+    query_string = '&'.join([str(key) + '=' + str(value) for key, value in query])
+    return method.upper() + ' ' + path + '?' + query_string + '\n' + (body if (body) else '')
+
+def _redact_query(query):
+    redacted = []
+    for key, value in query:
+        redacted.append((key, 'REDACTED' if (key in redacted_params) else value))
+    return redacted
+
+
+# A collection of recorded {request -> response} interactions
+# - the same request can be recorded more than once (ie: get_livestreams() on a changing set of livestreams),
+#   in which case the responses are replayed in the order they were recorded
+class Cassette():
+
+    def __init__(self, filename = False):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.next_response = {} # <- {interaction key: index of the next recorded response to replay}
+        if (filename != False):
+            self.load_from_json(filename)
+
+
+    # records a response (from requests) to a request
+    def record(self, method, url, query, body, response):
+        parsed_url = urlsplit(url)
+        content = response.text
+        if ('json' in response.headers.get('Content-Type', '')):
+            content = self.__redact_content(content)
+
+        headers = {}
+        for header in recorded_headers:
+            if (header in response.headers):
+                headers[header] = response.headers[header]
+
+        with self.lock:
+            self.interactions.append({
+                'key': get_interaction_key(method, parsed_url.path, query, body),
+                'url': parsed_url.scheme + '://' + parsed_url.netloc + parsed_url.path,
+                'status': response.status_code,
+                'headers': headers,
+                'body': content
+            })
+
+    def __redact_content(self, content):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return content
+        if (isinstance(data, dict)):
+            for field in redacted_response_fields:
+                if (field in data):
+                    data[field] = 'REDACTED'
+        return json.dumps(data)
+
+
+    # returns the next recorded interaction for a request key, or False if it was never recorded
+    # -> once every recorded response for a key has been replayed, the last one keeps being replayed
+    def replay(self, key):
+        with self.lock:
+            matches = [interaction for interaction in self.interactions if (interaction['key'] == key)]
+            if (len(matches) == 0):
+                return False
+            i = self.next_response.get(key, 0)
+            self.next_response[key] = i + 1
+            return matches[min(i, len(matches) - 1)]
+
+    def __len__(self):
+        return len(self.interactions)
+
+
+    # File I/O -----------------------------------------------------------------
+
+    def export_to_json(self, filename = False):
+        filename = filename if (filename != False) else self.filename
+        with self.lock:
+            with open(filename, 'w') as f:
+                json.dump({'interactions': self.interactions}, f, indent=1)
+
+    def load_from_json(self, filename):
+        try:
+            with open(filename) as f:
+                self.interactions = json.load(f)['interactions']
+        except IOError:
+            print(filename, "does not exist yet")
+
+
+# ==============================================================================
+# RecordingTransport
+# ==============================================================================
+
+# Transport that records every request it sends into self.cassette
+# -> pass it to TwitchAPI / IGDBAPI (or Scraper) and run the scraper as usual, then call .cassette.export_to_json()
+class RecordingTransport(Transport):
+
+    def __init__(self, cassette = False, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette if (cassette != False) else Cassette()
+
+    def request(self, method, url, request_logs = False, **kwargs):
+        r = super().request(method, url, request_logs, **kwargs)
+
+        # let requests encode the params, so the key matches what the server sees
+        prepared_url = requests.Request(method, url, params=kwargs.get('params')).prepare().url
+        query = parse_qsl(urlsplit(prepared_url).query, keep_blank_values=True)
+        body = kwargs.get('data', '')
+        self.cassette.record(method, url, query, body if (isinstance(body, str)) else '', r)
+        return r
+
+
+# ==============================================================================
+# StandInServer
+# ==============================================================================
+
+# Local HTTP server that stands in for Twitch and IGDB
+# - requests are answered from (in order):
+#   1. collections added with .add_collection(), which are filtered and paginated like helix endpoints,
+#      or with .add_igdb_collection(), which answer IGDB queries
+#   2. the cassettes it was given
+#   3. POSTs to /oauth2/token get a made up access token
+#   4. everything else gets a 404 (and is counted in self.misses)
+# - every response waits `latency` seconds and carries Ratelimit-Limit/Remaining/Reset headers.
+#   Once more than requests_per_minute requests have been sent in a minute, it answers with 429s like Twitch does
+# - runs on its own thread; call .start() before use and .stop() afterwards
+class StandInServer():
+
+    def __init__(self, cassettes = False, latency = 0, requests_per_minute = 800):
+        self.cassettes = cassettes if (cassettes != False) else []
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.collections = {}
+        self.lock = threading.Lock()
+        self.counts = {} # <- {path: number of requests}
+        self.misses = []
+        self.ratelimit_tokens = requests_per_minute
+        self.ratelimit_reset = int(time.time()) + 60
+        self.server = False
+
+
+    # serves items (a list of dicts) at path, like a helix endpoint
+    # -> query params that match a field of the items filter them (ie: ?language=en, ?id=1&id=2)
+    # -> 'first' (defaults to page_size) and 'after' paginate them; the cursor is the index of the next item
+    def add_collection(self, path, items, page_size = 20):
+        self.collections[path] = {'items': items, 'page_size': page_size, 'igdb': False}
+
+    # serves items (a list of dicts) at path, like an IGDB endpoint
+    # -> the query in the request body picks the items (see get_igdb_query_results())
+    def add_igdb_collection(self, path, items):
+        self.collections[path] = {'items': items, 'page_size': 10, 'igdb': True}
+
+    # stops serving a collection, so requests to path are answered from cassettes (or get a 404)
+    def remove_collection(self, path):
+        self.collections.pop(path, None)
+
+
+    def start(self):
+        handler = type('StandInRequestHandler', (_StandInRequestHandler,), {'stand_in': self})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if (self.server != False):
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = False
+
+    def get_url(self):
+        return 'http://127.0.0.1:' + str(self.server.server_port)
+
+
+    # returns a tuple (status, headers, body) for a request
+    def respond(self, method, path, query, body):
+        time.sleep(self.latency)
+        with self.lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+        headers = self.__spend_ratelimit_token()
+        if (headers['Ratelimit-Remaining'] == '-1'):
+            headers['Ratelimit-Remaining'] = '0'
+            return 429, headers, json.dumps({'error': 'Too Many Requests', 'status': 429})
+
+        collection = self.collections.get(path, False)
+        if ((collection != False) and collection['igdb']):
+            return 200, headers, json.dumps(get_igdb_query_results(collection['items'], body))
+        if ((method == 'GET') and (collection != False)):
+            return 200, headers, json.dumps(self.__get_page(collection['items'], query, collection['page_size']))
+
+        key = get_interaction_key(method, path, query, body)
+        for cassette in self.cassettes:
+            interaction = cassette.replay(key)
+            if (interaction != False):
+                for header, value in interaction['headers'].items():
+                    headers[header] = value
+                return interaction['status'], headers, interaction['body']
+
+        if ((method == 'POST') and (path == '/oauth2/token')):
+            return 200, headers, json.dumps({'access_token': 'stand-in-token', 'expires_in': 3600, 'token_type': 'bearer'})
+
+        with self.lock:
+            self.misses.append(key)
+        return 404, headers, json.dumps({'error': 'Not Found', 'status': 404, 'message': 'not recorded'})
+
+
+    # returns {'data': [...], 'pagination': {'cursor': str}} for a filtered page of items
+    def __get_page(self, items, query, page_size):
+        filters = {}
+        first, after = page_size, 0
+        for key, value in query:
+            if (key == 'first'):
+                first = int(value)
+            elif (key == 'after'):
+                after = int(value) if (value.isdigit()) else 0
+            else:
+                filters.setdefault(key, []).append(value)
+
+        matches = []
+        for item in items:
+            keep = True
+            for key, values in filters.items():
+                if ((key in item) and (str(item[key]) not in values)):
+                    keep = False
+                    break
+            if (keep):
+                matches.append(item)
+
+        page = {'data': matches[after:after + first], 'pagination': {}}
+        if (after + first < len(matches)):
+            page['pagination']['cursor'] = str(after + first)
+        return page
+
+
+    # returns the ratelimit headers for a request, with Ratelimit-Remaining = '-1' if it is over the limit
+    def __spend_ratelimit_token(self):
+        with self.lock:
+            current_time = time.time()
+            if (current_time >= self.ratelimit_reset):
+                self.ratelimit_tokens = self.requests_per_minute
+                self.ratelimit_reset = int(current_time) + 60
+            self.ratelimit_tokens -= 1
+            return {
+                'Ratelimit-Limit': str(self.requests_per_minute),
+                'Ratelimit-Remaining': str(max(self.ratelimit_tokens, -1)),
+                'Ratelimit-Reset': str(self.ratelimit_reset)
+            }
+
+
+# IGDB Queries -----------------------------------------------------------------
+
+# returns the items that match an IGDB query (ie: 'fields *; sort id asc; limit 500; where id > 500 & updated_at > 0;')
+# -> supports where (terms joined by & and |, with the =, !=, >, >=, <, <= and ~ operators), search, sort, limit and offset
+#    fields is ignored, and every item is returned whole
+# -> like IGDB, returns 10 items if there isn't a limit
+def get_igdb_query_results(items, body):
+    clauses = {}
+    for statement in _split_igdb_query(body, ';'):
+        keyword, _, value = statement.strip().partition(' ')
+        clauses[keyword] = value.strip()
+
+    matches = items
+    if ('where' in clauses):
+        matches = [item for item in matches if (_check_igdb_where(item, clauses['where']))]
+    if ('search' in clauses):
+        term = _parse_igdb_value(clauses['search']).lower()
+        matches = [item for item in matches if (term in str(item.get('name', '')).lower())]
+    if ('sort' in clauses):
+        field, _, order = clauses['sort'].partition(' ')
+        matches = sorted(matches, key=lambda item: item.get(field, 0), reverse=(order.strip() == 'desc'))
+
+    offset = int(clauses.get('offset', 0))
+    limit = int(clauses.get('limit', 10))
+    return matches[offset:offset + limit]
+
+# returns True if item matches a where clause: OR groups (|) of AND terms (&)
+def _check_igdb_where(item, where):
+    for group in _split_igdb_query(where, '|'):
+        matched = True
+        for term in _split_igdb_query(group, '&'):
+            if (not _check_igdb_term(item, term)):
+                matched = False
+                break
+        if (matched):
+            return True
+    return False
+
+def _check_igdb_term(item, term):
+    match = re.match(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$', term)
+    if ((match == None) or (match.group(1) not in item)):
+        return False
+    field_value, operator, value = item[match.group(1)], match.group(2), _parse_igdb_value(match.group(3))
+    if (operator == '~'):
+        return str(field_value).lower() == str(value).lower()
+    if (isinstance(value, list)):
+        return (field_value in value) == (operator == '=')
+    if (operator == '='):
+        return field_value == value
+    if (operator == '!='):
+        return field_value != value
+    if (operator == '>'):
+        return field_value > value
+    if (operator == '>='):
+        return field_value >= value
+    if (operator == '<'):
+        return field_value < value
+    return field_value <= value
+
+# returns a value from a query: "a string" (with \" escapes), (a, list, of, values), or a number
+def _parse_igdb_value(value):
+    value = value.strip()
+    if (value.startswith('"') and value.endswith('"')):
+        return value[1:-1].replace('\\"', '"')
+    if (value.startswith('(') and value.endswith(')')):
+        return [_parse_igdb_value(v) for v in _split_igdb_query(value[1:-1], ',')]
+    return float(value) if ('.' in value) else int(value)
+
+# splits a query on separator, ignoring separators inside of "strings"
+def _split_igdb_query(query, separator):
+    parts, current, in_string, i = [], '', False, 0
+    while (i < len(query)):
+        char = query[i]
+        if (in_string and (char == '\\') and (i + 1 < len(query))):
+            current += query[i:i + 2]
+            i += 2
+            continue
+        if (char == '"'):
+            in_string = not in_string
+        if ((char == separator) and (not in_string)):
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+        i += 1
+    parts.append(current)
+    return [part for part in parts if (part.strip() != '')]
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # <- keep-alive, so Transport's connection pooling behaves like it does against Twitch
+    stand_in = False
+
+    def do_GET(self):
+        self.__respond('GET')
+
+    def do_POST(self):
+        self.__respond('POST')
+
+    def __respond(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8') if (length > 0) else ''
+        query = parse_qsl(url.query, keep_blank_values=True)
+
+        status, headers, content = self.stand_in.respond(method, url.path, query, body)
+        content = content.encode('utf-8')
+        self.send_response(status)
+        headers.setdefault('Content-Type', 'application/json')
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        return
+
+
+# ==============================================================================
+# StandInTransport
+# ==============================================================================
+
+# Transport that sends every request for Twitch or IGDB to a StandInServer
+# -> pass it to Scraper / TwitchAPI / IGDBAPI to run them against a StandInServer
+class StandInTransport(Transport):
+
+    def __init__(self, stand_in_server, **kwargs):
+        super().__init__(**kwargs)
+        self.stand_in_server = stand_in_server
+
+    def request(self, method, url, request_logs = False, **kwargs):
+        for host in stand_in_hosts:
+            if (url.startswith(host)):
+                url = self.stand_in_server.get_url() + url[len(host):]
+                break
+        return super().request(method, url, request_logs, **kwargs)
@@ -5,12 +5,30 @@
 # games.py contains the Game and Games classes
 # - A Game is an object that contains info about a game
 # - Games is a collection of Game objects and is responsible for bulk operations like importing/exporting to/from CSV
+# - TwitchToIGDB maps Twitch game ids and game names to IGDB game ids (twitch_to_igdb.csv)
 
 # Imports ----------------------------------------------------------------------
 
+import os
+import re
 import sys
 import csv
 import json
+import unicodedata
+
+# Constants --------------------------------------------------------------------
+
+# Twitch names often carry these, IGDB names usually don't
+trademark_symbols = ['™', '®', '©']
+
+# tokens that say nothing about which game a name is for
+name_stop_tokens = ['the', 'a', 'an', 'of', 'and']
+
+# a name only matches a game by tokens if the two share at least this fraction of their tokens
+min_token_match_score = 0.75
+
+# tokens shared by more games than this aren't used to find candidates (ie: '2', 'edition')
+max_games_per_token = 1000
 
 # ==============================================================================
 # Game Class
@@ -113,6 +131,11 @@ class Games():
         if (game_id not in self.games):
             self.games[game_id] = Game(igdb_game_obj)
 
+    # adds a Game, replacing the existing Game with that id (ie: when IGDB has updated it)
+    def add_or_update_game(self, igdb_game_obj):
+        game = Game(igdb_game_obj)
+        self.games[game.id] = game
+
 
     # Get ----------------------------------------------------------------------
 
@@ -136,12 +159,15 @@ class Games():
             'age_ratings', 'category', 'igdb_box_art_url', 'twitch_box_art_url'
         ]
 
+        # write to a temporary file and rename it, so an interrupted export never leaves a half written games.csv
         filename = filename if ('.csv' in filename) else filename + '.csv'
-        with open(filename, 'w') as csvfile:
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             for game_id, game in self.games.items():
                 writer.writerow(game.to_dict())
+        os.replace(tmp_filename, filename)
 
 
     def load_from_csv(self, filename):
@@ -192,3 +218,203 @@ class Games():
                     return False
 
         return True
+
+
+# ==============================================================================
+# Twitch To IGDB
+# ==============================================================================
+
+# returns a name in the form that Twitch and IGDB names are compared in
+# -> casefolded, without trademark symbols or punctuation: "Pokémon™: Let's Go!" -> "pokemon lets go"
+# -> letters and digits from every script are kept ("原神" -> "原神"), but accents are only taken off latin letters, since
+#    the marks on other scripts (ie: Japanese dakuten) change which letter it is
+# -> names without any letters or digits normalize to '', which is never used as a key
+def normalize_game_name(name):
+    name = unicodedata.normalize('NFKD', strip_trademark_symbols(name))
+    name = unicodedata.normalize('NFKC', strip_latin_accents(name)).casefold()
+    name = name.replace('&', ' and ').replace("'", '')
+    return ' '.join(re.split(r'[\W_]+', name)).strip()
+
+# takes the combining marks (accents) off of latin letters in an NFKD normalized string
+def strip_latin_accents(name):
+    characters, base = [], ''
+    for character in name:
+        if (not unicodedata.combining(character)):
+            base = character
+        elif (base.isascii() and base.isalpha()):
+            continue
+        characters.append(character)
+    return ''.join(characters)
+
+def strip_trademark_symbols(name):
+    for symbol in trademark_symbols:
+        name = str(name).replace(symbol, '')
+    return name.strip()
+
+def get_game_name_tokens(name):
+    return set([token for token in normalize_game_name(name).split() if (token not in name_stop_tokens)])
+
+
+# Lookup table that maps {twitch_id: igdb_id} and {twitch_name: igdb_id}
+# - stream_history keys livestreams by Twitch game_id and videos by Twitch game name, so this is how both are joined to Games
+# - names are resolved locally first, against indexes over a Games collection:
+#   1. the normalized name of every game
+#   2. the tokens in every game's name, for names that are worded a little differently
+#      -> ie: "The Witcher 3 - Wild Hunt" matches "Witcher 3: Wild Hunt", but "Grand Theft Auto V" won't match "Grand Theft Auto 5"
+# - names that can't be resolved locally are left for IGDBAPI.search_for_games_by_names(), see Scraper.resolve_games_to_igdb()
+# - names that IGDB couldn't resolve either are stored with igdb_id 0, so we don't keep searching for them
+class TwitchToIGDB():
+
+    def __init__(self, games = False, filename = False):
+        self.twitch_ids   = {} # <- {twitch_id: {'name': twitch_name, 'igdb_id': int}}
+        self.twitch_names = {} # <- {normalized twitch_name: igdb_id}
+        self.names        = {} # <- {normalized IGDB name: igdb_id}
+        self.tokens       = {} # <- {token: [igdb_id, ...]}
+        self.name_tokens  = {} # <- {igdb_id: set of tokens}
+        self.games        = {} # <- {igdb_id: Game}, only the games that have been indexed
+        if (games != False):
+            self.add_games(games)
+        if (filename != False):
+            self.load_from_csv(filename)
+
+
+    # Indexes ------------------------------------------------------------------
+
+    # adds every Game in a Games collection to the name and token indexes
+    def add_games(self, games):
+        for game_id in games.get_ids():
+            self.add_game(games.get(game_id))
+
+    def add_game(self, game):
+        self.games[game.id] = game
+        name = normalize_game_name(game.name)
+        if (name == ''):
+            return
+
+        # when games share a name, prefer main games (category 0), then the more popular one
+        if ((name not in self.names) or self.__is_better_match(game, self.games[self.names[name]])):
+            self.names[name] = game.id
+
+        if (game.id not in self.name_tokens):
+            tokens = get_game_name_tokens(game.name)
+            self.name_tokens[game.id] = tokens
+            for token in tokens:
+                self.tokens.setdefault(token, []).append(game.id)
+
+    def __is_better_match(self, game, other):
+        if ((game.category == 0) != (other.category == 0)):
+            return game.category == 0
+        return game.popularity > other.popularity
+
+
+    # returns the igdb_id of the game with the closest name, or False if no game is close enough
+    def __match_tokens(self, name):
+        tokens = get_game_name_tokens(name)
+        candidates = set()
+        for token in tokens:
+            if ((token in self.tokens) and (len(self.tokens[token]) <= max_games_per_token)):
+                candidates.update(self.tokens[token])
+
+        best_id, best_score = False, 0
+        for game_id in candidates:
+            game_tokens = self.name_tokens[game_id]
+            score = len(tokens & game_tokens) / len(tokens | game_tokens)
+            if ((score > best_score) or ((score == best_score) and (best_id != False) and self.__is_better_match(self.games[game_id], self.games[best_id]))):
+                best_id, best_score = game_id, score
+        return best_id if (best_score >= min_token_match_score) else False
+
+
+    # Resolving ----------------------------------------------------------------
+
+    # returns the igdb_id for a Twitch game name, or False if it can't be resolved
+    def resolve_name(self, twitch_name):
+        name = normalize_game_name(twitch_name)
+        if (name == ''):
+            return False
+        if (self.twitch_names.get(name, 0) != 0):
+            return self.twitch_names[name]
+
+        igdb_id = self.names[name] if (name in self.names) else self.__match_tokens(twitch_name)
+        if (igdb_id != False):
+            self.twitch_names[name] = igdb_id
+        return igdb_id
+
+    # returns the igdb_id for a Twitch game id, or False if it isn't known or can't be resolved
+    def resolve_twitch_id(self, twitch_id):
+        twitch_id = int(twitch_id)
+        if (twitch_id not in self.twitch_ids):
+            return False
+        if (self.twitch_ids[twitch_id]['igdb_id'] == 0):
+            igdb_id = self.resolve_name(self.twitch_ids[twitch_id]['name'])
+            self.twitch_ids[twitch_id]['igdb_id'] = igdb_id if (igdb_id != False) else 0
+        return self.twitch_ids[twitch_id]['igdb_id'] if (self.twitch_ids[twitch_id]['igdb_id'] != 0) else False
+
+    # resolves a stream_history key (int Twitch game id for livestreams, game name for videos)
+    def resolve(self, game_key):
+        if (isinstance(game_key, int)):
+            return self.resolve_twitch_id(game_key)
+        return self.resolve_name(game_key)
+
+
+    # records the name of a Twitch game id (from TwitchAPI.get_games())
+    def add_twitch_game(self, twitch_id, twitch_name):
+        igdb_id = self.resolve_name(twitch_name)
+        self.twitch_ids[int(twitch_id)] = {'name': twitch_name, 'igdb_id': igdb_id if (igdb_id != False) else 0}
+
+    # records the result of searching IGDB for a name (igdb_id=0 if nothing was found)
+    def add_resolved_name(self, twitch_name, igdb_id):
+        name = normalize_game_name(twitch_name)
+        if (name == ''):
+            return
+        self.twitch_names[name] = igdb_id
+        for twitch_id, obj in self.twitch_ids.items():
+            if ((obj['igdb_id'] == 0) and (normalize_game_name(obj['name']) == name)):
+                obj['igdb_id'] = igdb_id
+
+
+    # returns the Twitch game ids (out of twitch_ids) whose names we don't know yet
+    def get_unknown_twitch_ids(self, twitch_ids):
+        return [twitch_id for twitch_id in twitch_ids if (int(twitch_id) not in self.twitch_ids)]
+
+    # returns the names (out of twitch_names, and the names of known Twitch game ids) that can't be resolved locally
+    # and haven't been searched for on IGDB yet (those are in self.twitch_names with igdb_id 0)
+    def get_unresolved_names(self, twitch_names = []):
+        unresolved = {} # <- {normalized name: name}, so each name is only searched for once
+        for twitch_name in list(twitch_names) + [obj['name'] for obj in self.twitch_ids.values()]:
+            name = normalize_game_name(twitch_name)
+            if ((name != '') and (self.resolve_name(twitch_name) == False) and (name not in self.twitch_names)):
+                unresolved.setdefault(name, twitch_name)
+        return list(unresolved.values())
+
+
+    def __len__(self):
+        return len(self.twitch_ids) + len(self.twitch_names)
+
+
+    # File I/O -----------------------------------------------------------------
+
+    # rows with a twitch_id are Twitch games, rows without one are names from videos
+    def export_to_csv(self, filename):
+        filename = filename if ('.csv' in filename) else filename + '.csv'
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['twitch_id', 'twitch_name', 'igdb_id'])
+            writer.writeheader()
+            for twitch_id, obj in self.twitch_ids.items():
+                writer.writerow({'twitch_id': twitch_id, 'twitch_name': obj['name'], 'igdb_id': obj['igdb_id']})
+            for name, igdb_id in self.twitch_names.items():
+                writer.writerow({'twitch_id': '', 'twitch_name': name, 'igdb_id': igdb_id})
+        os.replace(tmp_filename, filename)
+
+    def load_from_csv(self, filename):
+        filename = filename if ('.csv' in filename) else filename + '.csv'
+        try:
+            with open(filename) as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    if (row['twitch_id'] != ''):
+                        self.twitch_ids[int(row['twitch_id'])] = {'name': row['twitch_name'], 'igdb_id': int(row['igdb_id'])}
+                    elif (normalize_game_name(row['twitch_name']) != ''):
+                        self.twitch_names[normalize_game_name(row['twitch_name'])] = int(row['igdb_id'])
+        except IOError:
+            print(filename, "does not exist yet")
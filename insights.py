@@ -36,6 +36,7 @@ class Insights():
             self.mode = False
             self.streamers = False
             self.games = False
+            self.twitch_to_igdb = False
             self.streamerLogs = False
         self.logging_mode = False
         return
@@ -46,16 +47,19 @@ class Insights():
             self.mode = 'cli'
             self.streamers = Streamers('./data/streamers', './data/streamers_missing_videos.csv')
             self.games = Games('./data/games.csv')
+            self.twitch_to_igdb = TwitchToIGDB(self.games, './data/twitch_to_igdb.csv')
             self.streamerslogs = GeneralLogs('./logs/streamer_insights[' + month + '].csv')
         elif (mode == 'testing'):
             self.mode = 'testing'
             self.streamers = Streamers('./test/streamers')
             self.games = Games('./test/games.csv')
+            self.twitch_to_igdb = TwitchToIGDB(self.games, './test/twitch_to_igdb.csv')
             self.streamerslogs = GeneralLogs('./test/streamer_insights[' + month + '].csv')
         elif (mode == 'production'):
             self.mode = 'production'
             self.streamers = False
             self.games = False
+            self.twitch_to_igdb = False
             self.streamerslogs = GeneralLogs('./logs/streamer_insights[' + month + '].csv')
 
     def reload_data(self):
@@ -72,6 +76,8 @@ class Insights():
             self.streamers = data_obj
         elif (type == 'games'):
             self.games = data_obj
+        elif (type == 'twitch_to_igdb'):
+            self.twitch_to_igdb = data_obj
         elif (type == 'streamerslogs'):
             self.streamerslogs = data_obj
 
@@ -193,6 +199,21 @@ class Insights():
 
 
 
+    # returns {igdb_id: {'livestreams': int, 'videos': int}} for the games a streamer has played
+    # -> joins stream_history to Games through self.twitch_to_igdb, so games that haven't been resolved are left out
+    #    (see Scraper.resolve_games_to_igdb())
+    def get_igdb_games_played(self, streamer_id):
+        games_played = {}
+        streamer = self.streamers.get(streamer_id)
+        for game_key in streamer.stream_history:
+            igdb_id = self.twitch_to_igdb.resolve(game_key)
+            if (igdb_id != False):
+                stream_type = 'livestreams' if (isinstance(game_key, int)) else 'videos'
+                games_played.setdefault(igdb_id, {'livestreams': 0, 'videos': 0})
+                games_played[igdb_id][stream_type] += len(streamer.stream_history[game_key]['dates'])
+        return games_played
+
+
     # gets data about Streamer.stream_history values
     # - min, max, mean, median, std_dev number of livestreams a streamer has.
     # - min, max, mean, median, std_dev number of videos a streamer has. (of those with videos)
@@ -451,15 +472,8 @@ class Insights():
     # -> filesizes are in bytes
     def get_filesizes_for_streamers(self):
 
-        # extract filesizes from zip file
-        i = 1
-        filesizes_uncompressed = []
-        filesizes_compressed = []
-        with ZipFile('./data/streamers/streamers.zip') as zip_file:
-            for filename in zip_file.namelist():
-                fileinfo = zip_file.getinfo(filename)
-                filesizes_uncompressed.append(fileinfo.file_size)
-                filesizes_compressed.append(fileinfo.compress_size)
+        # extract filesizes from the streamers shards (or the zip file they used to be stored in)
+        filesizes_uncompressed, filesizes_compressed = get_streamers_filesizes('./data/streamers')
 
         # get most stats
         stats_uncompressed = self.calc_stats_from_list_of_ints(filesizes_uncompressed)
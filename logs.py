@@ -11,9 +11,11 @@
 
 import sys
 import csv
+import ast
 import time
 import math
 import datetime
+import threading
 
 # ==============================================================================
 # TimeLogs
@@ -21,11 +23,14 @@ import datetime
 
 # class is used to record timing and number of different actions (ie: API requests)
 # - It is imported by TwitchAPI
+# - It is thread safe, so concurrent requests can log to the same instance
 # NOTE: all times are in milliseconds
 class TimeLogs():
 
     def __init__(self, action_categories):
+        self.lock = threading.RLock()
         self.logs = {} # { request_name: [ {request_obj}, ... ] }
+        self.counters = {} # { counter_name: int } -> tallies of events that aren't timed (ie: reused connections)
         self.action_categories = action_categories
         for type in action_categories:
             self.logs[type] = []
@@ -36,13 +41,15 @@ class TimeLogs():
     # returns a copy of this TimeLogs instance
     def clone(self):
         cloned = TimeLogs(self.action_categories)
-        cloned.time_initialized = self.time_initialized
-        cloned.items_processed = self.items_processed
-        cloned.logs = {}
-        for category in self.logs:
-            cloned.logs[category] = []
-            for row in self.logs[category]:
-                cloned.logs[category].append(self.__clone_dict(row))
+        with self.lock:
+            cloned.time_initialized = self.time_initialized
+            cloned.items_processed = self.items_processed
+            cloned.counters = self.__clone_dict(self.counters)
+            cloned.logs = {}
+            for category in self.logs:
+                cloned.logs[category] = []
+                for row in self.logs[category]:
+                    cloned.logs[category].append(self.__clone_dict(row))
         return cloned
 
     def __clone_dict(self, d):
@@ -53,42 +60,44 @@ class TimeLogs():
 
     # resets TimeLogs object
     def reset(self):
-        self.logs = {}
-        for type in self.action_categories:
-            self.logs[type] = []
-        self.time_initialized = self.__get_current_time()
-        self.items_processed = 0
+        with self.lock:
+            self.logs = {}
+            for type in self.action_categories:
+                self.logs[type] = []
+            self.counters = {}
+            self.time_initialized = self.__get_current_time()
+            self.items_processed = 0
 
     # Actions ------------------------------------------------------------------
 
+    # records the start of an action and returns its entry
+    # -> actions can overlap (ie: concurrent requests), so pass the returned entry to .end_action() to close the right one
     def start_action(self, action_type):
+        action = {'start': self.__get_current_time(), 'end': 0}
+        with self.lock:
 
-        # case 0: this action type DNE and needs to be registered
-        if (action_type not in self.logs):
-            self.logs[action_type] = [ {'start': self.__get_current_time(), 'end': 0} ]
-            return
-
-        # case 1: there are no actions on record
-        if (len(self.logs[action_type]) == 0):
-            self.logs[action_type].append({'start': self.__get_current_time(), 'end': 0})
-            return
+            # this action type DNE and needs to be registered
+            if (action_type not in self.logs):
+                self.logs[action_type] = []
+            self.logs[action_type].append(action)
+        return action
 
-        # case 2: the latest action is already finished so we can register a new one
-        # -> note: if the current action is not finished yet, we can't do anything
-        current_action = self.logs[action_type][-1]
-        if (current_action['end'] > 0):
-            self.logs[action_type].append({'start': self.__get_current_time(), 'end': 0})
-            return
 
+    # closes the given action entry
+    # -> if no entry is given, closes the latest action of action_type if it hasn't been closed yet
+    def end_action(self, action_type, action = False):
+        with self.lock:
+            if (action != False):
+                if (action['end'] == 0):
+                    action['end'] = self.__get_current_time()
+                return
 
-    def end_action(self, action_type):
+            if ((action_type not in self.logs) or (len(self.logs[action_type]) == 0)):
+                return
 
-        if ((action_type not in self.logs) or (len(self.logs[action_type]) == 0)):
-            return
-
-        last_index = len(self.logs[action_type]) - 1
-        if (self.logs[action_type][last_index]['end'] == 0):
-            self.logs[action_type][last_index]['end'] = self.__get_current_time()
+            last_index = len(self.logs[action_type]) - 1
+            if (self.logs[action_type][last_index]['end'] == 0):
+                self.logs[action_type][last_index]['end'] = self.__get_current_time()
 
 
     def get_time_since_start(self):
@@ -103,6 +112,20 @@ class TimeLogs():
     def set_number_of_items(self, num):
         self.items_processed = num
 
+    # Counters -----------------------------------------------------------------
+
+    # adds amount to a named counter, creating the counter if it doesn't exist yet
+    def increment_counter(self, name, amount = 1):
+        with self.lock:
+            if (name not in self.counters):
+                self.counters[name] = 0
+            self.counters[name] += amount
+
+    def get_counter(self, name):
+        if (name in self.counters):
+            return self.counters[name]
+        return 0
+
     # Stats --------------------------------------------------------------------
 
     def print_stats(self):
@@ -115,14 +138,17 @@ class TimeLogs():
                 print(" - std_dev: ", stats['std_dev'], "ms")
                 print(" - min: ", stats['min'], "ms")
                 print(" - max: ", stats['max'], "ms")
+        for name, count in self.counters.items():
+            print("Counter: ", name, "=", count)
         print("Total Time: ", self.get_time_since_start(), "ms")
 
     # gets stats about each request in logs
     def get_stats_from_logs(self):
         stats = {}
-        for action_category, actions in self.logs.items():
-            if (len(actions) > 0):
-                stats[action_category] = self.__calc_stats_about_action(actions)
+        with self.lock:
+            for action_category, actions in self.logs.items():
+                if (len(actions) > 0):
+                    stats[action_category] = self.__calc_stats_about_action(actions)
         return stats
 
     def __calc_stats_about_action(self, actions):
@@ -147,6 +173,9 @@ class TimeLogs():
                 last_end = action['end'] if ((last_end == False) or (action['end'] > last_end)) else last_end
 
         # calc mean
+        # -> actions that are still in flight (ie: concurrent requests) have no end time yet
+        if (len(times) == 0):
+            return {'n': len(actions), 'min': 0, 'max': 0, 'mean': 0, 'std_dev': 0, 'first_start': 0, 'last_end': 0}
         for t in times:
             mean += t
         mean = mean / len(times)
@@ -186,11 +215,12 @@ class TimeLogs():
             'time_ended': self.__get_current_time(),
             'content_type': content_type,
             'logs': self.get_stats_from_logs(),
+            'counters': self.counters,
             'num_items': num_items
         })
 
         # write file
-        fieldnames = ['time_started', 'time_ended', 'content_type', 'num_items', 'logs']
+        fieldnames = ['time_started', 'time_ended', 'content_type', 'num_items', 'logs', 'counters']
         filename = filename if ('.csv' in filename) else filename + '.csv'
         with open(filename, 'w') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -235,21 +265,40 @@ class FilterLogs():
         self.month = datetime.datetime.now().strftime("%Y-%m")
 
 
-    def add_filter(self, num_scraped, num_filtered, view_cutoff, breakdown_obj):
+    # if estimated=True, the pass stopped paging at the view cutoff and the breakdown below the cutoff is an estimate
+    def add_filter(self, num_scraped, num_filtered, view_cutoff, breakdown_obj, estimated = False):
         self.content.append({
             'time': int(time.time()),
             'scraped': num_scraped,
             'filtered': num_filtered,
             'view_cutoff': view_cutoff,
-            'breakdown': breakdown_obj
+            'breakdown': breakdown_obj,
+            'estimated': estimated
         })
 
+    # returns the breakdown from the latest filter that paged through every livestream, or False if there isn't one
+    # -> rows loaded from CSV store the breakdown as a string, so it is parsed back into {views: num_livestreams}
+    def get_latest_full_breakdown(self):
+        for row in reversed(self.content):
+            if ((row.get('estimated') == True) or (row.get('estimated') == 'True')):
+                continue
+
+            breakdown = row['breakdown']
+            if (isinstance(breakdown, str)):
+                try:
+                    breakdown = ast.literal_eval(breakdown)
+                except (ValueError, SyntaxError):
+                    continue
+            if (isinstance(breakdown, dict)):
+                return breakdown
+        return False
+
     def export_to_csv(self, filename = False):
 
         if (filename == False and self.filename == False):
             return
 
-        fieldnames = ['time', 'scraped', 'filtered', 'view_cutoff', 'breakdown']
+        fieldnames = ['time', 'scraped', 'filtered', 'view_cutoff', 'breakdown', 'estimated']
         filename = filename if (filename != False) else self.filename
         filename = filename if ('.csv' in filename) else filename + '.csv'
         with open(self.filename, 'w') as csvfile:
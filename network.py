@@ -0,0 +1,555 @@
+# ==============================================================================
+# About
+# ==============================================================================
+#
+# network.py contains the classes that sit between the API classes in scraper.py and the network
+# - Transport: a connection-pooled HTTP session that TwitchAPI and IGDBAPI share
+#   (and the thread pools they send concurrent requests on, see get_shared_executor())
+# - RateLimiter: a token bucket that keeps every thread in the process under an API's request budget
+# - TokenStore: an on-disk cache of OAuth access tokens that every thread and process shares
+# - RetryPolicy + CircuitBreaker: retry failed requests with backoff, and stop sending to an endpoint that keeps failing
+#
+
+# Imports ----------------------------------------------------------------------
+
+import os
+import json
+import time
+import random
+import threading
+import requests
+import email.utils
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl # <- only available on unix; without it TokenStore only locks between threads
+except ImportError:
+    fcntl = False
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# Constants --------------------------------------------------------------------
+
+# max number of keep-alive connections held open for each host
+# -> requests picks the longest matching prefix, so the 'https://' and 'http://' entries act as the default for any other host
+default_pool_sizes = {
+    'https://api.twitch.tv/': 16,    # <- helix + v5 API, this is where almost all of our requests go
+    'https://id.twitch.tv/': 1,      # <- OAuth, only hit when we need a new access token
+    'https://api-v3.igdb.com/': 4,
+    'https://': 4,
+    'http://': 4
+}
+
+default_timeout = (5, 30) # <- (seconds to open a connection, seconds to wait between bytes of the response)
+
+# responses with these status codes are worth sending again
+# -> 429 = too many requests, 5XX = Twitch/IGDB had a problem on their end
+retryable_status_codes = [429, 500, 502, 503, 504]
+
+default_token_store_filename = './tokens.json' # <- holds access tokens, so it should never be committed
+default_token_refresh_margin = 300             # <- seconds before a token expires that we start asking for a new one
+
+
+# ==============================================================================
+# Connection Counting
+# ==============================================================================
+
+# urllib3 opens new connections from inside the thread that made the request
+# -> so a thread local lets each request find out if it had to open a connection or if it reused one from the pool
+_connection_events = threading.local()
+
+def _count_new_connection():
+    _connection_events.opened = getattr(_connection_events, 'opened', 0) + 1
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+# HTTPAdapter whose connection pools report every new connection they open
+class CountingHTTPAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
+
+
+# ==============================================================================
+# Transport
+# ==============================================================================
+
+# Wraps a requests.Session so every API request reuses keep-alive connections instead of doing a new TCP + TLS handshake
+# - requests.Session and urllib3's pools are thread safe, so one Transport can be shared by every scraper thread
+# - each response gets an .opened_connection attribute that is True if the request had to open a new connection
+class Transport():
+
+    def __init__(self, pool_sizes = False, timeout = default_timeout):
+        self.pool_sizes = pool_sizes if (pool_sizes != False) else default_pool_sizes
+        self.timeout = timeout
+        self.session = requests.Session()
+        for url_prefix, pool_size in self.pool_sizes.items():
+            self.session.mount(url_prefix, CountingHTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+        # lifetime totals across every thread that uses this Transport
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_connections_opened = 0
+
+
+    # sends a request and returns the response
+    # -> if request_logs (a TimeLogs instance) is given, the request is counted as 'connections_opened' or 'connections_reused'
+    def request(self, method, url, request_logs = False, **kwargs):
+        if ('timeout' not in kwargs):
+            kwargs['timeout'] = self.timeout
+
+        _connection_events.opened = 0
+        r = self.session.request(method, url, **kwargs)
+        r.opened_connection = (_connection_events.opened > 0)
+
+        with self.lock:
+            self.num_requests += 1
+            self.num_connections_opened += _connection_events.opened
+
+        if (request_logs != False):
+            request_logs.increment_counter('connections_opened' if (r.opened_connection) else 'connections_reused')
+        return r
+
+    def get(self, url, request_logs = False, **kwargs):
+        return self.request('GET', url, request_logs, **kwargs)
+
+    def post(self, url, request_logs = False, **kwargs):
+        return self.request('POST', url, request_logs, **kwargs)
+
+
+    # returns {'requests': int, 'connections_opened': int, 'connections_reused': int} over the lifetime of this Transport
+    def get_stats(self):
+        with self.lock:
+            return {
+                'requests': self.num_requests,
+                'connections_opened': self.num_connections_opened,
+                'connections_reused': self.num_requests - self.num_connections_opened
+            }
+
+    def close(self):
+        self.session.close()
+
+
+# Shared Transport -------------------------------------------------------------
+
+_shared_transport = False
+_shared_transport_lock = threading.Lock()
+
+# returns the process-wide Transport, creating it the first time it is asked for
+# -> every TwitchAPI and IGDBAPI uses this by default, so all scraper threads draw from the same connection pools
+def get_shared_transport():
+    global _shared_transport
+    with _shared_transport_lock:
+        if (_shared_transport == False):
+            _shared_transport = Transport()
+        return _shared_transport
+
+
+# Shared Executors -------------------------------------------------------------
+
+_shared_executors = {}
+_shared_executors_lock = threading.Lock()
+
+# returns the process-wide ThreadPoolExecutor for a key, creating it the first time it is asked for
+# -> API objects send their concurrent requests on these instead of their own pools, so a Scraper that is thrown away
+#    (ie: when scraper_controller revives a thread) doesn't leave its worker threads behind
+# -> tasks on a shared executor must never wait on other tasks on the same executor, or they can deadlock
+def get_shared_executor(key, max_workers):
+    with _shared_executors_lock:
+        if (key not in _shared_executors):
+            _shared_executors[key] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=key)
+        return _shared_executors[key]
+
+
+# ==============================================================================
+# RateLimiter
+# ==============================================================================
+
+# Token bucket that every thread calls .acquire() on before sending a request
+# - the bucket holds up to `capacity` tokens and refills at requests_per_minute / 60 tokens per second
+# - Twitch reports its own bucket in the 'Ratelimit-Limit', 'Ratelimit-Remaining' and 'Ratelimit-Reset' response headers
+#   -> .update_from_headers() syncs our bucket with Twitch's, so we never think we have more requests left than Twitch does
+# src: https://dev.twitch.tv/docs/api/guide#rate-limits
+class RateLimiter():
+
+    def __init__(self, requests_per_minute = 800, capacity = False):
+        self.lock = threading.Lock()
+        self.fixed_capacity = capacity
+        self.set_limit(requests_per_minute)
+        self.tokens = float(self.capacity)
+        self.last_refill = time.time()
+        self.blocked_until = 0 # <- unix epoch time; when Twitch says we are out of requests, nobody sends until then
+
+    # changes the number of requests allowed per minute
+    # -> not thread safe on its own, callers should hold self.lock once the limiter is shared
+    def set_limit(self, requests_per_minute):
+        self.limit = requests_per_minute
+        self.capacity = self.fixed_capacity if (self.fixed_capacity != False) else requests_per_minute
+        self.refill_rate = requests_per_minute / 60
+
+    def __refill(self, current_time):
+        self.tokens = min(self.capacity, self.tokens + (current_time - self.last_refill) * self.refill_rate)
+        self.last_refill = current_time
+
+
+    # blocks until there is a token available, then takes it
+    # returns the number of seconds spent waiting
+    def acquire(self):
+        waited = 0
+        while (True):
+            with self.lock:
+                current_time = time.time()
+                self.__refill(current_time)
+                if (current_time < self.blocked_until):
+                    wait = self.blocked_until - current_time
+                elif (self.tokens >= 1):
+                    self.tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.refill_rate
+
+            time.sleep(wait)
+            waited += wait
+
+
+    # syncs the bucket with the ratelimit headers from a response
+    # -> responses without the headers (ie: the v5 API) are ignored
+    def update_from_headers(self, headers):
+        if ('Ratelimit-Remaining' not in headers):
+            return
+
+        try:
+            remaining = int(headers['Ratelimit-Remaining'])
+            limit     = int(headers['Ratelimit-Limit']) if ('Ratelimit-Limit' in headers) else self.limit
+            reset     = int(headers['Ratelimit-Reset']) if ('Ratelimit-Reset' in headers) else 0
+        except ValueError:
+            return
+
+        with self.lock:
+            self.__refill(time.time())
+            if ((limit > 0) and (limit != self.limit)):
+                self.set_limit(limit)
+
+            # other processes using the same credentials also spend from Twitch's bucket, so only ever lower our count
+            self.tokens = min(self.tokens, remaining)
+            if ((remaining <= 0) and (reset > self.blocked_until)):
+                self.blocked_until = reset
+
+
+# Shared RateLimiters ----------------------------------------------------------
+
+_shared_rate_limiters = {}
+_shared_rate_limiters_lock = threading.Lock()
+
+# returns the process-wide RateLimiter for a key, creating it the first time it is asked for
+# -> Twitch's budget belongs to the client_id, so keying by client_id makes every Scraper in the process share one bucket
+def get_shared_rate_limiter(key, requests_per_minute = 800, capacity = False):
+    with _shared_rate_limiters_lock:
+        if (key not in _shared_rate_limiters):
+            _shared_rate_limiters[key] = RateLimiter(requests_per_minute, capacity)
+        return _shared_rate_limiters[key]
+
+
+# ==============================================================================
+# TokenStore
+# ==============================================================================
+
+# Caches OAuth access tokens (and when they expire) in a JSON file: {key: {'access_token': str, 'expires_at': int}}
+# - a token is only refreshed shortly before it expires, or after the API rejects it (see .invalidate())
+# - a thread lock keeps threads in this process from refreshing at the same time,
+#   and a lock file (fcntl) does the same for other processes (ie: scraper_controller restarts, cron jobs)
+# - fetch_token functions return a tuple (access_token, seconds_until_expiry), or False if the request failed
+class TokenStore():
+
+    def __init__(self, filename = default_token_store_filename, refresh_margin = default_token_refresh_margin):
+        self.filename = filename
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.tokens = {}
+
+
+    # returns a valid access token for key, calling fetch_token() only if there isn't one in memory or on disk
+    # returns False if there is no valid token and fetch_token() failed
+    def get_token(self, key, fetch_token):
+        with self.lock:
+            if (self.__is_valid(key)):
+                return self.tokens[key]['access_token']
+
+            with self.__file_lock():
+                self.tokens = self.__load()
+                if (not self.__is_valid(key)):
+                    result = fetch_token()
+                    if (result == False):
+                        return False
+                    access_token, expires_in = result
+                    self.tokens[key] = {'access_token': access_token, 'expires_at': int(time.time() + expires_in)}
+                    self.__save()
+                return self.tokens[key]['access_token']
+
+
+    # marks a token as expired after the API rejected it (ie: a 401), so the next .get_token() fetches a new one
+    # -> does nothing if the token has already been replaced, so a burst of 401s only triggers one refresh
+    def invalidate(self, key, access_token):
+        with self.lock:
+            with self.__file_lock():
+                self.tokens = self.__load()
+                if ((key in self.tokens) and (self.tokens[key]['access_token'] == access_token)):
+                    del self.tokens[key]
+                    self.__save()
+
+
+    # caller must hold self.lock
+    def __is_valid(self, key):
+        return (key in self.tokens) and (self.tokens[key]['expires_at'] - self.refresh_margin > time.time())
+
+
+    # returns every token in the file, or {} if there isn't a readable file yet
+    def __load(self):
+        try:
+            with open(self.filename) as f:
+                tokens = json.load(f)
+            return tokens if (isinstance(tokens, dict)) else {}
+        except (IOError, ValueError):
+            return {}
+
+    # writes to a temporary file and renames it, so other processes never read a half written file
+    def __save(self):
+        tmp_filename = self.filename + '.tmp'
+        try:
+            with open(os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                json.dump(self.tokens, f)
+            os.replace(tmp_filename, self.filename)
+        except IOError:
+            print('could not save tokens to', self.filename)
+
+
+    # returns a context manager that holds an exclusive lock on self.filename + '.lock' for other processes
+    def __file_lock(self):
+        return _FileLock(self.filename + '.lock')
+
+
+# exclusive lock on a file, shared between processes
+# -> if fcntl isn't available or the lock file can't be opened, it doesn't lock anything
+class _FileLock():
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = False
+
+    def __enter__(self):
+        if (fcntl != False):
+            try:
+                self.file = open(self.filename, 'a')
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+            except IOError:
+                self.file = False
+        return self
+
+    def __exit__(self, *args):
+        if (self.file != False):
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = False
+
+
+# Shared TokenStores -----------------------------------------------------------
+
+_shared_token_stores = {}
+_shared_token_stores_lock = threading.Lock()
+
+# returns the process-wide TokenStore for a file
+# -> so every thread's TwitchAPI shares the in-memory copy of the tokens, and only one of them refreshes a token
+def get_shared_token_store(filename = default_token_store_filename):
+    with _shared_token_stores_lock:
+        if (filename not in _shared_token_stores):
+            _shared_token_stores[filename] = TokenStore(filename)
+        return _shared_token_stores[filename]
+
+
+# ==============================================================================
+# Retries
+# ==============================================================================
+
+# raised when a request still fails after every retry
+# -> .response is the last response received, or False if the last attempt never got one (ie: a timeout)
+class APIRequestFailed(Exception):
+
+    def __init__(self, url, response = False, error = False):
+        self.url = url
+        self.response = response
+        self.status_code = response.status_code if (response != False) else False
+        reason = ('status ' + str(self.status_code)) if (response != False) else repr(error)
+        super().__init__(url + ' failed (' + reason + ')')
+
+
+# Decides how many times to send a request and how long to wait between attempts
+# - waits for as long as the response's 'Retry-After' or 'Ratelimit-Reset' header asks for
+# - otherwise waits a random amount between 0 and base_delay * 2^attempt ("full jitter"), so threads that failed
+#   together don't all retry together
+# src: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+class RetryPolicy():
+
+    def __init__(self, max_attempts = 5, base_delay = 0.5, max_delay = 60):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+
+    # sends a request with send_request() (which returns a response or raises requests.RequestException)
+    # -> returns the first response that doesn't need to be retried
+    # -> raises APIRequestFailed if every attempt failed
+    # -> retries are counted as 'retries' in request_logs, and failures are reported to circuit_breaker (if given)
+    def send(self, url, send_request, circuit_breaker = False, request_logs = False):
+        for attempt in range(self.max_attempts):
+            if ((attempt > 0) and (request_logs != False)):
+                request_logs.increment_counter('retries')
+            is_trial = circuit_breaker.wait_until_closed(request_logs) if (circuit_breaker != False) else False
+
+            response, error = False, False
+            try:
+                try:
+                    response = send_request()
+                except requests.RequestException as e:
+                    error = e
+
+                if ((response != False) and (response.status_code not in retryable_status_codes)):
+                    if (circuit_breaker != False):
+                        circuit_breaker.record_success()
+                    return response
+
+                # 429s mean we are going too fast, not that the endpoint is broken
+                if ((circuit_breaker != False) and ((response == False) or (response.status_code != 429))):
+                    circuit_breaker.record_failure(request_logs, is_trial)
+            finally:
+                if (is_trial):
+                    circuit_breaker.release_trial() # <- a 429 (or an unexpected exception) leaves the breaker half-open
+            if (attempt + 1 < self.max_attempts):
+                time.sleep(self.get_delay(attempt, response))
+
+        raise APIRequestFailed(url, response, error)
+
+
+    # returns the number of seconds to wait before sending attempt number (attempt + 1)
+    def get_delay(self, attempt, response = False):
+        if (response != False):
+            delay = self.__get_delay_from_headers(response.headers)
+            if (delay != False):
+                return min(self.max_delay, max(0, delay))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+    # returns the number of seconds the server asked us to wait for, or False if it didn't say
+    # -> 'Retry-After' is either a number of seconds or an HTTP date
+    # -> 'Ratelimit-Reset' (Twitch) is the unix epoch time that our rate limit bucket refills, but only matters once it is empty
+    def __get_delay_from_headers(self, headers):
+        if ('Retry-After' in headers):
+            retry_after = headers['Retry-After']
+            if (retry_after.isdigit()):
+                return int(retry_after)
+            try:
+                return email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+
+        if (('Ratelimit-Reset' in headers) and (headers.get('Ratelimit-Remaining') == '0')):
+            try:
+                return int(headers['Ratelimit-Reset']) - time.time()
+            except ValueError:
+                pass
+        return False
+
+
+# Stops every thread from sending requests to an endpoint that keeps failing
+# - after failure_threshold failures in a row the breaker "trips", and .wait_until_closed() blocks for cooldown seconds
+# - after the cooldown, a single trial request is let through. If it fails, the breaker trips again
+# src: https://martinfowler.com/bliki/CircuitBreaker.html
+class CircuitBreaker():
+
+    def __init__(self, failure_threshold = 5, cooldown = 30):
+        self.lock = threading.Lock()
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.num_failures = 0
+        self.open_until = 0      # <- unix epoch time; while the breaker is open, nobody sends
+        self.trial_in_flight = False
+
+
+    # blocks while the breaker is open (or while another thread's trial request is in flight)
+    # -> returns True if the caller was let through as the trial request, which it has to .release_trial() once it's sent
+    # -> counts a 'circuit_breaker_waits' in request_logs if it had to wait
+    def wait_until_closed(self, request_logs = False):
+        waited, is_trial = False, False
+        while (True):
+            with self.lock:
+                current_time = time.time()
+                if (self.num_failures < self.failure_threshold):
+                    break
+                if ((current_time >= self.open_until) and (not self.trial_in_flight)):
+                    self.trial_in_flight = True
+                    is_trial = True
+                    break
+                wait = max(self.open_until - current_time, 0.1)
+
+            waited = True
+            time.sleep(wait)
+
+        if (waited and (request_logs != False)):
+            request_logs.increment_counter('circuit_breaker_waits')
+        return is_trial
+
+    # lets another trial request through, without counting the last one as a success or a failure
+    def release_trial(self):
+        with self.lock:
+            self.trial_in_flight = False
+
+
+    def record_success(self):
+        with self.lock:
+            self.num_failures = 0
+            self.trial_in_flight = False
+
+
+    # is_trial: True if the failed request was the trial request from .wait_until_closed()
+    # -> the breaker only opens when this failure trips it (or the trial fails). Failures from requests that were already in
+    #    flight when it opened don't keep it open longer
+    # -> counts a 'circuit_breaker_trips' in request_logs if this failure opens the breaker
+    def record_failure(self, request_logs = False, is_trial = False):
+        with self.lock:
+            self.num_failures += 1
+            if (is_trial):
+                self.trial_in_flight = False
+            elif (self.num_failures != self.failure_threshold):
+                return
+            self.open_until = time.time() + self.cooldown
+
+        if (request_logs != False):
+            request_logs.increment_counter('circuit_breaker_trips')
+
+
+# Shared CircuitBreakers -------------------------------------------------------
+
+_shared_circuit_breakers = {}
+_shared_circuit_breakers_lock = threading.Lock()
+
+# returns the process-wide CircuitBreaker for an endpoint (ie: 'https://api.twitch.tv/helix/videos')
+def get_shared_circuit_breaker(endpoint, failure_threshold = 5, cooldown = 30):
+    with _shared_circuit_breakers_lock:
+        if (endpoint not in _shared_circuit_breakers):
+            _shared_circuit_breakers[endpoint] = CircuitBreaker(failure_threshold, cooldown)
+        return _shared_circuit_breakers[endpoint]
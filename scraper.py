@@ -8,48 +8,74 @@
 
 # Imports ----------------------------------------------------------------------
 
+import os
 import sys
 import json
 import time
 import math
-import requests
+import asyncio
 import argparse
 import datetime
 
+from concurrent.futures import ThreadPoolExecutor
+
 from logs import *
 from games import *
+from caches import *
+from network import *
 from streamers import *
 from insights import *
 
+# Constants --------------------------------------------------------------------
+
+# helix/streams can only be paged through one cursor at a time, but it can be filtered by language
+# -> so each partition below is an independent cursor chain that can be paged through in parallel
+# -> the languages with the most livestreams get their own partition, and the rest share the last one
+# src: https://dev.twitch.tv/docs/api/reference#get-streams
+default_language_partitions = [
+    'en', 'es', 'ru', 'ko', 'ja', 'pt', 'de', 'fr', 'zh',
+    ['it', 'pl', 'tr', 'th', 'zh-hk', 'cs', 'da', 'nl', 'fi', 'hu', 'no', 'sk', 'sv', 'vi', 'uk', 'ar', 'bg',
+     'hi', 'ms', 'tl', 'ca', 'el', 'id', 'ro', 'he', 'asl', 'other']
+]
+
 # ==============================================================================
 # Twitch API
 # ==============================================================================
 
 class TwitchAPI():
 
-    def __init__(self, twitch_credentials, print_errors = False):
+    # -> doesn't talk to Twitch until the first request, which gets an access token from the TokenStore if it needs one
+    def __init__(self, twitch_credentials, print_errors = False, transport = False, max_video_workers = 8, token_store = False):
 
-        # Twitch uses OAuth2, so we need to grab an access_token
-        params = {
-            'client_id': twitch_credentials['client_id'],
-            'client_secret': twitch_credentials['client_secret'],
-            'grant_type': 'client_credentials'
-        }
-        r = requests.post("https://id.twitch.tv/oauth2/token", params=params)
-        if (r.status_code == 200):
-            data = r.json()
-            self.headers = {'Authorization': 'Bearer ' + data['access_token']}
-        else:
-            self.headers = False
+        # every request goes through a pooled Transport so connections are kept alive between calls
+        self.transport = transport if (transport != False) else get_shared_transport()
+
+        # initialize TimeLogs
+        request_types = ['get_livestreams', 'get_streamers', 'get_videos', 'get_game_name_in_video', 'get_followers', 'get_games']
+        self.request_logs = TimeLogs(request_types)
+
+        # Twitch uses OAuth2, so we need an access_token
+        # -> tokens last ~60 days, so they are cached on disk and shared with every other TwitchAPI using the same client_id
+        self.credentials = twitch_credentials
+        self.token_store = token_store if (token_store != False) else get_shared_token_store()
+        self.token_key = 'twitch:' + twitch_credentials['client_id']
 
         # create headers for the deprecated v5 API
         self.v5API_headers = {'Client-ID': twitch_credentials['v5_client_id'], 'Accept': 'application/vnd.twitchtv.v5+json'}
-        self.min_sleep_period = 1 / (800 / 60) # API has 800 requests per minute
         self.print_errors = print_errors
 
-        # initialize TimeLogs
-        request_types = ['get_livestreams', 'get_streamers', 'get_videos', 'get_game_name_in_video', 'get_followers', 'get_games']
-        self.request_logs = TimeLogs(request_types)
+        # Twitch allows 800 requests per minute per client_id, so every TwitchAPI with the same credentials shares a bucket
+        self.ratelimiter    = get_shared_rate_limiter('twitch:' + twitch_credentials['client_id'], 800)
+        self.v5_ratelimiter = get_shared_rate_limiter('twitch_v5:' + twitch_credentials['v5_client_id'], 800)
+
+        # failed requests are retried with backoff, see network.RetryPolicy
+        self.retry_policy = RetryPolicy()
+
+        # .get_videos() looks up the game in each video on a pool of worker threads, shared by every TwitchAPI in the process
+        self.max_video_workers = max_video_workers
+
+        # optional VideoGameCache that .get_game_name_in_video() checks before asking the v5 API
+        self.video_game_cache = False
 
 
     # takes in a list of items and converts it into a list of tuples
@@ -64,45 +90,101 @@ class TwitchAPI():
 
         return params
 
-    # the http header for responses from the Twitch API include the number of requests left before we reach our ratelimit
-    # Twitch allows 800 requests per minute = ~13 requests per second
-    # -> to be safe, when we run out wait an entire second
-    def __sleep(self, header, min_sleep = 0):
-        if (('ratelimit_remaining' in header) and (header['ratelimit_remaining'] <= 1)):
-            print('sleeping...', header['ratelimit_remaining'])
-            time.sleep(1)
-        elif (min_sleep > 0):
-            time.sleep(min_sleep)
+    # lets Scraper point TwitchAPI at a VideoGameCache (or turn caching off with False)
+    def set_video_game_cache(self, video_game_cache):
+        self.video_game_cache = video_game_cache
+
+    # asks Twitch for a new app access token
+    # returns a tuple (access_token, seconds_until_expiry), or False if the request failed
+    # src: https://dev.twitch.tv/docs/authentication/getting-tokens-oauth#oauth-client-credentials-flow
+    def __fetch_access_token(self):
+        params = {
+            'client_id': self.credentials['client_id'],
+            'client_secret': self.credentials['client_secret'],
+            'grant_type': 'client_credentials'
+        }
+        r = self.transport.post("https://id.twitch.tv/oauth2/token", self.request_logs, params=params)
+        if (r.status_code == 200):
+            data = r.json()
+            return data['access_token'], data['expires_in']
+        if (self.print_errors):
+            print("Error with getting an access token (" + str(r.status_code) + ")")
+        return False
+
+
+    # returns the headers for a helix API request
+    def __get_helix_headers(self):
+        access_token = self.token_store.get_token(self.token_key, self.__fetch_access_token)
+        if (access_token == False):
+            return {}
+        return {'Authorization': 'Bearer ' + access_token}
+
+
+    # sends a GET request through the Transport, counting connection reuse in request_logs
+    # -> waits on the shared RateLimiter first and feeds it the response's ratelimit headers afterwards
+    # -> failed requests are retried by self.retry_policy, and endpoint (defaults to url) picks the shared CircuitBreaker to report to
+    #    -> raises APIRequestFailed if the request never succeeds
+    # -> if headers aren't given, it is a helix request. If Twitch rejects our access token, we get a new one and try once more
+    def __get(self, url, params = None, headers = None, ratelimiter = False, endpoint = False):
+        ratelimiter = ratelimiter if (ratelimiter != False) else self.ratelimiter
+        circuit_breaker = get_shared_circuit_breaker(endpoint if (endpoint != False) else url)
+        is_helix = (headers == None)
+        for attempt in range(2 if (is_helix) else 1):
+            request_headers = self.__get_helix_headers() if (is_helix) else headers
+
+            def send_request():
+                if (ratelimiter.acquire() > 0):
+                    self.request_logs.increment_counter('ratelimit_waits')
+                r = self.transport.get(url, self.request_logs, params=params, headers=request_headers)
+                ratelimiter.update_from_headers(r.headers)
+                return r
+
+            r = self.retry_policy.send(url, send_request, circuit_breaker, self.request_logs)
+            if ((r.status_code != 401) or (not is_helix) or ('Authorization' not in request_headers)):
+                break
+            self.request_logs.increment_counter('token_refreshes')
+            self.token_store.invalidate(self.token_key, request_headers['Authorization'][len('Bearer '):])
+        return r
 
 
     # returns a tuple ([list of livestreams], pagination_cursor)
     # src: https://dev.twitch.tv/docs/api/reference#get-streams
-    def get_livestreams(self, previous_cursor = False):
-        self.request_logs.start_action('get_livestreams')
+    # -> languages can be a language code or a list of them, to only return livestreams in those languages
+    # -> raises APIRequestFailed if Twitch can't be reached, so callers can tell that apart from the last page
+    def get_livestreams(self, previous_cursor = False, languages = False):
+        action = self.request_logs.start_action('get_livestreams')
         livestreams = []
         cursor = False
         params = {} if (previous_cursor == False) else {'after': previous_cursor}
         params['first'] = '100'
-        r = requests.get('https://api.twitch.tv/helix/streams', params=params, headers=self.headers)
+        if (languages != False):
+            params['language'] = languages
+        try:
+            r = self.__get('https://api.twitch.tv/helix/streams', params)
+        except APIRequestFailed:
+            self.request_logs.end_action('get_livestreams', action)
+            raise
         if (r.status_code == 200):
             data = r.json()
             livestreams = data['data']
             if (('cursor' in data['pagination']) and (data['pagination']['cursor'] != '')):
                 cursor = data['pagination']['cursor']
 
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_livestreams')
+        self.request_logs.end_action('get_livestreams', action)
         return livestreams, cursor
 
 
     # takes in an list of streamer_ids and *always* returns a list of streamer objects (even if size 1 or 0)
     # src: https://dev.twitch.tv/docs/api/reference#get-users
     def get_streamers(self, streamer_ids):
-        self.request_logs.start_action('get_streamers')
+        action = self.request_logs.start_action('get_streamers')
         streamers = []
         params = self.__format_tuple_params(streamer_ids, 'id')
-        r = requests.get('https://api.twitch.tv/helix/users', params=params, headers=self.headers)
-        if (r.status_code == 200):
+        try:
+            r = self.__get('https://api.twitch.tv/helix/users', params)
+        except APIRequestFailed as error:
+            r = error.response
+        if ((r != False) and (r.status_code == 200)):
             data = r.json()
             for streamer in data['data']:
                 streamer['follower_counts'] = []
@@ -110,21 +192,21 @@ class TwitchAPI():
                 streamers.append(streamer)
         else:
             if (self.print_errors):
-                print("------------\nERROR in TwitchAPi.get_livestreams()")
-                print(r.status_code)
-                print(r.text)
+                print("------------\nERROR in TwitchAPi.get_streamers()")
+                print(r.status_code if (r != False) else 'no response')
+                print(r.text if (r != False) else '')
                 print(streamer_ids)
                 print("--------------")
 
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_streamers')
+        self.request_logs.end_action('get_streamers', action)
         return streamers
 
 
     # gets a list of videos by a given streamer
     # src: https://dev.twitch.tv/docs/api/reference#get-videos
+    # -> raises APIRequestFailed if Twitch can't be reached, so a failed request isn't mistaken for a streamer with no videos
     def get_videos(self, streamer_id, previous_cursor = False, quantity = '100'):
-        self.request_logs.start_action('get_videos')
+        action = self.request_logs.start_action('get_videos')
         videos = []
 
         # quantity should be an int with value <= 100 and converted into a string
@@ -136,105 +218,207 @@ class TwitchAPI():
         params = {'user_id': streamer_id, 'first': quantity}
         if (previous_cursor != False):
             params['after'] = previous_cursor
-        r = requests.get('https://api.twitch.tv/helix/videos', params=params, headers=self.headers)
+        try:
+            r = self.__get('https://api.twitch.tv/helix/videos', params)
+        except APIRequestFailed:
+            self.request_logs.end_action('get_videos', action)
+            raise
         if (r.status_code == 200):
             data = r.json()
-            for video in data['data']:
-                video['game_name'] = self.get_game_name_in_video(video['id'])
+            game_names = self.__get_game_names_in_videos(data['data'])
+            for i in range(len(data['data'])):
+                video = data['data'][i]
+                video['game_name'] = game_names[i]
                 videos.append(video)
             cursor = False if ('cursor' not in data['pagination']) else data['pagination']['cursor']
         else:
             cursor = False
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_videos')
+        self.request_logs.end_action('get_videos', action)
         return videos, cursor
 
+    # looks up the game played in every video of a page at the same time, on a bounded pool of worker threads
+    # -> every lookup still waits on the shared RateLimiter, so this only fills the gaps left by network latency
+    # -> returns the game names in the same order as videos
+    def __get_game_names_in_videos(self, videos):
+        video_ids = []
+        for video in videos:
+            video_ids.append(video['id'])
+
+        if ((self.max_video_workers <= 1) or (len(video_ids) <= 1)):
+            game_names = []
+            for video_id in video_ids:
+                game_names.append(self.get_game_name_in_video(video_id))
+            return game_names
+
+        video_executor = get_shared_executor('twitch_videos:' + str(self.max_video_workers), self.max_video_workers)
+        return list(video_executor.map(self.get_game_name_in_video, video_ids))
+
     # returns the string name of a game played in a specified video
     # -> this uses the deprecated V5 API because the New API doesn't have this functionality
     # src: https://dev.twitch.tv/docs/v5/reference/videos#get-video
+    # -> the game in a published video never changes, so results are kept in self.video_game_cache (if set)
     def get_game_name_in_video(self, video_id):
-        self.request_logs.start_action('get_game_name_in_video')
-        game = ""
         video_id = str(video_id) if (isinstance(video_id, int)) else video_id
+        if (self.video_game_cache != False):
+            game = self.video_game_cache.get(video_id)
+            if (game != False):
+                self.request_logs.increment_counter('video_game_cache_hits')
+                return game
+            self.request_logs.increment_counter('video_game_cache_misses')
+
+        action = self.request_logs.start_action('get_game_name_in_video')
+        game = ""
         url = 'https://api.twitch.tv/kraken/videos/' + video_id
-        r = requests.get(url, headers=self.v5API_headers)
-        if (r.status_code == 200):
+        try:
+            r = self.__get(url, None, self.v5API_headers, self.v5_ratelimiter, 'https://api.twitch.tv/kraken/videos')
+        except APIRequestFailed as error:
+            r = error.response
+        if ((r != False) and (r.status_code == 200)):
             data = r.json()
             game = data['game']
-        elif (r.status_code == 429): # <- too many requests
-            self.__sleep(r.headers, 2)
-            return self.get_game_name_in_video(self, video_id)
+            if ((self.video_game_cache != False) and isinstance(game, str)):
+                self.video_game_cache.set(video_id, game)
 
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_game_name_in_video')
+        self.request_logs.end_action('get_game_name_in_video', action)
         return game
 
 
     # gets the total # of followers for a given streamer
     # src: https://dev.twitch.tv/docs/api/reference#get-users-follows
+    # -> raises APIRequestFailed if Twitch can't be reached
     def get_followers(self, streamer_id):
-        self.request_logs.start_action('get_followers')
+        action = self.request_logs.start_action('get_followers')
         total = -1
         params = {'to_id': streamer_id}
-        r = requests.get('https://api.twitch.tv/helix/users/follows', params=params, headers=self.headers)
+        try:
+            r = self.__get('https://api.twitch.tv/helix/users/follows', params)
+        except APIRequestFailed:
+            self.request_logs.end_action('get_followers', action)
+            raise
         if (r.status_code == 200):
             data = r.json()
             total = data['total']
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_followers')
+        self.request_logs.end_action('get_followers', action)
         return total
 
     # takes in a list of game_ids and *always* returns a list of game objects (even if size 1)
     # src: https://dev.twitch.tv/docs/api/reference#get-games
     def get_games(self, game_ids):
-        self.request_logs.start_action('get_games')
+        action = self.request_logs.start_action('get_games')
         games = []
         params = self.__format_tuple_params(game_ids, 'id')
-        r = requests.get('https://api.twitch.tv/helix/games', params=params, headers=self.headers)
-        if (r.status_code == 200):
+        try:
+            r = self.__get('https://api.twitch.tv/helix/games', params)
+        except APIRequestFailed as error:
+            r = error.response
+        if ((r != False) and (r.status_code == 200)):
             data = r.json()
             games = data['data']
-        self.__sleep(r.headers)
-        self.request_logs.end_action('get_games')
+        self.request_logs.end_action('get_games', action)
         return games
 
 
+# ==============================================================================
+# Async Twitch API
+# ==============================================================================
+
+# asyncio front end for TwitchAPI
+# - each call runs the blocking TwitchAPI method on a worker thread, so it shares TwitchAPI's pooled Transport,
+#   RateLimiter and request_logs while letting a coroutine keep several requests in flight
+# - create it from inside a running event loop (ie: inside a coroutine passed to asyncio.run())
+class AsyncTwitchAPI():
+
+    # max_pages_in_flight is the number of cursor chains paged through at once (see default_language_partitions)
+    def __init__(self, twitchAPI, max_in_flight = 8, max_pages_in_flight = 1):
+        self.twitchAPI = twitchAPI
+        self.request_logs = twitchAPI.request_logs
+        self.max_in_flight = max_in_flight
+        self.lookup_slots = asyncio.Semaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight + max_pages_in_flight) # <- so pagination never waits behind lookups
+
+    # runs a blocking TwitchAPI method on the executor
+    async def __run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def get_livestreams(self, previous_cursor = False, languages = False):
+        return await self.__run(self.twitchAPI.get_livestreams, previous_cursor, languages)
+
+    # at most max_in_flight lookups run at the same time
+    async def get_streamers(self, streamer_ids):
+        async with self.lookup_slots:
+            return await self.__run(self.twitchAPI.get_streamers, streamer_ids)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
 # ==============================================================================
 # IGDB API
 # ==============================================================================
 
 class IGDBAPI():
 
-    def __init__(self, client_id):
+    def __init__(self, client_id, transport = False, cover_cache = False):
         self.headers = {'user-key': client_id, 'Accept': 'application/json'}
-        self.sleep_period = 0.075 # <- to be polite to IGDB's servers
+        self.transport = transport if (transport != False) else get_shared_transport()
+
+        # to be polite to IGDB's servers, every IGDBAPI in the process shares one request every 0.075s (800 per minute)
+        # -> a small burst is allowed, so a page of games and its covers can be requested at the same time
+        self.ratelimiter = get_shared_rate_limiter('igdb:' + client_id, 800, 5)
 
-        request_types = ['search_for_game_by_name', 'search_for_games', 'search_for_game_covers']
+        # .search_for_games() requests a page of games and its covers on a pool of threads, shared by every IGDBAPI in the process
+        self.executor = get_shared_executor('igdb', 5)
+
+        request_types = ['search_for_game_by_name', 'search_for_games_by_names', 'search_for_games', 'search_for_game_covers', 'search_for_game_covers_by_ids']
         self.request_logs = TimeLogs(request_types)
 
+        # failed requests are retried with backoff, see network.RetryPolicy
+        self.retry_policy = RetryPolicy()
+
+        # {game_id: cover_url} for covers we have already looked up
+        self.cover_cache = cover_cache if (cover_cache != False) else get_shared_cover_cache()
+
+    # IGDB's API takes its query in the body of a GET request
+    # -> returns the response, or False if IGDB couldn't be reached after every retry
+    def __get(self, url, body):
+        def send_request():
+            self.ratelimiter.acquire()
+            return self.transport.get(url, self.request_logs, data=body, headers=self.headers)
+
+        try:
+            return self.retry_policy.send(url, send_request, get_shared_circuit_breaker(url), self.request_logs)
+        except APIRequestFailed as error:
+            print(error)
+            return error.response
+
 
     # searches the IGDB API for a game
     # if result_as_array=True, then return the entire list of results from the IGDB search
     # otherwise, return just the first object
     def search_for_game_by_name(self, game_name, result_as_array = False):
-        self.request_logs.start_action('search_for_game_by_name')
-        time.sleep(self.sleep_period)
+        action = self.request_logs.start_action('search_for_game_by_name')
         games = []
         body = "search \"" + game_name + "\"; fields *;"
-        r = requests.get('https://api-v3.igdb.com/games', data=body, headers=self.headers)
-        if (r.status_code == 200):
-            for game in r.json():
-                game_id = game['id']
-                covers = self.search_for_game_covers(max(game_id - 1, 1))
-                if (game_id in covers):
-                    game['igdb_box_art_url'] = covers[game_id]
-                games.append(game)
+        r = self.__get('https://api-v3.igdb.com/games', body)
+        if ((r != False) and (r.status_code == 200)):
+            games = r.json()
+            game_ids = []
+            for game in games:
+                game_ids.append(game['id'])
+
+            # every result's cover comes from one request
+            covers = self.search_for_game_covers_by_ids(game_ids)
+            for game in games:
+                if (covers.get(game['id'], '') != ''):
+                    game['igdb_box_art_url'] = covers[game['id']]
         else:
             print('Error in IGDBAPI.search_for_game_by_name()')
-            print(r.status_code)
-            print(r.text)
+            if (r != False):
+                print(r.status_code)
+                print(r.text)
 
-        self.request_logs.end_action('search_for_game_by_name')
+        self.request_logs.end_action('search_for_game_by_name', action)
         if (result_as_array == True):
             return games
         elif (len(games) > 0):
@@ -243,74 +427,161 @@ class IGDBAPI():
             return False
 
 
-    # searches for games with ids within range (offset, offset + 100)
+    # looks up games by name, with one request for every 50 names (instead of a search per name)
+    # -> names are matched case insensitively (and without trademark symbols), but otherwise exactly
+    # returns tuple (list_of_games, searched_names)
+    # -> searched_names are the names whose request succeeded, so a name that isn't in list_of_games isn't on IGDB
+    def search_for_games_by_names(self, game_names):
+        games, searched_names = [], []
+        for i in range(0, len(game_names), 50):
+            batch = game_names[i:i + 50]
+            action = self.request_logs.start_action('search_for_games_by_names')
+            names = [strip_trademark_symbols(name).replace('\\', '').replace('"', '\\"') for name in batch]
+            where = ' | '.join(['name ~ "' + name + '"' for name in names])
+            results = self.__get_all_pages('https://api-v3.igdb.com/games', "fields *; sort id asc; where " + where + ";", 'search_for_games_by_names')
+            if (results != False):
+                games += results
+                searched_names += batch
+            self.request_logs.end_action('search_for_games_by_names', action)
+
+        covers = self.search_for_game_covers_by_ids([game['id'] for game in games])
+        for game in games:
+            game['igdb_box_art_url'] = covers.get(game['id'], '')
+        return games, searched_names
+
+
+    # searches for the next 500 games with ids greater than offset
     # returns tuple (list_of_games, new_offset)
-    def search_for_games(self, offset = 0):
-        self.request_logs.start_action('search_for_games')
-        time.sleep(self.sleep_period)
+    # -> list_of_games is False if the request failed, so it can't be mistaken for reaching the end of IGDB ([])
+    # -> the covers for ids (offset, offset + 500] are requested at the same time as the games, which covers every game
+    #    when ids are dense. Covers for any games past that range are looked up afterwards in one batched request
+    # -> if updated_since (unix epoch time) is given, only returns games that were updated after it
+    #    -> those are spread out over all ids, so their covers are only looked up by id
+    def search_for_games(self, offset = 0, updated_since = False):
+        action = self.request_logs.start_action('search_for_games')
+
+        body = "fields *; sort id asc; limit 500; where id > " + str(offset)
+        body += (" & updated_at > " + str(int(updated_since)) + ";") if (updated_since != False) else ";"
+        games_request = self.executor.submit(self.__get, 'https://api-v3.igdb.com/games', body)
+        cover_requests = []
+        if (updated_since == False):
+            for cover_offset in range(offset, offset + 500, 125):
+                cover_requests.append(self.executor.submit(self.search_for_game_covers, cover_offset))
 
         games = []
-        body = "fields *; sort id asc; limit 500; where id > " + str(offset) + ";"
-        r = requests.get('https://api-v3.igdb.com/games', data=body, headers=self.headers)
-        if (r.status_code == 200):
-
-            game_covers = self.search_for_game_covers(offset)
-            for game_id, cover in self.search_for_game_covers(offset + 125).items():
-                game_covers[game_id] = cover
-            for game_id, cover in self.search_for_game_covers(offset + 250).items():
-                game_covers[game_id] = cover
-            for game_id, cover in self.search_for_game_covers(offset + 375).items():
+        new_offset = offset + 500
+        r = games_request.result()
+        game_covers = {}
+        for cover_request in cover_requests:
+            for game_id, cover in cover_request.result().items():
                 game_covers[game_id] = cover
 
-            for game in r.json():
+        if ((r != False) and (r.status_code == 200)):
+            games = r.json()
+            missing_ids = []
+            for game in games:
+                game_id = int(game['id'])
+                new_offset = max(new_offset, game_id)
+                if ((game_id not in game_covers) and ((game_id > offset + 500) or (updated_since != False))):
+                    missing_ids.append(game_id)
+
+            for game_id, cover in self.search_for_game_covers_by_ids(missing_ids).items():
+                game_covers[game_id] = cover
+            for game in games:
                 game_id = int(game['id'])
                 game['igdb_box_art_url'] = game_covers[game_id] if (game_id in game_covers) else ""
-                games.append(game)
         else:
             print('Error in IGDBAPI.search_for_games()')
-            print(r.status_code)
-            print(r.text)
+            if (r != False):
+                print(r.status_code)
+                print(r.text)
+            games, new_offset = False, offset
 
-        self.request_logs.end_action('search_for_games')
-        return games, offset + 500
+        self.request_logs.end_action('search_for_games', action)
+        return games, new_offset
 
 
     # searches for the cover of games with IDs within range (offset, offset + 125)
-    # Note: 125 is arbitrarily picked so that there is ample room in the 500 results
     # -> this action can return multiple covers for the same game, so we will pick the largest one for each game
+    # -> if there are more than 500 covers in the range, they are paged through
     # -> unlike .search_for_games(), this function returns a dictionary of form {'game_id': 'url'}
     def search_for_game_covers(self, offset = 0):
-        self.request_logs.start_action('search_for_game_covers')
-        time.sleep(self.sleep_period)
-
+        action = self.request_logs.start_action('search_for_game_covers')
+        body = "fields *; sort game asc; where game > " + str(offset) + " & game <= " + str(offset + 125) + ";"
+        covers = self.__get_all_pages('https://api-v3.igdb.com/covers', body, 'search_for_game_covers')
+        self.request_logs.end_action('search_for_game_covers', action)
+        return self.__pick_largest_covers(covers) if (covers != False) else {}
+
+
+    # sends a query once for every 500 results, until a page comes back with fewer than 500
+    # returns every result, or False if a request failed
+    def __get_all_pages(self, url, body, action_name):
+        results = []
+        page_offset = 0
+        while (True):
+            r = self.__get(url, body + " limit 500; offset " + str(page_offset) + ";")
+            if ((r == False) or (r.status_code != 200)):
+                print('Error in IGDBAPI.' + action_name + '()')
+                if (r != False):
+                    print(r.status_code)
+                    print(r.text)
+                return False
+
+            page = r.json()
+            results += page
+            if (len(page) < 500):
+                return results
+            page_offset += 500
+
+
+    # returns {game_id: 'url'} for the covers of a list of games, using one request per 100 games that aren't in self.cover_cache
+    # -> games without a cover map to ""
+    def search_for_game_covers_by_ids(self, game_ids):
         covers_by_game = {}
-        body = "fields *; sort game asc; limit 500; where game > " + str(offset) + " & game <= " + str(offset + 125) + ";"
-        r = requests.get('https://api-v3.igdb.com/covers', data=body, headers=self.headers)
-        if (r.status_code == 200):
+        missing_ids = []
+        for game_id in game_ids:
+            cover = self.cover_cache.get(game_id)
+            if (cover != False):
+                covers_by_game[game_id] = cover
+            elif (game_id not in missing_ids):
+                missing_ids.append(game_id)
+
+        for i in range(0, len(missing_ids), 100):
+            batch = missing_ids[i:i + 100]
+            action = self.request_logs.start_action('search_for_game_covers_by_ids')
+            ids = ','.join([str(game_id) for game_id in batch])
+            covers = self.__get_all_pages('https://api-v3.igdb.com/covers', "fields *; sort game asc; where game = (" + ids + ");", 'search_for_game_covers_by_ids')
+            if (covers != False):
+                found = self.__pick_largest_covers(covers)
+                for game_id in batch:
+                    covers_by_game[game_id] = found[game_id] if (game_id in found) else ""
+                    self.cover_cache.set(game_id, covers_by_game[game_id])
+            self.request_logs.end_action('search_for_game_covers_by_ids', action)
+        return covers_by_game
 
-            # bucket covers by game ID so we can compare sizes and keep the max
-            for cover in r.json():
-                game_id = int(cover['game'])
 
-                if (('width' in cover) and ('height' in cover)):
-                    cover_size = cover['width'] * cover['height']
-                    if (game_id not in covers_by_game):
-                        covers_by_game[game_id] = {'url': cover['url'], 'size': cover_size}
-                    elif (cover_size > covers_by_game[game_id]['size']):
-                        covers_by_game[game_id] = {'url': cover['url'], 'size': cover_size}
+    # a game can have multiple covers, so this picks the largest one for each game
+    # returns {game_id: 'url'}
+    def __pick_largest_covers(self, covers):
+        covers_by_game = {}
 
-                elif (game_id not in covers_by_game): # <- account for rare cases where cover doesn't have size specs
-                    covers_by_game[game_id] = {'url': cover['url'], 'size': 0}
+        # bucket covers by game ID so we can compare sizes and keep the max
+        for cover in covers:
+            game_id = int(cover['game'])
 
-            # remove the size metric
-            for id in covers_by_game:
-                covers_by_game[id] = 'https:' + covers_by_game[id]['url']
+            if (('width' in cover) and ('height' in cover)):
+                cover_size = cover['width'] * cover['height']
+                if (game_id not in covers_by_game):
+                    covers_by_game[game_id] = {'url': cover['url'], 'size': cover_size}
+                elif (cover_size > covers_by_game[game_id]['size']):
+                    covers_by_game[game_id] = {'url': cover['url'], 'size': cover_size}
 
-        else:
-            print('Error in IGDBAPI.search_for_game_covers')
-            print(r.status_code)
-            print(r.text)
-        self.request_logs.end_action('search_for_game_covers')
+            elif (game_id not in covers_by_game): # <- account for rare cases where cover doesn't have size specs
+                covers_by_game[game_id] = {'url': cover['url'], 'size': 0}
+
+        # remove the size metric
+        for id in covers_by_game:
+            covers_by_game[id] = 'https:' + covers_by_game[id]['url']
         return covers_by_game
 
 # ==============================================================================
@@ -320,10 +591,15 @@ class IGDBAPI():
 
 class Scraper():
 
-    def __init__(self, credentials, mode = 'cli'):
-        self.twitchAPI = TwitchAPI(credentials['twitch'])
-        self.igdbAPI = IGDBAPI(credentials['igdb'])
+    # -> transport lets tests send every request somewhere else (see cassettes.StandInTransport)
+    def __init__(self, credentials, mode = 'cli', transport = False):
+        self.twitchAPI = TwitchAPI(credentials['twitch'], False, transport)
+        self.igdbAPI = IGDBAPI(credentials['igdb'], transport)
         self.print_mode_on = True
+        self.view_cutoff = 4 # <- livestreams with fewer viewers than this are filtered out
+        self.games_checkpoint_every = 10 # <- pages of games (500 each) between checkpoints in .compile_games_db(resumable=True)
+        self.pipeline_pages_in_queue = 4 # <- pages of livestreams that .compile_streamers_db_async() holds before pagination waits
+        self.livestream_partition_stats = {} # <- {partition: {'pages': int, 'seconds': float, 'livestreams': int}} from the last partitioned scrape
         self.filterLogs = FilterLogs()
         self.set_mode(mode)
         return
@@ -336,8 +612,11 @@ class Scraper():
             self.mode = 'cli'
             self.filepaths = {
                 'games': './data/games.csv',
+                'games_checkpoint': './data/games_checkpoint.json',
+                'twitch_to_igdb': './data/twitch_to_igdb.csv',
                 'streamers': './data/streamers',
                 'streamers_missing_videos': './data/streamers_missing_videos.csv',
+                'video_games': './data/video_games',
                 'logs': './logs/requests[' + current_month + '].csv',
                 'filterlogs': './logs/filters[' + current_month + '].csv'
             }
@@ -348,8 +627,11 @@ class Scraper():
             self.mode = 'testing'
             self.filepaths = {
                 'games': './test/games.csv',
+                'games_checkpoint': './test/games_checkpoint.json',
+                'twitch_to_igdb': './test/twitch_to_igdb.csv',
                 'streamers': './test/streamers',
                 'streamers_missing_videos': './test/streamers_missing_videos.csv',
+                'video_games': './test/video_games',
                 'logs': './test/requests[' + current_month + '].csv',
                 'filterlogs': './test/filterlogs[' + current_month + '].csv'
             }
@@ -360,13 +642,19 @@ class Scraper():
             self.mode = 'production'
             self.filepaths = {
                 'games': './data/games.csv',
+                'games_checkpoint': './data/games_checkpoint.json',
+                'twitch_to_igdb': './data/twitch_to_igdb.csv',
                 'streamers': './data/streamers',
                 'streamers_missing_videos': './data/streamers_missing_videos.csv',
+                'video_games': './data/video_games',
                 'logs': './logs/requests[' + current_month + '].csv',
                 'filterlogs': './logs/filters[' + current_month + '].csv'
             }
             self.print_mode_on = False
 
+        # point the Twitch API at this mode's video -> game cache
+        self.twitchAPI.set_video_game_cache(get_shared_video_game_cache(self.filepaths['video_games']))
+
         # save any log changes and load the new logs object
         self.filterLogs.export_to_csv()
         self.filterLogs = FilterLogs(self.filepaths['filterlogs'])
@@ -401,20 +689,51 @@ class Scraper():
     #    (leaves twitch_box_art_url blank)
     # limit defaults to an equivalent to +inf. Drop it to a low int for testing purposes (only get the first X=limit games)
     # -> because of the way offset works, add 500 (size of an API result) to ensure the API returns all values up to the limit
-    def compile_games_db(self, limit = 9999999):
-
-        games = Games() # <- MODIFY THIS TO load existing games DB './data/games.csv'
+    # -> if resumable=True, builds on the existing games.csv and keeps a checkpoint in games_checkpoint.json:
+    #    - while crawling, every few pages the games so far are saved along with the offset to pick up from
+    #    - a crawl that was interrupted resumes from the checkpointed offset
+    #    - once a full crawl has finished, later runs only fetch games that were updated since the last crawl/sync started
+    def compile_games_db(self, limit = 9999999, resumable = False):
+
+        games = Games(self.filepaths['games']) if (resumable) else Games()
+        checkpoint = self.__load_games_checkpoint() if (resumable) else {'offset': 0, 'started': 0, 'last_synced': False}
+        if (checkpoint['offset'] == 0):
+            checkpoint['started'] = int(time.time())
+
+        # once a full crawl is done, a sync only needs games updated since the last one started
+        updated_since = checkpoint['last_synced'] if (checkpoint['offset'] == 0) else False
+        if (updated_since != False):
+            self.__print('Syncing games updated since ' + str(updated_since))
+        elif (checkpoint['offset'] > 0):
+            self.__print('Resuming crawl of IGDB from id ' + str(checkpoint['offset']))
 
         # loop over all games on IGDB going in ascending order by ID
-        offset = 0
-        search_results, offset = self.igdbAPI.search_for_games(offset)
-        while (len(search_results) > 0 and (offset < limit + 500)):
+        num_pages = 0
+        offset = checkpoint['offset']
+        processed_offset = offset # <- offset after the last page that was added to games
+        search_results, offset = self.igdbAPI.search_for_games(offset, updated_since)
+        while ((search_results != False) and (len(search_results) > 0) and (offset < limit + 500)):
             for igdb_game_obj in search_results:
-                games.add_new_game(igdb_game_obj)
+                games.add_or_update_game(igdb_game_obj)
+            processed_offset = offset
 
             if (self.mode == 'cli'):
                 games.print_stats()
-            search_results, offset = self.igdbAPI.search_for_games(offset)
+
+            num_pages += 1
+            if (resumable and (num_pages % self.games_checkpoint_every == 0)):
+                checkpoint['offset'] = processed_offset if (updated_since == False) else 0
+                self.__save_games_checkpoint(games, checkpoint)
+            search_results, offset = self.igdbAPI.search_for_games(offset, updated_since)
+
+        # a crawl that reached the end of IGDB (rather than limit, or a failed request) is complete, so the next run only needs a sync
+        # -> after a failed request, the crawl resumes from the last page that was added (and a sync is retried from last_synced)
+        if (resumable):
+            reached_end = ((search_results != False) and (len(search_results) == 0))
+            if (reached_end):
+                checkpoint['last_synced'] = checkpoint['started']
+            checkpoint['offset'] = 0 if (reached_end or (updated_since != False)) else processed_offset
+            self.__save_games_checkpoint(games, checkpoint)
 
         if (self.mode == 'cli'):
             self.igdbAPI.request_logs.print_stats()
@@ -424,12 +743,33 @@ class Scraper():
         return games
 
 
+    # returns {'offset': id to resume crawling from (0 if no crawl is in progress),
+    #          'started': when the current crawl/sync started, 'last_synced': when the last complete crawl/sync started (or False)}
+    def __load_games_checkpoint(self):
+        try:
+            with open(self.filepaths['games_checkpoint']) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {'offset': 0, 'started': 0, 'last_synced': False}
+
+
+    # saves games.csv and then the checkpoint, so the checkpoint never points past games that weren't saved
+    def __save_games_checkpoint(self, games, checkpoint):
+        games.export_to_csv(self.filepaths['games'])
+        tmp_filename = self.filepaths['games_checkpoint'] + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_filename, self.filepaths['games_checkpoint'])
+
+
     # Scrape Streamers ---------------------------------------------------------
 
     # scrapes all current livestreams on twitch and compiles them into a collection of Streamers
     # -> does NOT add video data to streamers because of runtime concerns
     # -> If necessary, loads pre-existing streamers from /data/streamers.csv
-    def compile_streamers_db(self, streamers = False, livestreams_limit = 9999999):
+    # -> if stop_at_view_cutoff=True, stops paging once livestreams drop below self.view_cutoff viewers (see .get_all_livestreams())
+    # -> if languages is a list of partitions (ie: default_language_partitions), pages through each partition in parallel
+    def compile_streamers_db(self, streamers = False, livestreams_limit = 9999999, stop_at_view_cutoff = False, languages = False):
 
         # load existing streamers
         if (streamers == False):
@@ -438,13 +778,11 @@ class Scraper():
 
 
         # get all livestreams currently on Twitch
-        streams = self.get_all_livestreams(livestreams_limit)
+        view_cutoff = self.view_cutoff if (stop_at_view_cutoff) else False
+        streams = self.get_all_livestreams(livestreams_limit, view_cutoff, languages)
         num_all_streams = len(streams)
-        streams, view_breakdowns = self.__filter_streams_by_views(streams, 4)
-        num_filtered = num_all_streams - len(streams)
-        self.reload_filter_logs()
-        self.filterLogs.add_filter(num_all_streams, num_filtered, 4, view_breakdowns)
-        self.filterLogs.export_to_csv()
+        streams, view_breakdowns = self.__filter_streams_by_views(streams, self.view_cutoff)
+        self.__log_filtered_streams(num_all_streams, len(streams), view_breakdowns, stop_at_view_cutoff)
 
         # loop over livestreams to access streamers
         # -> we can look up streamer profiles in bulk (batches of 100 IDs)
@@ -455,33 +793,251 @@ class Scraper():
 
             self.__print("BATCH " + str(i) + " / " + str(len(batches)))
 
-            # get a list of all streamer_ids for this batch
+            # search for streamer objects and add them to our collection
             batch = batches[i]
-            streamer_ids = []
-            stream_lookup = {}
-            for stream in batch:
-                streamer_ids.append(stream.user_id)
-                stream_lookup[stream.user_id] = stream
-
-            # search for streamer objects and create a lookup table {streamer_id -> streamer object}
-            # -> These have updated values, so we'll do our stream analysis on these and then call Streamers.update()
-            for user in self.twitchAPI.get_streamers(streamer_ids):
-                user_id = user['id']
-                stream = stream_lookup[user_id]
-                user['language'] = stream.language
-                streamers.add_or_update_streamer(user)
-                streamers.add_stream_data(stream_lookup[user_id])
+            streamer_ids, stream_lookup = self.__get_stream_lookup(batch)
+            users = self.twitchAPI.get_streamers(streamer_ids)
+            self.__add_streamers_from_lookup(streamers, users, stream_lookup)
+
+        self.__finish_compiling_streamers_db(streamers, len(streams))
+        return streamers
+
+
+    # async variant of .compile_streamers_db() that produces the same Streamers collection
+    # -> runs as a pipeline of stages connected by bounded queues, so it never holds every livestream in memory:
+    #    pages of Streams -> batcher (filters by views, emits batches of 100) -> max_in_flight helix/users lookups -> streamers
+    # -> a full queue blocks the stage that feeds it, so pagination can't run ahead of the lookups
+    # -> call with asyncio.run(scraper.compile_streamers_db_async(...))
+    async def compile_streamers_db_async(self, streamers = False, livestreams_limit = 9999999, max_in_flight = 8, stop_at_view_cutoff = False, languages = False):
+
+        # load existing streamers
+        if (streamers == False):
+            streamers = Streamers(self.filepaths['streamers'], self.filepaths['streamers_missing_videos'])
+            self.__print('Starting with ' + str(len(streamers.get_ids())) + ' streamers from CSV file')
+
+        partitions = languages if (languages != False) else [False]
+        asyncTwitchAPI = AsyncTwitchAPI(self.twitchAPI, max_in_flight, len(partitions))
+        self.__print('\nScraping Livestreams...')
+
+        progress = {
+            'num_all_streams': 0,
+            'num_streams': 0,
+            'num_batches': 0,
+            'view_breakdowns': self.__get_empty_view_breakdown()
+        }
+        page_queue   = asyncio.Queue(self.pipeline_pages_in_queue)
+        batch_queue  = asyncio.Queue(max_in_flight)
+        result_queue = asyncio.Queue()
+        stages = [
+            self.__page_livestreams_async(asyncTwitchAPI, page_queue, progress, livestreams_limit, stop_at_view_cutoff, partitions),
+            self.__batch_livestreams_async(page_queue, batch_queue, progress, max_in_flight)
+        ]
+        for i in range(max_in_flight):
+            stages.append(self.__lookup_batches_async(asyncTwitchAPI, batch_queue, result_queue))
+        stages.append(self.__add_streamers_from_results_async(streamers, result_queue, max_in_flight))
+
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            asyncTwitchAPI.close()
+
+        num_all_streams, num_streams = progress['num_all_streams'], progress['num_streams']
+        self.__print_filtered_streams(num_all_streams, num_streams, progress['view_breakdowns'])
+        self.__log_filtered_streams(num_all_streams, num_streams, progress['view_breakdowns'], stop_at_view_cutoff)
+        self.__finish_compiling_streamers_db(streamers, num_streams)
+        return streamers
+
+
+    # Stage 1: pages through helix/streams and puts each page's new Streams in page_queue
+    # -> each partition of languages is its own cursor chain, and the chains run at the same time
+    # -> ends by putting False in page_queue
+    async def __page_livestreams_async(self, asyncTwitchAPI, page_queue, progress, livestreams_limit, stop_at_view_cutoff, partitions):
+        livestream_ids = {} # <- shared by every chain, so a livestream is only counted once
+        chains = []
+        for languages in partitions:
+            chains.append(self.__page_livestream_partition_async(asyncTwitchAPI, page_queue, progress, livestream_ids, livestreams_limit, stop_at_view_cutoff, languages))
+        partition_stats = await asyncio.gather(*chains)
+
+        if (partitions != [False]):
+            self.__set_livestream_partition_stats(partitions, partition_stats)
+        await page_queue.put(False)
+
+
+    # pages through one cursor chain of helix/streams for Stage 1
+    # returns {'pages': int, 'seconds': float, 'livestreams': int}
+    async def __page_livestream_partition_async(self, asyncTwitchAPI, page_queue, progress, livestream_ids, livestreams_limit, stop_at_view_cutoff, languages):
+        start_time = time.time()
+        num_pages, num_new = 0, -1
+        num_livestreams = 0
+        livestreams, cursor = await self.__get_livestreams_page_async(asyncTwitchAPI, False, languages)
+        while ((len(livestreams) > 0) and (progress['num_all_streams'] < livestreams_limit) and (num_new != 0)):
+            num_pages += 1
+            min_views = livestreams[-1]['viewer_count']
+
+            page = []
+            for livestream in livestreams:
+                if (progress['num_all_streams'] < livestreams_limit):
+                    stream = Stream(livestream)
+                    if (stream.id not in livestream_ids):
+                        livestream_ids[stream.id] = 1
+                        progress['num_all_streams'] += 1
+                        page.append(stream)
+                min_views = min(min_views, livestream['viewer_count'])
+            num_new = len(page)
+            num_livestreams += num_new
+
+            await page_queue.put(page)
+            self.__print('livestreams: ' + str(len(livestream_ids)))
+            if ((cursor == False) or (stop_at_view_cutoff and (min_views < self.view_cutoff))):
+                break # <- no cursor means this was the last page
+            livestreams, cursor = await self.__get_livestreams_page_async(asyncTwitchAPI, cursor, languages)
+
+        return {'pages': num_pages, 'seconds': time.time() - start_time, 'livestreams': num_livestreams}
+
+
+    # returns a page of livestreams from TwitchAPI.get_livestreams()
+    # -> if Twitch can't be reached, returns an empty page, which ends pagination with the livestreams we already have
+    async def __get_livestreams_page_async(self, asyncTwitchAPI, cursor, languages):
+        try:
+            return await asyncTwitchAPI.get_livestreams(cursor, languages)
+        except APIRequestFailed as error:
+            self.__print('stopped paging through livestreams: ' + str(error))
+            return [], False
+
+
+    # Stage 2: filters Streams by views and puts (batch_num, batch of up to 100 Streams) in batch_queue
+    # -> ends by putting a False in batch_queue for each lookup worker
+    async def __batch_livestreams_async(self, page_queue, batch_queue, progress, num_workers):
+        batch = []
+        page = await page_queue.get()
+        while (page != False):
+            for stream in page:
+                self.__add_to_view_breakdown(progress['view_breakdowns'], stream.views)
+                if (stream.views >= self.view_cutoff):
+                    batch.append(stream)
+                    progress['num_streams'] += 1
+                    if (len(batch) == 100):
+                        await batch_queue.put((progress['num_batches'], batch))
+                        progress['num_batches'] += 1
+                        batch = []
+            page = await page_queue.get()
+
+        if (len(batch) > 0):
+            await batch_queue.put((progress['num_batches'], batch))
+            progress['num_batches'] += 1
+        for i in range(num_workers):
+            await batch_queue.put(False)
+
+
+    # Stage 3: looks up the streamers for each batch and puts (batch_num, users, stream_lookup) in result_queue
+    # -> ends by putting False in result_queue
+    async def __lookup_batches_async(self, asyncTwitchAPI, batch_queue, result_queue):
+        item = await batch_queue.get()
+        while (item != False):
+            batch_num, batch = item
+            streamer_ids, stream_lookup = self.__get_stream_lookup(batch)
+            users = await asyncTwitchAPI.get_streamers(streamer_ids)
+            await result_queue.put((batch_num, users, stream_lookup))
+            item = await batch_queue.get()
+        await result_queue.put(False)
+
+
+    # Stage 4: adds streamers in batch order, so io_ids get assigned the same way .compile_streamers_db() assigns them
+    # -> lookups can finish out of order, so results wait in a reorder buffer until every earlier batch has been added
+    async def __add_streamers_from_results_async(self, streamers, result_queue, num_workers):
+        waiting = {}
+        next_batch_num = 0
+        num_workers_done = 0
+        while (num_workers_done < num_workers):
+            result = await result_queue.get()
+            if (result == False):
+                num_workers_done += 1
+                continue
+
+            batch_num, users, stream_lookup = result
+            waiting[batch_num] = (users, stream_lookup)
+            while (next_batch_num in waiting):
+                users, stream_lookup = waiting.pop(next_batch_num)
+                self.__print("BATCH " + str(next_batch_num))
+                self.__add_streamers_from_lookup(streamers, users, stream_lookup)
+                next_batch_num += 1
+
+
+    # returns a tuple ([list of streamer_ids], {streamer_id: stream}) for a batch of streams
+    def __get_stream_lookup(self, batch):
+        streamer_ids = []
+        stream_lookup = {}
+        for stream in batch:
+            streamer_ids.append(stream.user_id)
+            stream_lookup[stream.user_id] = stream
+        return streamer_ids, stream_lookup
+
+
+    # takes the Twitch user objects from a batch lookup and adds/updates them in streamers
+    # -> These have updated values, so we'll do our stream analysis on these and then call Streamers.update()
+    def __add_streamers_from_lookup(self, streamers, users, stream_lookup):
+        for user in users:
+            user_id = user['id']
+            stream = stream_lookup[user_id]
+            user['language'] = stream.language
+            streamers.add_or_update_streamer(user)
+            streamers.add_stream_data(stream_lookup[user_id])
+
+
+    # records how many livestreams made it through the view filter in FilterLogs
+    # -> if pagination stopped at the view cutoff, we never saw most of the streams below the cutoff,
+    #    so the breakdown for those view levels is estimated (see .__estimate_view_breakdown())
+    def __log_filtered_streams(self, num_all_streams, num_streams, view_breakdowns, stopped_at_view_cutoff = False):
+        self.reload_filter_logs()
+        if (stopped_at_view_cutoff):
+            view_breakdowns = self.__estimate_view_breakdown(view_breakdowns)
+            num_all_streams = 0
+            for views, num_livestreams in view_breakdowns.items():
+                num_all_streams += num_livestreams
+
+        num_filtered = num_all_streams - num_streams
+        self.filterLogs.add_filter(num_all_streams, num_filtered, self.view_cutoff, view_breakdowns, stopped_at_view_cutoff)
+        self.filterLogs.export_to_csv()
+
+
+    # fills in the view levels below the cutoff for a pass that stopped paging at the cutoff
+    # -> uses the ratio of {below cutoff : at or above cutoff} streams from the latest full pass in FilterLogs
+    # -> if there hasn't been a full pass yet, the observed counts are kept as they are
+    def __estimate_view_breakdown(self, observed):
+        full_breakdown = self.filterLogs.get_latest_full_breakdown()
+        if (full_breakdown == False):
+            return observed
+
+        num_observed_above, num_full_above = 0, 0
+        for views in observed:
+            if (views >= self.view_cutoff):
+                num_observed_above += observed[views]
+                num_full_above += full_breakdown[views] if (views in full_breakdown) else 0
+        if (num_full_above == 0):
+            return observed
+
+        estimated = {}
+        for views in observed:
+            if (views >= self.view_cutoff):
+                estimated[views] = observed[views]
+            else:
+                num_full = full_breakdown[views] if (views in full_breakdown) else 0
+                estimated[views] = max(observed[views], int(round(num_observed_above * num_full / num_full_above)))
+        return estimated
+
+
+    # logs request stats and saves streamers once all livestreams have been processed
+    def __finish_compiling_streamers_db(self, streamers, num_streams):
 
         # record how many items were processed during the Twitch API's requests
-        self.twitchAPI.request_logs.set_number_of_items(len(streams))
+        self.twitchAPI.request_logs.set_number_of_items(num_streams)
 
         if (self.mode == 'cli'):
 
             # log request stats
             print('\n\nRequest Logs')
             self.twitchAPI.request_logs.print_stats()
-            num_streamers = len(streams)
-            self.twitchAPI.request_logs.export_to_csv(self.filepaths['logs'], 'streamers', num_streamers)
+            self.twitchAPI.request_logs.export_to_csv(self.filepaths['logs'], 'streamers', num_streams)
             streamers.export_to_csv(self.filepaths['streamers'])
 
             # log a snapshot of the data
@@ -490,59 +1046,128 @@ class Scraper():
             print('\n\nSnapshot of the Database:')
             for key, value in insights.items():
                 print(key, "\n ->", value, "\n")
-        return streamers
 
 
     # returns all livestreams up to a limit
     # -> uses a lookup table of already observed livestream IDs to make sure we know when to end
-    def get_all_livestreams(self, limit = 9999999):
+    # -> helix/streams is sorted by viewer_count (descending), so if a view_cutoff is given we stop
+    #    after the first page that has a livestream with fewer than view_cutoff viewers
+    # -> if languages is a list of partitions (ie: default_language_partitions), each partition is paged through
+    #    on its own thread and the results are merged (most viewers first, like a single cursor chain returns them)
+    def get_all_livestreams(self, limit = 9999999, view_cutoff = False, languages = False):
 
         self.__print('\nScraping Livestreams...')
 
+        if (languages == False):
+            streams, stats = self.__get_livestreams_in_partition(limit, view_cutoff)
+            return streams
+
+        with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+            results = list(executor.map(lambda partition: self.__get_livestreams_in_partition(limit, view_cutoff, partition), languages))
+
+        # a livestream can change language while we page, so it may show up in more than one partition
         streams = []
-        livestreams, cursor = self.twitchAPI.get_livestreams()
+        livestream_ids = {}
+        for partition_streams, stats in results:
+            for stream in partition_streams:
+                if (stream.id not in livestream_ids):
+                    livestream_ids[stream.id] = 1
+                    streams.append(stream)
+        streams.sort(key=lambda stream: stream.views, reverse=True)
+
+        self.__set_livestream_partition_stats(languages, [stats for partition_streams, stats in results])
+        return streams[:limit]
+
+
+    # pages through one cursor chain of helix/streams
+    # returns a tuple ([list of Streams], {'pages': int, 'seconds': float, 'livestreams': int})
+    def __get_livestreams_in_partition(self, limit = 9999999, view_cutoff = False, languages = False):
+        start_time = time.time()
+        num_pages = 0
+        streams = []
+        livestreams, cursor = self.__get_livestreams_page(False, languages)
         livestream_ids = {}
         old_num_livestreams = -1
-        while ((len(livestreams) > 0) and (len(streams) < limit) and (cursor != False) and (old_num_livestreams != len(livestream_ids))):
+        while ((len(livestreams) > 0) and (len(streams) < limit) and (old_num_livestreams != len(livestream_ids))):
             old_num_livestreams = len(livestream_ids)
+            num_pages += 1
 
+            min_views = livestreams[-1]['viewer_count']
             for livestream in livestreams:
                 if (len(streams) < limit):
                     stream = Stream(livestream)
                     if (stream.id not in livestream_ids):
                         streams.append(stream)
                         livestream_ids[stream.id] = 1
+                min_views = min(min_views, livestream['viewer_count'])
 
-            self.__print('livestreams: ' + str(len(livestream_ids)))
-            livestreams, cursor = self.twitchAPI.get_livestreams(cursor)
-        return streams
+            self.__print('livestreams: ' + str(len(livestream_ids)) + ('' if (languages == False) else ' (' + self.__get_partition_name(languages) + ')'))
+            if ((cursor == False) or ((view_cutoff != False) and (min_views < view_cutoff))):
+                break # <- no cursor means this was the last page
+            livestreams, cursor = self.__get_livestreams_page(cursor, languages)
+        return streams, {'pages': num_pages, 'seconds': time.time() - start_time, 'livestreams': len(streams)}
+
+
+    # returns a page of livestreams from TwitchAPI.get_livestreams()
+    # -> if Twitch can't be reached, returns an empty page, which ends pagination with the livestreams we already have
+    def __get_livestreams_page(self, cursor, languages):
+        try:
+            return self.twitchAPI.get_livestreams(cursor, languages)
+        except APIRequestFailed as error:
+            self.__print('stopped paging through livestreams: ' + str(error))
+            return [], False
+
+
+    # saves (and prints) how long each partition of a partitioned livestream scrape took
+    # -> the slowest partitions set the pace, so use this to decide which languages deserve their own partition
+    def __set_livestream_partition_stats(self, partitions, partition_stats):
+        self.livestream_partition_stats = {}
+        for i in range(len(partitions)):
+            self.livestream_partition_stats[self.__get_partition_name(partitions[i])] = partition_stats[i]
+
+        self.__print('\nLivestream partitions:')
+        for name, stats in sorted(self.livestream_partition_stats.items(), key=lambda item: item[1]['seconds'], reverse=True):
+            self.__print(' - ' + name + ': ' + str(stats['pages']) + ' pages, ' + str(stats['livestreams']) + ' livestreams, ' + str(round(stats['seconds'], 2)) + 's')
+
+    def __get_partition_name(self, languages):
+        return languages if (isinstance(languages, str)) else ','.join(languages)
 
     # filters streams to make sure only streams that have N or more viewers are included
     def __filter_streams_by_views(self, streams_list, filter_amount = 4):
         filtered_streams = []
-        filtered_levels = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        filtered_levels = self.__get_empty_view_breakdown()
         for stream in streams_list:
             if (stream.views >= filter_amount):
                 filtered_streams.append(stream)
+            self.__add_to_view_breakdown(filtered_levels, stream.views)
 
-            if (stream.views >= 5):
-                filtered_levels[5] += 1
-            elif (stream.views == 4):
-                filtered_levels[4] += 1
-            elif (stream.views == 3):
-                filtered_levels[3] += 1
-            elif (stream.views == 2):
-                filtered_levels[2] += 1
-            elif (stream.views == 1):
-                filtered_levels[1] += 1
-            else:
-                filtered_levels[0] += 1
-
-        self.__print('Filtered out ' + str(len(streams_list) - len(filtered_streams)) + ' streams for having fewer than ' + str(filter_amount) + ' viewers')
-        self.__print(str(len(filtered_streams)) + ' streams remain')
-        self.__print(filtered_levels)
+        self.__print_filtered_streams(len(streams_list), len(filtered_streams), filtered_levels, filter_amount)
         return filtered_streams, filtered_levels
 
+    # view breakdowns have form {# views -> # livestreams}, where 5 means 5 or more viewers
+    def __get_empty_view_breakdown(self):
+        return {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+
+    def __add_to_view_breakdown(self, breakdown, views):
+        if (views >= 5):
+            breakdown[5] += 1
+        elif (views == 4):
+            breakdown[4] += 1
+        elif (views == 3):
+            breakdown[3] += 1
+        elif (views == 2):
+            breakdown[2] += 1
+        elif (views == 1):
+            breakdown[1] += 1
+        else:
+            breakdown[0] += 1
+
+    def __print_filtered_streams(self, num_all_streams, num_streams, breakdown, filter_amount = False):
+        filter_amount = self.view_cutoff if (filter_amount == False) else filter_amount
+        self.__print('Filtered out ' + str(num_all_streams - num_streams) + ' streams for having fewer than ' + str(filter_amount) + ' viewers')
+        self.__print(str(num_streams) + ' streams remain')
+        self.__print(breakdown)
+
 
     # takes in a list of items l
     # returns a list of n batch_sized lists with items distributed into batches
@@ -550,17 +1175,58 @@ class Scraper():
     #    -> [ [1, 2], [3, 4], [5] ]
     def create_batches(self, l, batch_size):
         new_list = []
-        i = 0
-        new_list.append([])
-        for item in l:
-            if (len(new_list[i]) >= batch_size):
-                new_list.append([])
-                i += 1
-            else:
-                new_list[i].append(item)
+        for i in range(0, len(l), batch_size):
+            new_list.append(l[i:i + batch_size])
         return new_list
 
 
+    # Resolve Twitch Games -----------------------------------------------------
+
+    # maps every game in the streamers' stream_history (Twitch game ids from livestreams, game names from videos) to an IGDB id
+    # -> names of Twitch game ids come from one TwitchAPI.get_games() request per 100 ids
+    # -> names are resolved against games.csv first, and only the rest are looked up on IGDB (50 names per request)
+    # -> games found on IGDB are added to games.csv, and every resolved name is kept in twitch_to_igdb.csv for next time
+    def resolve_games_to_igdb(self, streamers = False, games = False):
+
+        if (streamers == False):
+            streamers = Streamers(self.filepaths['streamers'], self.filepaths['streamers_missing_videos'])
+        if (games == False):
+            games = Games(self.filepaths['games'])
+        twitch_to_igdb = TwitchToIGDB(games, self.filepaths['twitch_to_igdb'])
+
+        # 1) collect every game played by the streamers
+        twitch_ids, twitch_names = set(), set()
+        for streamer_id in streamers.get_ids():
+            livestreams, videos = streamers.get(streamer_id).get_games_played()
+            twitch_ids.update(livestreams)
+            twitch_names.update(videos)
+
+        # 2) get the names of Twitch games we haven't seen before
+        unknown_ids = twitch_to_igdb.get_unknown_twitch_ids(sorted(twitch_ids))
+        for batch in self.create_batches(unknown_ids, 100):
+            for twitch_game in self.twitchAPI.get_games(batch):
+                twitch_to_igdb.add_twitch_game(twitch_game['id'], twitch_game['name'])
+
+        # 3) look up names that games.csv couldn't resolve on IGDB
+        unresolved_names = twitch_to_igdb.get_unresolved_names(sorted(twitch_names))
+        self.__print('resolving ' + str(len(twitch_ids) + len(twitch_names)) + ' games, ' + str(len(unresolved_names)) + ' need to be looked up on IGDB')
+        found_games, searched_names = self.igdbAPI.search_for_games_by_names(unresolved_names)
+        for igdb_game_obj in found_games:
+            games.add_new_game(igdb_game_obj)
+            twitch_to_igdb.add_game(games.get(igdb_game_obj['id']))
+        for name in searched_names:
+            igdb_id = twitch_to_igdb.resolve_name(name)
+            twitch_to_igdb.add_resolved_name(name, igdb_id if (igdb_id != False) else 0)
+
+        if (self.mode == 'cli'):
+            self.igdbAPI.request_logs.print_stats()
+            self.igdbAPI.request_logs.export_to_csv(self.filepaths['logs'], 'twitch_to_igdb', len(unresolved_names))
+            if (len(found_games) > 0):
+                games.export_to_csv(self.filepaths['games'])
+            twitch_to_igdb.export_to_csv(self.filepaths['twitch_to_igdb'])
+        return twitch_to_igdb
+
+
     # Scrape Videos ------------------------------------------------------------
 
     # .compile_streamers_db() doesn't add video data to streamer profiles because that would take too long
@@ -581,7 +1247,11 @@ class Scraper():
 
         for i in range(streamers_to_scrape):
             streamer_id = streamer_ids[i]
-            videos = self.get_all_videos_for_streamer(streamer_id, video_limit)
+            try:
+                videos = self.get_all_videos_for_streamer(streamer_id, video_limit)
+            except APIRequestFailed as error:
+                self.__print(str(i) + ': streamer=' + str(streamer_id) + ', skipped: ' + str(error)) # <- not marked as missing videos, so we try again next time
+                continue
             self.__print(str(i) + ': streamer=' + str(streamer_id) + ', #videos=' + str(len(videos)))
 
             if (len(videos) == 0):
@@ -593,6 +1263,8 @@ class Scraper():
 
         # record how many items were processed during this interaction
         self.twitchAPI.request_logs.set_number_of_items(streamers_to_scrape)
+        if (self.twitchAPI.video_game_cache != False):
+            self.twitchAPI.video_game_cache.sync()
 
         if (self.mode == 'cli'):
 
@@ -627,25 +1299,30 @@ class Scraper():
     # Scrape Follower Counts ---------------------------------------------------
 
     # loads all the streamers from the streamers.csv file and searches for follower data for them
+    # -> scrapes the `limit` streamers that need it most (see Streamers.get_next_ids_with_missing_follower_data())
     def add_followers_to_streamers_db(self, streamers = False, limit = 9999999):
 
         if (streamers == False):
             streamers = Streamers(self.filepaths['streamers'], self.filepaths['streamers_missing_videos'])
-        streamer_ids = streamers.get_ids_with_missing_follower_data()
+        streamer_ids = streamers.get_next_ids_with_missing_follower_data(limit)
 
         # we can't add followers if there are no streamer profiles to add to
         if (len(streamer_ids) == 0):
             return streamers
 
         # get the number of streamers we will be processing
-        num_streamers_to_process = limit if (limit < len(streamer_ids)) else len(streamer_ids)
-        self.__print("scraping followers for " + str(num_streamers_to_process) + " streamers (out of " + str(len(streamer_ids)) + " possible)")
+        num_streamers_to_process = len(streamer_ids)
+        self.__print("scraping followers for " + str(num_streamers_to_process) + " streamers")
 
         # iterate over each streamer object and add a followers count to their profile
         for i in range(num_streamers_to_process):
             streamer_id = streamer_ids[i]
             self.__print(str(i) + ': ' + str(streamer_ids[i]))
-            num_followers = self.twitchAPI.get_followers(streamer_id)
+            try:
+                num_followers = self.twitchAPI.get_followers(streamer_id)
+            except APIRequestFailed as error:
+                self.__print(str(i) + ': skipped: ' + str(error))
+                continue
             streamers.add_follower_data(streamer_id, num_followers)
 
         # record how many items were processed during this interaction
@@ -676,15 +1353,18 @@ def run():
     parser = argparse.ArgumentParser()
     parser.add_argument('-g', '--games', dest='games', action="store_true", help='scrapes games from IGDB into /data/games.csv')
     parser.add_argument('-s', '--streamers', dest='streamers', action="store_true", help='scrapes all livestreams from Twitch and compiles corresponding streamer profiles into /data/streamers.csv')
+    parser.add_argument('-r', '--resolve-games', dest='resolve_games', action="store_true", help='maps the games in /data/streamers to IGDB games in /data/twitch_to_igdb.csv')
     parser.add_argument('-v', '--videos', dest='videos', type=int, const=-1, nargs='?', help='scrapes video data for the N most popular streamers in the dataset that do not already have video data. If N missing, scrapes for all applicable streamers in dataset.')
     parser.add_argument('-f', '--followers', dest='followers', type=int, const=9999999, nargs='?', help='scrapes follower counts for the N most popular streamers in dataset that have not already had their follower count been recorded within the last 24 hours. If N missing, scrapes all applicable streamers in dataset.')
     args = parser.parse_args()
 
     # perform actions !
     if args.games:
-        scraper.compile_games_db()
+        scraper.compile_games_db(9999999, True)
     if args.streamers:
-        scraper.compile_streamers_db()
+        asyncio.run(scraper.compile_streamers_db_async())
+    if args.resolve_games:
+        scraper.resolve_games_to_igdb()
     if args.videos:
         if (args.videos == -1):
             scraper.add_videos_to_streamers_db()
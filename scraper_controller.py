@@ -12,9 +12,11 @@
 #   -> Over time, it will scrape video data for every streamer
 #
 
+import os
 import sys
 import time
 import json
+import asyncio
 import datetime
 import threading
 
@@ -34,11 +36,16 @@ __thread_id_followers   = 'followers'
 __no_limit             = 9999999 # <- int that represents positive infinity
 __videos_batch_size    = 10      # <- number of streamers to scrape video info for (before saving results and starting again)
 __followers_batch_size = 500     # <- number of streamers to scrape follower info for (before saving results and starting again)
+__followers_popularity_weight = 60 * 60 * 2 # <- every 10x followers moves a streamer 2 hours up the follower refresh queue
+__full_livestream_pass_every = 8 # <- other livestream passes stop paging at the view cutoff, so every Nth pass scrapes every
+                                 #    livestream to give FilterLogs a fresh breakdown to estimate from
 
 
 # filepaths to load Streamers from
 __streamers_folderpath              = './data/streamers'
 __streamers_missing_videos_filepath = './data/streamers_missing_videos.csv'
+__num_cpus = (os.cpu_count() or 1) # <- os.cpu_count() returns None when it can't tell
+__streamers_num_processes = __num_cpus if (__num_cpus > 1) else False # <- processes that load and export Streamers shards
 
 # Time each thread will sleep for after executing
 __sleep_between_livestreams   = 60 * 15 # <- 15 minutes
@@ -89,6 +96,7 @@ def thread_scrape_livestreams(thread_id):
     scraper = Scraper(json.load(credentials), 'production')
 
     print_from_thread(thread_id, 'initialized')
+    num_passes = 0
 
     while(1):
 
@@ -105,7 +113,9 @@ def thread_scrape_livestreams(thread_id):
         work[thread_id]['status'] = 'working'
         work[thread_id]['last_started_work'] = get_current_time()
         print_from_thread(thread_id, 'woken up by main thread; starting work now')
-        work[thread_id]['streamers'] = scraper.compile_streamers_db(work[thread_id]['streamers'])
+        stop_at_view_cutoff = (num_passes % __full_livestream_pass_every != 0)
+        work[thread_id]['streamers'] = asyncio.run(scraper.compile_streamers_db_async(work[thread_id]['streamers'], __no_limit, 8, stop_at_view_cutoff))
+        num_passes += 1
 
         # done
         print_from_thread(thread_id, 'work complete; sleeping until woken up by main thread')
@@ -179,7 +189,7 @@ def thread_scrape_followers(thread_id):
         work[thread_id]['status'] = 'working'
         work[thread_id]['last_started_work'] = get_current_time()
         scraper.twitchAPI.request_logs.reset()
-        if (len(work[thread_id]['streamers'].get_ids_with_missing_follower_data()) > 0):
+        if (len(work[thread_id]['streamers'].get_next_ids_with_missing_follower_data(1)) > 0):
             print_from_thread(thread_id, "woken up by main thread; starting work now")
             work[thread_id]['streamers'] = scraper.add_followers_to_streamers_db(work[thread_id]['streamers'], __followers_batch_size)
             print_from_thread(thread_id, "work complete; sleeping until woken by main thread")
@@ -260,7 +270,7 @@ def create_worker_thread(streamers, thread_id):
     worker_threads[thread_id] = threading.Thread(target=starting_function, args=(thread_id, ))
     thread_locks[thread_id]   = threading.Condition()
     work[thread_id] = {
-        'streamers': streamers.clone(),
+        'streamers': streamers.snapshot(),
         'status': 'waiting',
         'last_started_work': get_current_time(),
         'request_logs': False
@@ -279,7 +289,9 @@ def get_request_logs_filepath():
 def main_thread():
 
     # instantiate Streamers
-    streamers = Streamers(__streamers_folderpath, __streamers_missing_videos_filepath)
+    streamers = Streamers(__streamers_folderpath, __streamers_missing_videos_filepath, __streamers_num_processes)
+    streamers.set_follower_popularity_weight(__followers_popularity_weight)
+    streamers.build_follower_refresh_queue() # <- the followers thread's snapshots share it instead of each building their own
     current_month = datetime.datetime.now().strftime("%Y-%m")
     insights  = Insights('production', current_month)
     insights.set_logging(True)
@@ -311,7 +323,8 @@ def main_thread():
                 thread_locks[thread_id].acquire()
 
                 # save work done by thread
-                streamers.merge(work[thread_id]['streamers'])
+                # -> the thread's snapshot tracks what it changed, so only those streamers have to be merged
+                streamers.apply_changes(work[thread_id]['streamers'].get_changes())
                 streamers.export_to_csv(__streamers_folderpath)
 
                 # log thread actions
@@ -325,7 +338,7 @@ def main_thread():
                     insights.get_snapshot_of_streamers_db()
 
                 # reset the thread and get it ready to work
-                work[thread_id]['streamers'] = streamers.clone()
+                work[thread_id]['streamers'] = streamers.snapshot()
                 work[thread_id]['status'] = 'waiting'
 
                 thread_locks[thread_id].notify_all()
@@ -336,7 +349,7 @@ def main_thread():
         # update any threads who can't do work because their streamers clone is expired
         for thread_id in work:
             if (work[thread_id]['status'] == 'needs_update'):
-                work[thread_id]['streamers'] = streamers.clone()
+                work[thread_id]['streamers'] = streamers.snapshot()
                 work[thread_id]['status'] = 'waiting'
                 thread_locks[thread_id].acquire() # <- wake up the thread if its sleeping
                 thread_locks[thread_id].notify_all()
@@ -7,22 +7,57 @@
 # - Streamer is a Twitch streamer
 # - Streamers is a collection of streamers and is responsible for all bulk operations like importing/exporting from csv
 #
+# There are hundreds of thousands of Streamers (and tens of thousands of Streams per livestream pass) in memory at once,
+# so Stream, Streamer and StreamerTimestamps use __slots__ instead of a __dict__, and strings that repeat across them
+# (languages, game names) are interned so every object shares one copy
+# - the dates in each Streamer's stream_history are kept in GameHistory objects, as packed arrays of ints
+#
 
 # Imports ----------------------------------------------------------------------
 
 import os
 import sys
 import csv
+import gzip
 import json
+import math
 import time
 import zipfile
+import heapq
+import bisect
 import datetime
+import threading
+import multiprocessing
 
+from array import array
 from zipfile import *
 from io import StringIO
 from io import TextIOWrapper
+from concurrent.futures import ProcessPoolExecutor
 csv.field_size_limit(sys.maxsize) # <- so csv can load very large fields
 
+# Constants --------------------------------------------------------------------
+
+# streamers whose latest follower count is older than this (in seconds) need a new one
+follower_refresh_interval = 60 * 60 * 24
+
+# a LayeredDict merges its layers together once it has more than this many
+max_dict_layers = 4
+
+# ActivityIndex puts dates into buckets of this many seconds
+activity_bucket_size = 60 * 60 * 24
+
+# Streamers.export_to_csv() lists the shard files in this file, in the streamers folder
+streamers_manifest_filename = 'manifest.json'
+
+# every field a Streamer keeps a "last updated" timestamp for
+streamer_fields = ['io_id', 'streamer_id', 'login', 'display_name', 'profile_image_url', 'view_counts', 'description', 'follower_counts', 'language', 'stream_history']
+
+
+# returns the process-wide copy of a string, so equal strings share memory
+def intern_string(value):
+    return sys.intern(value) if (isinstance(value, str)) else value
+
 
 # ==============================================================================
 # Stream
@@ -30,6 +65,8 @@ csv.field_size_limit(sys.maxsize) # <- so csv can load very large fields
 
 class Stream():
 
+    __slots__ = ('id', 'user_id', 'twitch_game_id', 'game_name', 'language', 'date', 'views', 'is_livestream', 'title')
+
     def __init__(self, twitch_obj, is_livestream = True):
 
         # livestreams and videos have different access keys
@@ -43,8 +80,8 @@ class Stream():
         self.id             = int(twitch_obj['id'])
         self.user_id        = int(twitch_obj['user_id'])
         self.twitch_game_id = int(twitch_obj['game_id']) if ('game_id' in twitch_obj and twitch_obj['game_id'] != '') else 0
-        self.game_name      = twitch_obj['game_name'] if ('game_name' in twitch_obj) else ""
-        self.language       = twitch_obj['language']
+        self.game_name      = intern_string(twitch_obj['game_name']) if ('game_name' in twitch_obj) else ""
+        self.language       = intern_string(twitch_obj['language'])
         self.date           = epoch
         self.views          = twitch_obj[views_key]
         self.is_livestream  = is_livestream
@@ -60,12 +97,129 @@ class Stream():
         print("livestream: ", self.is_livestream)
         print("-")
 
+# ==============================================================================
+# GameHistory
+# ==============================================================================
+
+# the history of a streamer playing one game: an entry of Streamer.stream_history
+# - dates are stored as two packed arrays of ints (when each stream was streamed and when it was scraped),
+#   instead of a list of {'streamed': int, 'scraped': int} dicts, which take hundreds of bytes each
+# - it can still be read like the dict it replaces: history['views'], len(history['dates']), history['dates'][0]['streamed']
+# - it is only converted back into that dict (see .to_dict()) when streamers are exported
+class GameHistory():
+
+    __slots__ = ('views', 'recent', 'videos', 'streamed', 'scraped')
+    fields = ('views', 'recent', 'videos', 'dates') # <- the keys of its dict form
+
+    def __init__(self, views = 0, recent = 0, videos = 0):
+        self.views    = views
+        self.recent   = recent
+        self.videos   = videos
+        self.streamed = array('q')
+        self.scraped  = array('q')
+
+    # creates a GameHistory from its dict form: {'views': int, 'recent': int, 'videos': int, 'dates': [{'streamed': int, 'scraped': int}]}
+    @staticmethod
+    def from_dict(obj):
+        history = GameHistory(obj.get('views', 0), obj.get('recent', 0), obj.get('videos', 0))
+        for date_obj in obj.get('dates', []):
+            history.add_date(date_obj['streamed'], date_obj['scraped'])
+        return history
+
+    def add_date(self, streamed, scraped):
+        self.streamed.append(streamed)
+        self.scraped.append(scraped)
+
+    def copy(self):
+        history = GameHistory(self.views, self.recent, self.videos)
+        history.streamed = array('q', self.streamed)
+        history.scraped  = array('q', self.scraped)
+        return history
+
+    def to_dict(self):
+        return {'views': self.views, 'recent': self.recent, 'videos': self.videos, 'dates': list(self['dates'])}
+
+
+    # dict style access ---------------------------------------------------------
+
+    def __getitem__(self, key):
+        if (key == 'dates'):
+            return GameHistoryDates(self)
+        if (key not in GameHistory.fields):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if (key == 'dates'):
+            self.streamed, self.scraped = array('q'), array('q')
+            for date_obj in value:
+                self.add_date(date_obj['streamed'], date_obj['scraped'])
+        elif (key in GameHistory.fields):
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in GameHistory.fields
+
+
+# read-only list of {'streamed': int, 'scraped': int} dicts over a GameHistory's arrays (what GameHistory['dates'] returns)
+# -> .append() adds a date to the GameHistory
+class GameHistoryDates():
+
+    __slots__ = ('history',)
+
+    def __init__(self, history):
+        self.history = history
+
+    def __len__(self):
+        return len(self.history.streamed)
+
+    def __getitem__(self, i):
+        return {'streamed': self.history.streamed[i], 'scraped': self.history.scraped[i]}
+
+    def __iter__(self):
+        for i in range(len(self.history.streamed)):
+            yield {'streamed': self.history.streamed[i], 'scraped': self.history.scraped[i]}
+
+    def append(self, date_obj):
+        self.history.add_date(date_obj['streamed'], date_obj['scraped'])
+
+
 # ==============================================================================
 # Streamer
 # ==============================================================================
 
+# when each of a Streamer's fields was last changed, used by Streamer.merge() to pick the most recent values
+# -> read and written like a dict: timestamps['login']
+class StreamerTimestamps():
+
+    __slots__ = tuple(streamer_fields)
+
+    def __init__(self, timestamp = 0):
+        for field in streamer_fields:
+            setattr(self, field, timestamp)
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __setitem__(self, field, timestamp):
+        setattr(self, field, timestamp)
+
+    def copy(self):
+        timestamps = StreamerTimestamps()
+        for field in streamer_fields:
+            setattr(timestamps, field, getattr(self, field))
+        return timestamps
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in streamer_fields}
+
+
 class Streamer():
 
+    __slots__ = tuple(streamer_fields) + ('timestamps', 'latest_date', 'latest_games')
+
     def __init__(self, streamer_obj, from_csv = False):
         if (from_csv):
             self.io_id             = int(streamer_obj['io_id'])
@@ -76,7 +230,7 @@ class Streamer():
             self.view_counts       = json.loads(streamer_obj['view_counts'])
             self.description       = streamer_obj['description']
             self.follower_counts   = json.loads(streamer_obj['follower_counts'])
-            self.language          = streamer_obj['language']
+            self.language          = intern_string(streamer_obj['language'])
             self.stream_history    = self.__load_stream_history(streamer_obj['stream_history'])
 
         else:
@@ -88,14 +242,16 @@ class Streamer():
             self.view_counts       = [ {'views': streamer_obj['view_count'], 'date': int(time.time())} ]
             self.description       = streamer_obj['description']
             self.follower_counts   = streamer_obj['follower_counts'] if ('follower_counts' in streamer_obj) else []
-            self.language          = streamer_obj['language'] if ('language' in streamer_obj) else ""
-            self.stream_history    = {} # will have format {twitch_game_id: num_times_played}
+            self.language          = intern_string(streamer_obj['language']) if ('language' in streamer_obj) else ""
+            self.stream_history    = {} # will have format {twitch_game_id (or game_name for videos): GameHistory}
 
 
         # initialize timestamps for when values were last changed
-        self.timestamps = {}
-        fields = ['io_id', 'streamer_id', 'login', 'display_name', 'profile_image_url', 'view_counts', 'description', 'follower_counts', 'language', 'stream_history']
-        self.__set_timestamps_for_fields(fields)
+        self.timestamps = StreamerTimestamps(int(time.time()))
+
+        # the latest date in stream_history, and the games streamed on it (see .get_most_recent_streamed_games())
+        # -> kept up to date as streams are added, so adding a stream doesn't have to look through every date
+        self.__index_most_recent_streamed_games()
         return
 
     # updates the "last updated" timestamp for every key in names
@@ -106,14 +262,13 @@ class Streamer():
 
 
     # stream history, when JSONified, converts all game_ids into strings, even the ints
-    # -> we need to re-intify those game_ids
+    # -> we need to re-intify those game_ids (and intern the game names, which repeat across streamers)
     def __load_stream_history(self, obj):
         stream_history = {}
         obj = json.loads(obj)
         for key, value in obj.items():
-            if (self.__check_if_str_is_int(key)):
-                key = int(key)
-            stream_history[key] = value
+            key = int(key) if (self.__check_if_str_is_int(key)) else intern_string(key)
+            stream_history[key] = GameHistory.from_dict(value)
         return stream_history
 
     def __check_if_str_is_int(self, str):
@@ -123,10 +278,45 @@ class Streamer():
         except ValueError:
             return False
 
+    # sets self.latest_date and self.latest_games from all of stream_history
+    def __index_most_recent_streamed_games(self):
+        self.latest_date = 0
+        self.latest_games = set()
+        for game, history in self.stream_history.items():
+            if (len(history.streamed) > 0):
+                self.__add_to_most_recent_streamed_games(game, max(history.streamed))
+
+    def __add_to_most_recent_streamed_games(self, game, streamed):
+        if (streamed > self.latest_date):
+            self.latest_date = streamed
+            self.latest_games = {game}
+        elif (streamed == self.latest_date):
+            self.latest_games.add(game)
+
+    # Streamers are pickled when they're sent to and from processes that load and export shards (see get_shard_process_pool())
+    # -> unpickled strings aren't interned, so this interns them again
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in Streamer.__slots__)
+
+    def __setstate__(self, state):
+        for field, value in zip(Streamer.__slots__, state):
+            setattr(self, field, value)
+        self.language = intern_string(self.language)
+        self.stream_history = {intern_string(game): history for game, history in self.stream_history.items()}
+        self.latest_games = set(intern_string(game) for game in self.latest_games)
+
     # Creates and returns a new Streamer object that is identical to this one
+    # -> copies each field directly, instead of round tripping through .to_exportable_dict() and json
     def clone(self):
-        new_streamer = Streamer(self.to_exportable_dict(), True)
-        new_streamer.timestamps = self.timestamps
+        new_streamer = Streamer.__new__(Streamer)
+        for field in streamer_fields:
+            setattr(new_streamer, field, getattr(self, field)) # <- the rest of the fields are strings and ints
+        new_streamer.view_counts     = [dict(obj) for obj in self.view_counts]
+        new_streamer.follower_counts = [dict(obj) for obj in self.follower_counts]
+        new_streamer.stream_history  = {game: history.copy() for game, history in self.stream_history.items()}
+        new_streamer.timestamps   = self.timestamps.copy()
+        new_streamer.latest_date  = self.latest_date
+        new_streamer.latest_games = set(self.latest_games)
         return new_streamer
 
 
@@ -139,13 +329,13 @@ class Streamer():
         self.login             = streamer_obj['login']
         self.profile_image_url = streamer_obj['profile_image_url']
         self.description       = streamer_obj['description']
-        self.language          = streamer_obj['language'] if ('language' in streamer_obj) else self.language
+        self.language          = intern_string(streamer_obj['language']) if ('language' in streamer_obj) else self.language
         self.__set_timestamps_for_fields(['display_name', 'login', 'profile_image_url', 'description', 'language'])
 
         # if the most recent view_count is in the last 24 hours, we can just modify that instead of adding a new entry
         current_time = int(time.time())
         yesterday = current_time - (60*60*24)
-        if (len(self.get_view_counts_in_range(yesterday, current_time)) > 0):
+        if (self.has_view_count_since(yesterday)):
             self.view_counts[-1]['views'] = streamer_obj['view_count']
             self.view_counts[-1]['date'] = current_time
         else:
@@ -158,45 +348,51 @@ class Streamer():
         self.__set_timestamps_for_fields(['follower_counts'])
 
     # adds data from a video or livestream
+    # returns a tuple (changed, added_date)
+    # -> changed is False if the stream was already recorded and nothing in stream_history changed
+    # -> added_date is True if a new date was added to stream_history (False if it only updated the views of the current stream)
     def add_stream_data(self, stream):
 
-        def get_date_obj(streamed_date):
-            return {'streamed': streamed_date, 'scraped': int(time.time())}
-
         # add game info
         game_key = stream.twitch_game_id if (stream.is_livestream) else stream.game_name
         views_contributed = stream.views if (stream.is_livestream) else 0
         videos_contributed = 0 if (stream.is_livestream) else 1
-        last_stream_date, recent_streamed_games = self.get_most_recent_streamed_games()
+        recent_streamed_games = self.latest_games
 
 
         if (game_key in self.stream_history):
 
-            self.stream_history[game_key]['videos'] += videos_contributed
+            history = self.stream_history[game_key]
+            history.videos += videos_contributed
 
             # if the current stream has *just* switched over to this stream, record its views
             if (game_key not in recent_streamed_games):
-                self.stream_history[game_key]['dates'].append(get_date_obj(stream.date))
-                self.stream_history[game_key]['recent'] = views_contributed
-                self.stream_history[game_key]['views'] += views_contributed
+                history.add_date(stream.date, int(time.time()))
+                history.recent = views_contributed
+                history.views += views_contributed
+                self.__add_to_most_recent_streamed_games(game_key, stream.date)
                 self.__set_timestamps_for_fields(['stream_history'])
+                return (True, True)
             else:
                 # if we have already recorded the current stream with this game,
                 # -> we only want to update the views contributed if its greater than last time
-                if (self.stream_history[game_key]['recent'] < views_contributed):
-                    self.stream_history[game_key]['views'] -= self.stream_history[game_key]['recent']
-                    self.stream_history[game_key]['views'] += views_contributed
-                    self.stream_history[game_key]['recent'] = views_contributed
+                changed = (videos_contributed > 0)
+                if (history.recent < views_contributed):
+                    history.views -= history.recent
+                    history.views += views_contributed
+                    history.recent = views_contributed
+                    changed = True
+                if (changed):
                     self.__set_timestamps_for_fields(['stream_history'])
+                return (changed, False)
 
         else:
-            self.stream_history[game_key] = {
-                'views': views_contributed,
-                'recent': views_contributed,
-                'videos': videos_contributed,
-                'dates': [get_date_obj(stream.date)]
-            }
+            history = GameHistory(views_contributed, views_contributed, videos_contributed)
+            history.add_date(stream.date, int(time.time()))
+            self.stream_history[game_key] = history
+            self.__add_to_most_recent_streamed_games(game_key, stream.date)
             self.__set_timestamps_for_fields(['stream_history'])
+            return (True, True)
 
 
     # sets the io_id for this streamer
@@ -216,7 +412,8 @@ class Streamer():
     # - Pick the most current:          [display_name, profile_image_url, login, description, language]
     # - Pick the longest:               [follower_counts, view_counts]
     # - Pick the longest for each item: [stream_history]
-    def merge(self, s2):
+    # -> if fields is given, only those fields are merged (see Streamers.apply_changes())
+    def merge(self, s2, fields = False):
 
         # used for picking the most recent version of objects when merging
         def __choose_most_recent(obj1, obj2, key, timestamps1, timestamps2):
@@ -234,51 +431,52 @@ class Streamer():
             self.timestamps[key] = timestamps2[key]
             return list2
 
+        fields = streamer_fields if (fields == False) else fields
+
         # merge based off recency
         t1 = self.timestamps
         t2 = s2.timestamps
-        self.display_name      = __choose_most_recent(self.display_name, s2.display_name, 'display_name', t1, t2)
-        self.profile_image_url = __choose_most_recent(self.profile_image_url, s2.profile_image_url, 'profile_image_url', t1, t2)
-        self.login             = __choose_most_recent(self.login, s2.login, 'login', t1, t2)
-        self.description       = __choose_most_recent(self.description, s2.description, 'description', t1, t2)
-        self.language          = __choose_most_recent(self.language, s2.language, 'language', t1, t2)
+        for key in ['display_name', 'profile_image_url', 'login', 'description', 'language']:
+            if (key in fields):
+                setattr(self, key, __choose_most_recent(getattr(self, key), getattr(s2, key), key, t1, t2))
 
         # merge based off length
-        self.view_counts     = __choose_longest(self.view_counts, s2.view_counts, 'view_counts', t1, t2)
-        self.follower_counts = __choose_longest(self.follower_counts, s2.follower_counts, 'follower_counts', t1, t2)
+        if ('view_counts' in fields):
+            self.view_counts     = __choose_longest(self.view_counts, s2.view_counts, 'view_counts', t1, t2)
+        if ('follower_counts' in fields):
+            self.follower_counts = __choose_longest(self.follower_counts, s2.follower_counts, 'follower_counts', t1, t2)
 
         # merge stream history
-        self.__merge_stream_history(s2.stream_history)
+        if ('stream_history' in fields):
+            self.__merge_stream_history(s2.stream_history)
 
 
     # merges stream history object according to:
     # - if game_id in sh2 DNE in this stream history, add it
     # - otherwise, choose the game_id with more `date` items
     def __merge_stream_history(self, sh2):
+        replaced = False
         for game_id, stream_obj in sh2.items():
             if (game_id in self.stream_history):
-                len1 = len(self.stream_history[game_id]['dates'])
-                len2 = len(stream_obj['dates'])
+                len1 = len(self.stream_history[game_id].streamed)
+                len2 = len(stream_obj.streamed)
                 if (len2 > len1):
-                    self.stream_history[game_id] = stream_obj
+                    self.stream_history[game_id] = stream_obj.copy()
+                    replaced = True
             else:
-                self.stream_history[game_id] = stream_obj
+                self.stream_history[game_id] = stream_obj.copy()
+                replaced = True
+
+        # a replaced game's dates aren't a superset of the old ones, so the latest date has to be found again
+        if (replaced):
+            self.__index_most_recent_streamed_games()
 
     # Get ----------------------------------------------------------------------
 
-    # goes through stream_history and returns the streams that were most recently streamed
-    # returns as a tuple (date, [list of game_ids])
+    # returns the games that were most recently streamed, as a tuple (date, [list of game_ids])
+    # -> every game streamed on the latest date in stream_history
     def get_most_recent_streamed_games(self):
-        latest_date = 0
-        game_ids = []
-        for game in self.stream_history:
-            for date_obj in self.stream_history[game]['dates']:
-                if (date_obj['streamed'] > latest_date):
-                    latest_date = date_obj['streamed']
-                elif (date_obj['streamed'] == latest_date):
-                    game_ids.append(game)
-
-        return latest_date, game_ids
+        return self.latest_date, list(self.latest_games)
 
     # returns the most recent follower count obj for this streamer
     # -> this should be the last follower_count object in the list, but we will check every case to be safe
@@ -292,6 +490,13 @@ class Streamer():
                 followers = obj
         return followers
 
+    # returns True if stream_history has any games from videos (those are keyed by name instead of by id)
+    def has_video_data(self):
+        for game in self.stream_history:
+            if (isinstance(game, str)):
+                return True
+        return False
+
     # returns a tuple ([list of games in livestreams], [list of games in videos])
     def get_games_played(self):
         livestreams, videos = [], []
@@ -308,8 +513,8 @@ class Streamer():
         games = []
         for game_id in self.stream_history:
             if (isinstance(game_id, int)):
-                for livestream in self.stream_history[game_id]['dates']:
-                    if ((livestream['streamed'] >= time1) and (livestream['streamed'] <= time2)):
+                for streamed in self.stream_history[game_id].streamed:
+                    if ((streamed >= time1) and (streamed <= time2)):
                         games.append(game_id)
         return games
 
@@ -321,6 +526,42 @@ class Streamer():
                 view_counts.append(obj)
         return view_counts
 
+    # returns True if the streamer livestreamed in date range
+    def has_livestream_in_range(self, time1, time2):
+        if (self.latest_date < time1):
+            return False
+        for game_id, history in self.stream_history.items():
+            if (isinstance(game_id, int)):
+                for streamed in history.streamed:
+                    if ((streamed >= time1) and (streamed <= time2)):
+                        return True
+        return False
+
+    # returns True if the streamer has a view_count within date range
+    # -> view_counts are added in the order they're scraped, so this only looks at the ones after time1
+    def has_view_count_in_range(self, time1, time2):
+        for i in range(len(self.view_counts) - 1, -1, -1):
+            date = self.view_counts[i]['date']
+            if (date < time1):
+                return False
+            if (date <= time2):
+                return True
+        return False
+
+    def has_view_count_since(self, time1):
+        return (len(self.view_counts) > 0) and (self.view_counts[-1]['date'] >= time1)
+
+    # returns the dates of every livestream, and of every view_count (for ActivityIndex)
+    def get_livestream_dates(self):
+        dates = []
+        for game_id, history in self.stream_history.items():
+            if (isinstance(game_id, int)):
+                dates += history.streamed
+        return dates
+
+    def get_view_count_dates(self):
+        return [obj['date'] for obj in self.view_counts]
+
 
     # returns self.stream_history, but with only videos
     def get_video_history(self):
@@ -359,7 +600,7 @@ class Streamer():
 
     def to_exportable_dict(self):
         obj = self.to_dict()
-        obj['stream_history'] = json.dumps(obj['stream_history'])
+        obj['stream_history'] = json.dumps({game: history.to_dict() for game, history in obj['stream_history'].items()})
         obj['view_counts'] = json.dumps(obj['view_counts'])
         obj['follower_counts'] = json.dumps(obj['follower_counts'])
         return obj
@@ -371,13 +612,26 @@ class Streamer():
 
 class Streamers():
 
-    def __init__(self, folderpath = False, missing_streamers_filename = False):
+    # num_processes: if set, shards are loaded and exported by that many processes (see .load_from_folder(), .export_to_csv())
+    def __init__(self, folderpath = False, missing_streamers_filename = False, num_processes = False):
         self.streamers = {}
         self.io_to_streamer_lookup = {}
         self.streamer_to_io_lookup = {}
         self.max_io_id = 0
         self.num_streamers_per_file = 1000
         self.known_missing_videos = StreamersMissingVideos(missing_streamers_filename)
+        self.follower_refresh_queue = False # <- built the first time it's needed, see .get_next_ids_with_missing_follower_data()
+        self.follower_popularity_weight = 0
+        self.ids_with_no_video_data = set()   # <- kept up to date as streamers and videos are added, so asking for
+        self.ids_that_need_video_data = set() #    them doesn't have to look at every streamer
+        self.livestream_activity = False # <- ActivityIndexes, built the first time they're needed
+        self.view_count_activity = False #    (see .get_ids_who_livestreamed_in_range(), .get_ids_with_view_counts_in_range())
+        self.owned_ids = False # <- once a snapshot is taken, the IDs of streamers that aren't shared with other snapshots
+                               #    (False means every streamer is owned, see .snapshot())
+        self.changes = False # <- once tracking starts, what changed since the last checkpoint (see .set_checkpoint())
+        self.shards_folderpath = False # <- folder this collection was last loaded from / exported to, and the shards that
+        self.dirty_shards = False      #    changed since then (False means every shard needs to be written, see .export_to_csv())
+        self.num_processes = num_processes
         if (folderpath):
             self.load_from_folder(folderpath)
 
@@ -401,6 +655,11 @@ class Streamers():
         cloned.max_io_id              = self.max_io_id
         cloned.num_streamers_per_file = self.num_streamers_per_file
         cloned.known_missing_videos   = self.known_missing_videos.clone()
+        cloned.ids_with_no_video_data   = set(self.ids_with_no_video_data)
+        cloned.ids_that_need_video_data = set(self.ids_that_need_video_data)
+        cloned.follower_popularity_weight = self.follower_popularity_weight
+        cloned.num_processes = self.num_processes
+        cloned.follower_refresh_queue = self.follower_refresh_queue.clone() if (self.follower_refresh_queue != False) else False
         return cloned
 
     def __clone_dict(self, d):
@@ -409,6 +668,86 @@ class Streamers():
             new_dict[key] = value
         return new_dict
 
+    # returns a new Streamers() object that shares its Streamer objects with this one (copy-on-write)
+    # -> a shared Streamer is only cloned when either collection changes it, so taking a snapshot is much cheaper
+    #    than .clone() and only the streamers that end up changing get copied
+    # -> neither collection owns any streamer after this, so both copy a streamer before their first change to it
+    # -> the dicts and sets of IDs are shared the same way, as LayeredDicts / LayeredSets (see get_layered())
+    def snapshot(self):
+        snapshot = Streamers()
+        for name in ['streamers', 'io_to_streamer_lookup', 'streamer_to_io_lookup', 'ids_with_no_video_data', 'ids_that_need_video_data']:
+            setattr(self, name, get_layered(getattr(self, name)))
+            setattr(snapshot, name, getattr(self, name).snapshot())
+        snapshot.max_io_id              = self.max_io_id
+        snapshot.num_streamers_per_file = self.num_streamers_per_file
+        snapshot.known_missing_videos   = self.known_missing_videos.snapshot()
+        snapshot.follower_popularity_weight = self.follower_popularity_weight
+        snapshot.num_processes = self.num_processes
+        snapshot.follower_refresh_queue = self.follower_refresh_queue.snapshot() if (self.follower_refresh_queue != False) else False
+        snapshot.owned_ids = set()
+        snapshot.set_checkpoint()
+        self.owned_ids = set()
+        return snapshot
+
+    # returns a streamer that is safe to change, cloning it first if it is shared with a snapshot
+    def __get_streamer_to_change(self, streamer_id):
+        if ((self.owned_ids != False) and (streamer_id not in self.owned_ids)):
+            self.streamers[streamer_id] = self.streamers[streamer_id].clone()
+            self.owned_ids.add(streamer_id)
+        return self.streamers[streamer_id]
+
+    # marks a streamer that was just added to this collection as owned by it
+    def __set_streamer_owned(self, streamer_id):
+        if (self.owned_ids != False):
+            self.owned_ids.add(streamer_id)
+
+
+    # Changes ------------------------------------------------------------------
+    # - Functions for passing only what changed in a collection to another collection (ie: from a worker thread's snapshot)
+
+    # starts (or restarts) tracking which streamers and fields change from here on
+    def set_checkpoint(self):
+        self.changes = {'streamers': {}, 'missing_videos': set()} # <- {streamer_id: set of changed fields}, set of streamer_ids
+
+    # -> also marks the streamer's shard as needing to be exported again
+    def __set_changed(self, streamer_id, fields = streamer_fields):
+        if (self.dirty_shards != False):
+            self.dirty_shards.add(self.get_shard_number(self.streamers[streamer_id].io_id))
+        if (self.changes != False):
+            if (streamer_id not in self.changes['streamers']):
+                self.changes['streamers'][streamer_id] = set()
+            self.changes['streamers'][streamer_id].update(fields)
+
+    # returns the changes since the last checkpoint (or everything, if changes aren't being tracked), in the form:
+    # {'streamers': {streamer_id: {'streamer': Streamer, 'fields': [changed fields]}}, 'missing_videos': {streamer_id: row}}
+    # -> the Streamers in it belong to this collection, so this collection shouldn't be changed until they are applied
+    def get_changes(self):
+        changed_fields = self.changes['streamers'] if (self.changes != False) else {id: streamer_fields for id in self.streamers}
+        missing_ids = self.changes['missing_videos'] if (self.changes != False) else self.known_missing_videos.streamers
+        changes = {'streamers': {}, 'missing_videos': {}}
+        for streamer_id, fields in changed_fields.items():
+            changes['streamers'][streamer_id] = {'streamer': self.streamers[streamer_id], 'fields': list(fields)}
+        for streamer_id in missing_ids:
+            changes['missing_videos'][streamer_id] = self.known_missing_videos.streamers[streamer_id]
+        return changes
+
+    # applies the changes from another collection's .get_changes() to this one
+    # -> like .merge(), but only looks at the streamers and fields that changed
+    def apply_changes(self, changes):
+        for streamer_id, row in changes['missing_videos'].items():
+            if (not self.known_missing_videos.check_for_streamer(streamer_id)):
+                self.known_missing_videos.streamers[streamer_id] = row
+                self.ids_that_need_video_data.discard(streamer_id)
+                if (self.changes != False):
+                    self.changes['missing_videos'].add(streamer_id)
+
+        for streamer_id, change in changes['streamers'].items():
+            if (streamer_id in self.streamers):
+                if (change['streamer'] is not self.streamers[streamer_id]):
+                    self.__merge_streamer(streamer_id, change['streamer'].clone(), change['fields'])
+            else:
+                self.add_streamer_obj(change['streamer'].clone())
+
     # get ----------------------------------------------------------------------
 
     # returns a specified streamer
@@ -427,30 +766,29 @@ class Streamers():
 
     # returns a list of ALL streamer IDs that do not have any video data on record
     def get_ids_with_no_video_data(self):
-        ids = []
-        for id, streamer in self.streamers.items():
-            livestreamed_games, video_games = streamer.get_games_played()
-            if (len(video_games) == 0):
-                ids.append(id)
-
-        ids.sort()
-        return ids
+        return sorted(self.ids_with_no_video_data)
 
     # returns a list of streamer IDs that do not have video data on record.
     # -> different from .get_ids_with_no_video_data() because it removes streamers that are in self.known_missing_videos
     def get_ids_that_need_video_data(self):
-        ids = []
-        for id in self.get_ids_with_no_video_data():
-            if (not self.known_missing_videos.check_for_streamer(id)):
-                ids.append(id)
-        return ids
+        return sorted(self.ids_that_need_video_data)
+
+    # updates self.ids_with_no_video_data and self.ids_that_need_video_data for a streamer
+    def __update_video_data_ids(self, streamer_id):
+        if (self.streamers[streamer_id].has_video_data()):
+            self.ids_with_no_video_data.discard(streamer_id)
+            self.ids_that_need_video_data.discard(streamer_id)
+        else:
+            self.ids_with_no_video_data.add(streamer_id)
+            if (not self.known_missing_videos.check_for_streamer(streamer_id)):
+                self.ids_that_need_video_data.add(streamer_id)
 
     # returns a list of all streamer IDs that do not have follower data from the last day
     def get_ids_with_missing_follower_data(self):
 
         ids = []
         current_time = int(time.time()) # <- this is in seconds
-        day_boundary = current_time - 60 * 60 * 24 # <- seconds*minutes*hours ~ seconds in a day
+        day_boundary = current_time - follower_refresh_interval # <- seconds*minutes*hours ~ seconds in a day
 
         for id, streamer in self.streamers.items():
             follower_count = streamer.get_most_recent_follower_count()
@@ -463,21 +801,64 @@ class Streamers():
         return ids
 
 
+    # returns up to n streamer IDs that do not have follower data from the last day, the ones that need it most first
+    # -> streamers who have gone the longest without a follower count come first, unless .set_follower_popularity_weight() is used
+    # -> uses a FollowerRefreshQueue instead of looking at every streamer, so it costs O(n log(# of streamers))
+    def get_next_ids_with_missing_follower_data(self, n):
+        if (self.follower_refresh_queue == False):
+            self.build_follower_refresh_queue()
+        return self.follower_refresh_queue.peek(n, int(time.time()) - follower_refresh_interval)
+
+    # builds the follower refresh queue from every streamer's follower counts
+    # -> once it's built, it's kept up to date as streamers are added, merged and changed, and snapshots share it, so
+    #    call this on a collection that snapshots are taken from (ie: scraper_controller's) to only build it once
+    def build_follower_refresh_queue(self):
+        self.follower_refresh_queue = FollowerRefreshQueue(self.follower_popularity_weight)
+        for streamer_id, streamer in self.streamers.items():
+            self.follower_refresh_queue.add(streamer_id, streamer.get_most_recent_follower_count())
+
+    # weight is the number of seconds that every 10x followers moves a streamer up the follower refresh queue
+    # -> ie: with weight = 60*60*2, a streamer with 100,000 followers is treated like their follower count is 4 hours older than
+    #    a streamer with 1,000 followers. 0 turns weighting off
+    def set_follower_popularity_weight(self, weight):
+        if (weight != self.follower_popularity_weight):
+            self.follower_popularity_weight = weight
+            self.follower_refresh_queue = False
+
+    # updates the follower refresh queue (if there is one) after a streamer's follower counts change
+    def __update_follower_refresh_queue(self, streamer_id):
+        if (self.follower_refresh_queue != False):
+            self.follower_refresh_queue.add(streamer_id, self.streamers[streamer_id].get_most_recent_follower_count())
+
+
     # returns all streamers who livestreamed within a range of times
     def get_ids_who_livestreamed_in_range(self, time1, time2):
-        ids = []
-        for id, streamer in self.streamers.items():
-            if (len(streamer.get_games_livestreamed_in_range(time1, time2)) > 0):
-                ids.append(id)
-        return ids
+        if (self.livestream_activity == False):
+            self.livestream_activity = ActivityIndex()
+            for id, streamer in self.streamers.items():
+                self.livestream_activity.add_dates(id, streamer.get_livestream_dates())
+        return self.livestream_activity.get_ids_in_range(time1, time2, lambda id: self.streamers[id].has_livestream_in_range(time1, time2))
 
     # returns all streamers with view_counts from within a range of times
     def get_ids_with_view_counts_in_range(self, time1, time2):
-        ids = []
-        for id, streamer in self.streamers.items():
-            if (len(streamer.get_view_counts_in_range(time1, time2)) > 0):
-                ids.append(id)
-        return ids
+        if (self.view_count_activity == False):
+            self.view_count_activity = ActivityIndex()
+            for id, streamer in self.streamers.items():
+                self.view_count_activity.add_dates(id, streamer.get_view_count_dates())
+        return self.view_count_activity.get_ids_in_range(time1, time2, lambda id: self.streamers[id].has_view_count_in_range(time1, time2))
+
+    # takes a streamer's dates out of the ActivityIndexes (if there are any) before they're changed by a merge
+    def __remove_from_activity_indexes(self, streamer_id):
+        if (self.livestream_activity != False):
+            self.livestream_activity.remove_dates(streamer_id, self.streamers[streamer_id].get_livestream_dates())
+        if (self.view_count_activity != False):
+            self.view_count_activity.remove_dates(streamer_id, self.streamers[streamer_id].get_view_count_dates())
+
+    def __add_to_activity_indexes(self, streamer_id):
+        if (self.livestream_activity != False):
+            self.livestream_activity.add_dates(streamer_id, self.streamers[streamer_id].get_livestream_dates())
+        if (self.view_count_activity != False):
+            self.view_count_activity.add_dates(streamer_id, self.streamers[streamer_id].get_view_count_dates())
 
     # returns a list of all of the IndieOutreach IDs in this Streamers object
     def get_used_io_ids(self):
@@ -494,6 +875,10 @@ class Streamers():
         self.max_io_id += 1
         return self.max_io_id
 
+    # returns the number of the shard (streamers_{n}.csv) that a streamer with io_id is exported to
+    def get_shard_number(self, io_id):
+        return (io_id - 1) // self.num_streamers_per_file + 1
+
     # returns a new, valid IO ID
     # -> this function is read only
     def get_new_io_id(self):
@@ -512,22 +897,48 @@ class Streamers():
             self.streamers[streamer_id] = Streamer(twitch_obj)
             self.io_to_streamer_lookup[twitch_obj['io_id']] = streamer_id
             self.streamer_to_io_lookup[streamer_id] = twitch_obj['io_id']
+            self.__set_streamer_owned(streamer_id)
+            self.__set_changed(streamer_id)
+            self.__update_follower_refresh_queue(streamer_id)
+            self.__update_video_data_ids(streamer_id)
+            self.__add_to_activity_indexes(streamer_id)
         else:
-            self.streamers[streamer_id].update(twitch_obj)
+            # .update() either replaces the date of the latest view_count or adds a new one
+            streamer = self.__get_streamer_to_change(streamer_id)
+            self.__set_changed(streamer_id, ['display_name', 'login', 'profile_image_url', 'description', 'language', 'view_counts'])
+            if (self.view_count_activity != False):
+                num_view_counts = len(streamer.view_counts)
+                self.view_count_activity.remove_dates(streamer_id, streamer.get_view_count_dates()[-1:])
+                streamer.update(twitch_obj)
+                self.view_count_activity.add_dates(streamer_id, streamer.get_view_count_dates()[max(num_view_counts - 1, 0):])
+            else:
+                streamer.update(twitch_obj)
 
     # for a specific streamer, add video/livestream data
     def add_stream_data(self, stream):
         if (stream.user_id in self.streamers):
-            self.streamers[stream.user_id].add_stream_data(stream)
+            changed, added_date = self.__get_streamer_to_change(stream.user_id).add_stream_data(stream)
+            if (changed):
+                self.__set_changed(stream.user_id, ['stream_history']) # <- a stream that was already recorded doesn't dirty its shard
+            if (added_date and stream.is_livestream and (self.livestream_activity != False)):
+                self.livestream_activity.add_dates(stream.user_id, [stream.date])
+            if (not stream.is_livestream):
+                self.ids_with_no_video_data.discard(stream.user_id)
+                self.ids_that_need_video_data.discard(stream.user_id)
 
     # for a specific streamer, add a new follower count to streamer.follower_counts
     def add_follower_data(self, streamer_id, followers):
         if (streamer_id in self.streamers):
-            self.streamers[streamer_id].add_follower_data(followers)
+            self.__get_streamer_to_change(streamer_id).add_follower_data(followers)
+            self.__set_changed(streamer_id, ['follower_counts'])
+            self.__update_follower_refresh_queue(streamer_id)
 
     # adds a streamer to self.known_missing_videos
     def add_streamer_to_missing_videos_collection(self, streamer_id):
         self.known_missing_videos.add(streamer_id)
+        self.ids_that_need_video_data.discard(streamer_id)
+        if (self.changes != False):
+            self.changes['missing_videos'].add(streamer_id)
 
 
     # when calling .merge(), a full Streamer object may need to be added to our collection
@@ -542,6 +953,11 @@ class Streamers():
         self.streamers[streamer_id] = streamer_obj
         self.io_to_streamer_lookup[new_io_id] = streamer_id
         self.streamer_to_io_lookup[streamer_id] = new_io_id
+        self.__set_streamer_owned(streamer_id)
+        self.__set_changed(streamer_id)
+        self.__update_follower_refresh_queue(streamer_id)
+        self.__update_video_data_ids(streamer_id)
+        self.__add_to_activity_indexes(streamer_id)
         return
 
 
@@ -552,17 +968,34 @@ class Streamers():
     # note: we do not attempt to merge .max_io_id value here because the act of calling .add_streamer_obj() will do that for us
     def merge(self, streamers2):
         self.known_missing_videos.merge(streamers2.known_missing_videos)
+        for streamer_id in streamers2.known_missing_videos.streamers:
+            self.ids_that_need_video_data.discard(streamer_id)
         self.io_to_streamer_lookup = self.__merge_dicts(self.io_to_streamer_lookup, streamers2.io_to_streamer_lookup)
         self.streamer_to_io_lookup = self.__merge_dicts(self.streamer_to_io_lookup, streamers2.streamer_to_io_lookup)
 
         # merge streamers objects
         for id, streamer in streamers2.streamers.items():
             if (id in self.streamers):
-                self.streamers[id].merge(streamer)
-                test = self.streamers[id]
+                if (streamer is self.streamers[id]):
+                    continue # <- shared by snapshots and not changed by either, so there's nothing to merge
+                if ((streamers2.owned_ids != False) and (id not in streamers2.owned_ids)):
+                    streamer = streamer.clone() # <- Streamer.merge() can take lists from streamer, which other snapshots may share
+                self.__merge_streamer(id, streamer)
             else:
                 self.add_streamer_obj(streamer.clone())
 
+    # merges streamer into the streamer with the same id in this collection, and updates the indexes that depend on it
+    def __merge_streamer(self, streamer_id, streamer, fields = False):
+        num_follower_counts = len(self.streamers[streamer_id].follower_counts)
+        self.__remove_from_activity_indexes(streamer_id)
+        self.__get_streamer_to_change(streamer_id).merge(streamer, fields)
+        self.__add_to_activity_indexes(streamer_id)
+        self.__set_changed(streamer_id, fields if (fields != False) else streamer_fields)
+        if (len(self.streamers[streamer_id].follower_counts) != num_follower_counts):
+            self.__update_follower_refresh_queue(streamer_id)
+        if (streamer_id in self.ids_with_no_video_data):
+            self.__update_video_data_ids(streamer_id)
+
 
     # merges d2 onto d1 and returns that object
     def __merge_dicts(self, d1, d2):
@@ -573,62 +1006,109 @@ class Streamers():
 
     # File I/O -----------------------------------------------------------------
 
-    # exports all Streamer objects to .csv files, batched by their io_ids
+    # exports all Streamer objects to gzipped .csv files (shards), batched by their io_ids
     # file1 = (1,1000), file2=(1001, 2000), and so on
+    # - folderpath/manifest.json lists the current shard files: {'generation': int, 'num_streamers_per_file': int,
+    #   'shards': {shard number: {'filename': str, 'num_streamers': int, 'size': uncompressed bytes}}}
+    # - if this collection was loaded from (or last exported to) folderpath, only the shards with streamers that changed
+    #   since then are rewritten
+    # - shards are written to new files (streamers_{n}_{generation}.csv.gz) that only replace the old ones once the new
+    #   manifest is swapped in, so an export that fails part of the way through leaves the last export intact
     def export_to_csv(self, folderpath):
-        fieldnames = [
-            'io_id', 'streamer_id', 'login', 'display_name', 'profile_image_url', 'view_counts', 'description',
-            'follower_counts', 'language', 'stream_history'
-        ]
-        num_batches = int(len(self.streamers) / self.num_streamers_per_file) + 1
+        os.makedirs(folderpath, exist_ok=True)
+        old_manifest = load_streamers_manifest(folderpath)
+        generation = old_manifest['generation'] + 1 if (old_manifest != False) else 1
+        num_shards = self.get_shard_number(self.max_io_id) if (self.max_io_id > 0) else 0
+
+        # figure out which shards have to be written
+        manifest = {'generation': generation, 'num_streamers_per_file': self.num_streamers_per_file, 'shards': {}}
+        shards_to_write = range(1, num_shards + 1)
+        if ((folderpath == self.shards_folderpath) and (self.dirty_shards != False) and (old_manifest != False)):
+            if (old_manifest['num_streamers_per_file'] == self.num_streamers_per_file):
+                manifest['shards'] = old_manifest['shards']
+                shards_to_write = sorted(self.dirty_shards)
 
         try:
-            # write to disk in a temporary location so we don't overwrite our existing .zip
-            # -> we want to write to a different location just in case something errors during the write
-            with ZipFile(folderpath + '/streamers[TEMP].zip', 'w', ZIP_DEFLATED) as zip_file:
-
-                # loop through the batches of streamers (files)
-                for batch_index in range(num_batches):
-                    streamers_to_export = []
-                    for i in range(self.num_streamers_per_file):
-
-                        # get streamers file info together
-                        io_id = batch_index * self.num_streamers_per_file + i + 1
-                        if (io_id in self.io_to_streamer_lookup):
-                            streamer_id = self.io_to_streamer_lookup[io_id]
-                            streamer = self.get(streamer_id)
-                            if (streamer == False):
-                                print("io_id =", io_id, "\nstreamer_id =", streamer_id)
-                                sys.exit()
-                            streamers_to_export.append(streamer.to_exportable_dict())
-
-                    # write streamers file to csv in the zip
-                    string_buffer = StringIO()
-                    filename = 'streamers_' + str(batch_index + 1) + '.csv'
-                    writer = csv.DictWriter(string_buffer, fieldnames=fieldnames)
-                    writer.writeheader()
-                    for streamer in streamers_to_export:
-                        writer.writerow(streamer)
-                    zip_file.writestr(filename, string_buffer.getvalue())
-
-            # since writing to the temp .zip worked, delete the old .zip and rename the new one
-            try:
-                os.remove(folderpath + '/streamers.zip')
-            except IOError:
-                pass
-
-            try:
-                os.rename(folderpath + '/streamers[TEMP].zip', folderpath + '/streamers.zip')
-            except IOError:
-                pass
-
-        except (BadZipFile, IOError) as e:
-            print('error while creating ', folderpath + '/streamers[TEMP].zip')
-
-
-    # goes to a folder and starts loading all streamers_{n}.csv files at folderpath
+            filenames = ['streamers_' + str(shard) + '_' + str(generation) + '.csv.gz' for shard in shards_to_write]
+            args = [(folderpath + '/' + filename, self.__get_shard_streamers(shard)) for shard, filename in zip(shards_to_write, filenames)]
+            if ((self.num_processes != False) and (len(args) > 1)):
+                results = list(get_shard_process_pool(self.num_processes).map(write_streamers_shard, *zip(*args)))
+            else:
+                results = [write_streamers_shard(filepath, streamers) for filepath, streamers in args]
+            for shard, filename, result in zip(shards_to_write, filenames, results):
+                manifest['shards'][str(shard)] = result
+                manifest['shards'][str(shard)]['filename'] = filename
+
+            # swap in the new manifest, then delete any shard files it doesn't use anymore
+            with open(folderpath + '/' + streamers_manifest_filename + '[TEMP]', 'w') as f:
+                json.dump(manifest, f)
+            os.replace(folderpath + '/' + streamers_manifest_filename + '[TEMP]', folderpath + '/' + streamers_manifest_filename)
+        except IOError:
+            print('error while exporting streamers to', folderpath)
+            return
+
+        filenames = set([shard['filename'] for shard in manifest['shards'].values()])
+        for filename in os.listdir(folderpath):
+            if (filename.startswith('streamers_') and filename.endswith('.csv.gz') and (filename not in filenames)):
+                os.remove(folderpath + '/' + filename)
+        self.shards_folderpath = folderpath
+        self.dirty_shards = set()
+
+    # returns the Streamer objects in a shard, in order of io_id
+    def __get_shard_streamers(self, shard):
+        streamers_to_export = []
+        first_io_id = (shard - 1) * self.num_streamers_per_file + 1
+        for io_id in range(first_io_id, first_io_id + self.num_streamers_per_file):
+            if (io_id in self.io_to_streamer_lookup):
+                streamer_id = self.io_to_streamer_lookup[io_id]
+                streamer = self.get(streamer_id)
+                if (streamer == False):
+                    print("io_id =", io_id, "\nstreamer_id =", streamer_id)
+                    sys.exit()
+                streamers_to_export.append(streamer)
+        return streamers_to_export
+
+
+    # loads all streamers in folderpath
+    # -> uses the shards in manifest.json if there is one, otherwise the streamers_{n}.csv files in streamers.zip
+    #    (the format export_to_csv() used to write)
+    # -> with self.num_processes set, shards are decoded in parallel and added in order, so io_ids stay in the same order
     def load_from_folder(self, folderpath):
         self.streamers = {}
+        self.follower_refresh_queue = False
+        self.ids_with_no_video_data = set()
+        self.ids_that_need_video_data = set()
+        self.livestream_activity = False
+        self.view_count_activity = False
+        self.owned_ids = False
+        self.changes = False
+        self.shards_folderpath = False
+        self.dirty_shards = False
+
+        manifest = load_streamers_manifest(folderpath)
+        if (manifest != False):
+            self.num_streamers_per_file = manifest['num_streamers_per_file']
+            filepaths = [folderpath + '/' + manifest['shards'][shard]['filename'] for shard in sorted(manifest['shards'], key=int)]
+            if ((self.num_processes != False) and (len(filepaths) > 1)):
+                shards = get_shard_process_pool(self.num_processes).map(read_streamers_shard, filepaths)
+            else:
+                shards = map(read_streamers_shard, filepaths)
+            for streamers in shards:
+                for streamer in streamers:
+                    self.__add_loaded_streamer(streamer)
+            self.shards_folderpath = folderpath
+            self.dirty_shards = set()
+        else:
+            self.__load_from_zip(folderpath)
+
+        # find the max io_id in Streamers collection
+        self.max_io_id = 0
+        for streamer_id, streamer in self.streamers.items():
+            if (streamer.io_id > self.max_io_id):
+                self.max_io_id = streamer.io_id
+
+    # goes to a folder and starts loading all streamers_{n}.csv files in folderpath/streamers.zip
+    def __load_from_zip(self, folderpath):
         try:
             with ZipFile(folderpath + '/streamers.zip') as zip_file:
                 i = 0
@@ -637,22 +1117,18 @@ class Streamers():
                     filename = 'streamers_' + str(i) + '.csv'
                     if (filename in zip_file.namelist()):
                         with zip_file.open(filename, 'r') as csvfile:
-                            reader = csv.DictReader(TextIOWrapper(csvfile, 'utf-8'))
-                            for row in reader:
-                                streamer = Streamer(row, True)
-                                self.streamers[streamer.streamer_id] = streamer
-                                self.io_to_streamer_lookup[streamer.io_id] = streamer.streamer_id
-                                self.streamer_to_io_lookup[streamer.streamer_id] = streamer.io_id
+                            for row in csv.DictReader(TextIOWrapper(csvfile, 'utf-8')):
+                                self.__add_loaded_streamer(Streamer(row, True))
                     else:
                         break
         except IOError:
             print(folderpath + '/streamers.zip does not exist yet...')
 
-        # find the max io_id in Streamers collection
-        self.max_io_id = 0
-        for streamer_id, streamer in self.streamers.items():
-            if (streamer.io_id > self.max_io_id):
-                self.max_io_id = streamer.io_id
+    def __add_loaded_streamer(self, streamer):
+        self.streamers[streamer.streamer_id] = streamer
+        self.io_to_streamer_lookup[streamer.io_id] = streamer.streamer_id
+        self.streamer_to_io_lookup[streamer.streamer_id] = streamer.io_id
+        self.__update_video_data_ids(streamer.streamer_id)
 
 
     # Data Validation ----------------------------------------------------------
@@ -819,6 +1295,337 @@ class Streamers():
         return True
 
 
+# ==============================================================================
+# Streamers Shards
+# ==============================================================================
+
+# returns the manifest.json that Streamers.export_to_csv() wrote to folderpath, or False if there isn't one
+def load_streamers_manifest(folderpath):
+    try:
+        with open(folderpath + '/' + streamers_manifest_filename) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return False
+
+# returns the Streamer objects in a shard file, in the order they were exported
+def read_streamers_shard(filepath):
+    try:
+        with gzip.open(filepath, 'rt', encoding='utf-8', newline='') as csvfile:
+            return [Streamer(row, True) for row in csv.DictReader(csvfile)]
+    except IOError:
+        print('could not load', filepath)
+        return []
+
+# writes streamers to a gzipped .csv shard file, and returns {'num_streamers': int, 'size': uncompressed bytes}
+def write_streamers_shard(filepath, streamers):
+    string_buffer = StringIO()
+    writer = csv.DictWriter(string_buffer, fieldnames=streamer_fields)
+    writer.writeheader()
+    for streamer in streamers:
+        writer.writerow(streamer.to_exportable_dict())
+    content = string_buffer.getvalue().encode('utf-8')
+    with gzip.open(filepath, 'wb', compresslevel=6) as f:
+        f.write(content)
+    return {'num_streamers': len(streamers), 'size': len(content)}
+
+
+_shard_process_pools = {}
+_shard_process_pools_lock = threading.Lock()
+
+# returns the process-wide pool of num_processes processes that reads and writes shards
+# -> the pool is kept around, so exporting a few dirty shards doesn't have to start new processes every time
+# -> processes are spawned rather than forked, since forking a process that is running threads (ie: scraper_controller) isn't safe
+def get_shard_process_pool(num_processes):
+    with _shard_process_pools_lock:
+        if (num_processes not in _shard_process_pools):
+            _shard_process_pools[num_processes] = ProcessPoolExecutor(num_processes, multiprocessing.get_context('spawn'))
+        return _shard_process_pools[num_processes]
+
+# returns a tuple ([uncompressed sizes], [compressed sizes]) in bytes for each file that stores the streamers in folderpath
+def get_streamers_filesizes(folderpath):
+    uncompressed, compressed = [], []
+    manifest = load_streamers_manifest(folderpath)
+    if (manifest != False):
+        for shard in manifest['shards'].values():
+            uncompressed.append(shard['size'])
+            compressed.append(os.path.getsize(folderpath + '/' + shard['filename']))
+    else:
+        with ZipFile(folderpath + '/streamers.zip') as zip_file:
+            for filename in zip_file.namelist():
+                fileinfo = zip_file.getinfo(filename)
+                uncompressed.append(fileinfo.file_size)
+                compressed.append(fileinfo.compress_size)
+    return uncompressed, compressed
+
+
+# ==============================================================================
+# LayeredDict
+# ==============================================================================
+
+_layered_deleted = object() # <- marks a key that was deleted in a layer
+
+# dict that can be copied in time proportional to the changes since the last copy (see Streamers.snapshot())
+# - reads look through this copy's own changes (top), then through layers of changes that are shared with other copies
+#   and never change again, down to the root dict
+# - .snapshot() turns top into a new shared layer. Once there are more than max_dict_layers layers, the layers above the
+#   root are merged together, and into a new root if they add up to more than a quarter of it
+# - iterating over it builds the merged dict, unless it only has a root
+class LayeredDict():
+
+    __slots__ = ('layers', 'top', 'size')
+
+    def __init__(self, d = False):
+        self.layers = [d if (d != False) else {}]
+        self.top = {}
+        self.size = len(self.layers[0])
+
+    def snapshot(self):
+        if (len(self.top) > 0):
+            self.layers = self.layers + [self.top]
+            self.top = {}
+        if (len(self.layers) > max_dict_layers):
+            self.__merge_layers()
+        snapshot = LayeredDict.__new__(LayeredDict)
+        snapshot.layers = self.layers
+        snapshot.top = {}
+        snapshot.size = self.size
+        return snapshot
+
+    def __merge_layers(self):
+        changes = {}
+        for layer in self.layers[1:]:
+            changes.update(layer)
+        if (len(changes) <= len(self.layers[0]) // 4):
+            self.layers = [self.layers[0], changes]
+        else:
+            root = dict(self.layers[0])
+            root.update(changes)
+            self.layers = [{key: value for key, value in root.items() if (value is not _layered_deleted)}]
+
+    # returns the value of key, or _layered_deleted if it isn't in the dict
+    def __lookup(self, key):
+        if (key in self.top):
+            return self.top[key]
+        for i in range(len(self.layers) - 1, -1, -1):
+            if (key in self.layers[i]):
+                return self.layers[i][key]
+        return _layered_deleted
+
+    # returns a dict with every key in this one (which must not be changed)
+    def __merged(self):
+        if ((len(self.layers) == 1) and (len(self.top) == 0)):
+            return self.layers[0]
+        merged = {}
+        for layer in self.layers + [self.top]:
+            merged.update(layer)
+        return {key: value for key, value in merged.items() if (value is not _layered_deleted)}
+
+
+    def __getitem__(self, key):
+        value = self.__lookup(key)
+        if (value is _layered_deleted):
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default = None):
+        value = self.__lookup(key)
+        return default if (value is _layered_deleted) else value
+
+    def __contains__(self, key):
+        return self.__lookup(key) is not _layered_deleted
+
+    def __setitem__(self, key, value):
+        if (key not in self):
+            self.size += 1
+        self.top[key] = value
+
+    def __delitem__(self, key):
+        if (key not in self):
+            raise KeyError(key)
+        self.size -= 1
+        self.top[key] = _layered_deleted
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.__merged())
+
+    def keys(self):
+        return self.__merged().keys()
+
+    def values(self):
+        return self.__merged().values()
+
+    def items(self):
+        return self.__merged().items()
+
+
+# set version of LayeredDict
+class LayeredSet():
+
+    __slots__ = ('items',)
+
+    def __init__(self, s = False):
+        self.items = LayeredDict({item: True for item in s} if (s != False) else {})
+
+    def snapshot(self):
+        snapshot = LayeredSet.__new__(LayeredSet)
+        snapshot.items = self.items.snapshot()
+        return snapshot
+
+    def add(self, item):
+        if (item not in self.items):
+            self.items[item] = True
+
+    def discard(self, item):
+        if (item in self.items):
+            del self.items[item]
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+# returns container as a LayeredDict / LayeredSet, so it can be snapshotted
+# -> a plain dict becomes the root of the LayeredDict as is, so it must not be used directly afterwards
+def get_layered(container):
+    if (isinstance(container, dict)):
+        return LayeredDict(container)
+    if (isinstance(container, set)):
+        return LayeredSet(container)
+    return container
+
+
+# ==============================================================================
+# ActivityIndex
+# ==============================================================================
+
+# Index of which streamers were active (ie: livestreamed, or had a view_count scraped) on each day
+# - dates are bucketed by day: {day: {streamer_id: number of dates that day}}, with a sorted list of days to bisect
+# - a range query takes every streamer from the days fully inside the range, and only has to check the streamers from
+#   the first and last days against the exact times
+class ActivityIndex():
+
+    def __init__(self):
+        self.buckets = {}
+        self.days = [] # <- sorted keys of self.buckets
+
+    def add_dates(self, streamer_id, dates):
+        for date in dates:
+            day = date // activity_bucket_size
+            if (day not in self.buckets):
+                self.buckets[day] = {}
+                bisect.insort(self.days, day)
+            self.buckets[day][streamer_id] = self.buckets[day].get(streamer_id, 0) + 1
+
+    def remove_dates(self, streamer_id, dates):
+        for date in dates:
+            bucket = self.buckets.get(date // activity_bucket_size, {})
+            if (streamer_id in bucket):
+                bucket[streamer_id] -= 1
+                if (bucket[streamer_id] <= 0):
+                    del bucket[streamer_id]
+
+
+    # returns the IDs of streamers active between time1 and time2
+    # -> check(streamer_id) returns True if a streamer from the first or last day was active within the exact range
+    def get_ids_in_range(self, time1, time2, check):
+        first_day, last_day = time1 // activity_bucket_size, time2 // activity_bucket_size
+        ids = set()
+        i = bisect.bisect_left(self.days, first_day)
+        while ((i < len(self.days)) and (self.days[i] <= last_day)):
+            day = self.days[i]
+            if ((day > first_day) and (day < last_day)):
+                ids.update(self.buckets[day])
+            else:
+                for streamer_id in self.buckets[day]:
+                    if ((streamer_id not in ids) and check(streamer_id)):
+                        ids.add(streamer_id)
+            i += 1
+        return list(ids)
+
+
+# ==============================================================================
+# FollowerRefreshQueue
+# ==============================================================================
+
+# Priority queue of streamers, ordered by when their follower count was last refreshed (oldest first)
+# - it's a min heap of [priority, streamer_id, refreshed] entries. When a streamer's follower count changes, a new entry is
+#   pushed and the old one is left in the heap. Old entries are thrown out as they reach the top
+# - priority = refreshed - popularity_weight * log10(1 + followers), so popular streamers can be moved up the queue
+class FollowerRefreshQueue():
+
+    def __init__(self, popularity_weight = 0):
+        self.popularity_weight = popularity_weight
+        self.heap = []
+        self.refreshed = {} # <- {streamer_id: date of the latest follower count (0 if there isn't one)}
+        self.heap_shared = False # <- True if the heap is shared with a snapshot, so it has to be copied before it changes
+
+    def clone(self):
+        cloned = FollowerRefreshQueue(self.popularity_weight)
+        cloned.heap = list(self.heap)
+        cloned.refreshed = dict(self.refreshed)
+        return cloned
+
+    # returns a copy-on-write copy of this queue (see Streamers.snapshot())
+    # -> refreshed is shared as a LayeredDict, and the heap is only copied by whichever queue changes it first
+    def snapshot(self):
+        self.refreshed = get_layered(self.refreshed)
+        snapshot = FollowerRefreshQueue(self.popularity_weight)
+        snapshot.heap = self.heap
+        snapshot.refreshed = self.refreshed.snapshot()
+        snapshot.heap_shared = True
+        self.heap_shared = True
+        return snapshot
+
+    def __get_heap_to_change(self):
+        if (self.heap_shared):
+            self.heap = list(self.heap)
+            self.heap_shared = False
+        return self.heap
+
+    # adds a streamer, or updates them with their latest follower count obj (False if they don't have one)
+    def add(self, streamer_id, follower_count):
+        refreshed = follower_count['date'] if (follower_count != False) else 0
+        followers = follower_count['followers'] if (follower_count != False) else 0
+        priority = refreshed - self.popularity_weight * math.log10(1 + max(followers, 0))
+        self.refreshed[streamer_id] = refreshed
+        heapq.heappush(self.__get_heap_to_change(), [priority, streamer_id, refreshed])
+
+        # if most of the heap is old entries, rebuild it
+        if (len(self.heap) > 2 * len(self.refreshed) + 1000):
+            self.heap = [entry for entry in self.heap if (self.refreshed.get(entry[1]) == entry[2])]
+            heapq.heapify(self.heap)
+
+
+    # returns up to n streamer IDs (highest priority first) whose follower count is older than refreshed_before
+    # -> doesn't remove them; they move down the queue once their follower count is added
+    def peek(self, n, refreshed_before):
+        self.__get_heap_to_change()
+        ids, popped, seen = [], [], set()
+        while ((len(ids) < n) and (len(self.heap) > 0) and (self.heap[0][0] < refreshed_before)):
+            entry = heapq.heappop(self.heap)
+            if ((self.refreshed.get(entry[1]) != entry[2]) or (entry[1] in seen)):
+                continue # <- old entry (or one pushed in the same second as a newer one)
+            seen.add(entry[1])
+            popped.append(entry)
+            if (entry[2] < refreshed_before):
+                ids.append(entry[1])
+
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return ids
+
+    def __len__(self):
+        return len(self.refreshed)
+
+
 # ==============================================================================
 # StreamersMissingVideos
 # ==============================================================================
@@ -834,8 +1641,8 @@ class StreamersMissingVideos():
 
     def __init__(self, filename = False):
         self.streamers = {}
+        self.filename = filename
         if (filename != False):
-            self.filename = filename
             self.streamers = self.load_from_csv(filename)
 
     # creates a copy of StreamersMissingVideos object
@@ -853,6 +1660,15 @@ class StreamersMissingVideos():
             new_dict[k] = v
         return new_dict
 
+    # returns a copy-on-write copy, that shares its rows with this one (see Streamers.snapshot())
+    # -> rows are never changed once they're added, so they don't have to be copied
+    def snapshot(self):
+        self.streamers = get_layered(self.streamers)
+        snapshot = StreamersMissingVideos()
+        snapshot.filename = self.filename
+        snapshot.streamers = self.streamers.snapshot()
+        return snapshot
+
     # merges another StreamersMissingVideos object with this one
     def merge(self, smv2):
         for streamer_id, val in smv2.streamers.items():
@@ -5,13 +5,17 @@
 # tests.py contains functions for testing the various components of scraper.py
 #
 
+import os
 import sys
+import time
 import json
+import tracemalloc
 
 import scraper
 from scraper import *
 from games import *
 from streamers import *
+from cassettes import *
 
 # ==============================================================================
 # Test TwitchAPI
@@ -512,7 +516,7 @@ def test_add_followers(credentials):
 
     print_test_title("Add Followers")
     test_names = [
-        'followers0', 'followers1'
+        'followers0', 'followers1', 'followers2'
     ]
     tests = get_empty_test(test_names)
 
@@ -546,6 +550,12 @@ def test_add_followers(credentials):
     if ((num_missing2 >= num_missing1) or (num_missing2 != 0)):
         tests['followers1'] = False
 
+    # followers2: -> the follower refresh queue agrees with a full scan of the streamers
+    if (len(streamers2.get_next_ids_with_missing_follower_data(9999999)) != num_missing2):
+        tests['followers2'] = False
+    if (sorted(streamers1.get_next_ids_with_missing_follower_data(9999999)) != streamers1.get_ids_with_missing_follower_data()):
+        tests['followers2'] = False
+
     print_test_results(tests)
 
 
@@ -611,10 +621,15 @@ def test_merge_streamers(credentials):
     test_names = [
         'load0',
         'merge0', 'merge1', 'merge2',
-        'clone0', 'clone1', 'clone2'
+        'clone0', 'clone1', 'clone2',
+        'snapshot0', 'snapshot1',
+        'changes0', 'changes1',
+        'range0'
     ]
     tests = get_empty_test(test_names)
     folderpath = './test/streamers'
+    time_today = int(time.time())
+    time_week = time_today - (60*60*24*7)
 
     # scrape some streamers to make sure there's data to load from
     scraper = Scraper(credentials, 'testing')
@@ -640,6 +655,8 @@ def test_merge_streamers(credentials):
             tests['merge1'] = False
 
     # merge2: -> adding videos should result in larger stream_histories
+    streamers1.get_ids_who_livestreamed_in_range(time_week, time_today) # <- builds the ActivityIndexes, so merge has to keep them up to date
+    streamers1.get_ids_with_view_counts_in_range(time_week, time_today)
     streamers2 = scraper.add_videos_to_streamers_db(False, 10, 3)
     streamers1.merge(streamers2)
     for id, streamer2 in streamers2.streamers.items():
@@ -669,9 +686,464 @@ def test_merge_streamers(credentials):
     if (not streamers1.check_if_streamer_collection_same(streamers2)):
         tests['clone2'] = False
 
+    # snapshot0: -> a snapshot should be the same as the collection it was taken from
+    streamers2 = streamers1.snapshot()
+    if (not streamers2.check_if_streamer_collection_same(streamers1)):
+        tests['snapshot0'] = False
+
+    # snapshot1: -> changing a snapshot should copy the changed streamers instead of modifying the original
+    streamers3 = streamers1.clone()
+    for id in streamers2.get_ids():
+        streamers2.add_follower_data(id, 1)
+    if ((not streamers1.check_if_streamer_collection_same(streamers3)) or streamers1.check_if_streamer_collection_same(streamers2)):
+        tests['snapshot1'] = False
+
+    # changes0: -> the snapshot's changes should be every streamer it added follower data to, and only follower_counts
+    changes = streamers2.get_changes()
+    if (sorted(changes['streamers'].keys()) != streamers2.get_ids()):
+        tests['changes0'] = False
+    for id, change in changes['streamers'].items():
+        if (change['fields'] != ['follower_counts']):
+            tests['changes0'] = False
+
+    # changes1: -> applying the snapshot's changes should make the original the same as the snapshot
+    streamers1.apply_changes(changes)
+    if (not streamers1.check_if_streamer_collection_same(streamers2)):
+        tests['changes1'] = False
+
+    # range0: -> range queries (which use ActivityIndexes) should match checking every streamer
+    livestreamed, view_counted = [], []
+    for id, streamer in streamers1.streamers.items():
+        if (len(streamer.get_games_livestreamed_in_range(time_week, time_today)) > 0):
+            livestreamed.append(id)
+        if (len(streamer.get_view_counts_in_range(time_week, time_today)) > 0):
+            view_counted.append(id)
+    if (sorted(streamers1.get_ids_who_livestreamed_in_range(time_week, time_today)) != sorted(livestreamed)):
+        tests['range0'] = False
+    if (sorted(streamers1.get_ids_with_view_counts_in_range(time_week, time_today)) != sorted(view_counted)):
+        tests['range0'] = False
+
     print_test_results(tests)
 
 
+# ==============================================================================
+# Test Offline
+# ==============================================================================
+
+# runs the scraper against a local StandInServer, so these tests don't need credentials or a network connection
+def test_offline(credentials):
+    print_test_title("Offline")
+    test_names = [
+        'livestreams0', 'livestreams1', 'livestreams2',
+        'cassette0', 'cassette1', 'cassette2',
+        'shards0', 'shards1', 'shards2', 'shards3',
+        'followers0', 'followers1'
+    ]
+    tests = get_empty_test(test_names)
+
+    offline_credentials = {'twitch': {'client_id': 'stand-in', 'client_secret': 'stand-in-secret', 'v5_client_id': 'stand-in'}, 'igdb': 'stand-in'}
+    livestreams, users = get_stand_in_livestreams(450)
+    server = StandInServer().start()
+    server.add_collection('/helix/streams', livestreams)
+    server.add_collection('/helix/users', users, 100)
+
+    # -> uses its own TokenStore, so the stand-in tokens never end up in (or replace the real tokens in) ./tokens.json
+    token_store = TokenStore('./test/tokens.json')
+    scraper = Scraper(offline_credentials, 'testing', StandInTransport(server))
+    scraper.twitchAPI.token_store = token_store
+    scraper.set_print_mode(False)
+
+    # livestreams 0: -> every livestream is scraped (pages have 100 livestreams, so this covers the last partial page)
+    streams = scraper.get_all_livestreams()
+    if (len(streams) != len(livestreams)):
+        tests['livestreams0'] = False
+
+    # livestreams 1: -> a streamer is added for every livestream that makes it through the view filter
+    num_expected = len([livestream for livestream in livestreams if (livestream['viewer_count'] >= scraper.view_cutoff)])
+    streamers1 = scraper.compile_streamers_db(Streamers())
+    if ((len(streamers1.get_ids()) != num_expected) or (not streamers1.validate_io_ids())):
+        tests['livestreams1'] = False
+
+    # livestreams 2: -> the async pipeline adds the same streamers in the same order
+    streamers2 = asyncio.run(scraper.compile_streamers_db_async(Streamers(), 9999999, 4))
+    if (list(streamers1.get_ids()) != list(streamers2.get_ids())):
+        tests['livestreams2'] = False
+
+    # followers 0: -> a snapshot shares the follower refresh queue of the collection it was taken from, instead of building its own
+    streamers1.build_follower_refresh_queue()
+    snapshot = streamers1.snapshot()
+    queue = snapshot.follower_refresh_queue
+    ids = snapshot.get_next_ids_with_missing_follower_data(9999999)
+    if ((queue == False) or (snapshot.follower_refresh_queue is not queue) or (sorted(ids) != streamers1.get_ids_with_missing_follower_data())):
+        tests['followers0'] = False
+
+    # followers 1: -> asking again uses the same queue (instead of rescanning every streamer), streamers that were given a
+    #    follower count leave it, and applying the snapshot's changes updates the original's queue too
+    for streamer_id in ids[:10]:
+        snapshot.add_follower_data(streamer_id, 100)
+    if ((snapshot.get_next_ids_with_missing_follower_data(9999999) != ids[10:]) or (snapshot.follower_refresh_queue is not queue)):
+        tests['followers1'] = False
+    streamers1.apply_changes(snapshot.get_changes())
+    if (streamers1.get_next_ids_with_missing_follower_data(9999999) != ids[10:]):
+        tests['followers1'] = False
+
+    # shards 0: -> exporting and loading shards does not change info
+    folderpath = './test/streamers'
+    streamers1.num_streamers_per_file = 50
+    streamers1.export_to_csv(folderpath)
+    streamers2 = Streamers(folderpath)
+    if ((not streamers1.check_if_streamer_collection_same(streamers2)) or (len(load_streamers_manifest(folderpath)['shards']) < 2)):
+        tests['shards0'] = False
+
+    # shards 1: -> exporting again only rewrites the shard of the streamer that changed
+    old_shards = load_streamers_manifest(folderpath)['shards']
+    streamers2.add_follower_data(streamers2.io_to_streamer_lookup[1], 1)
+    streamers2.export_to_csv(folderpath)
+    for shard, info in load_streamers_manifest(folderpath)['shards'].items():
+        if ((info['filename'] != old_shards[shard]['filename']) != (shard == '1')):
+            tests['shards1'] = False
+    if (not streamers2.check_if_streamer_collection_same(Streamers(folderpath))):
+        tests['shards1'] = False
+
+    # shards 2: -> loading and exporting shards in a process pool gives the same streamers, in the same io_id order
+    streamers3 = Streamers(folderpath, False, 2)
+    if ((not streamers2.check_if_streamer_collection_same(streamers3)) or (list(streamers2.streamers.keys()) != list(streamers3.streamers.keys()))):
+        tests['shards2'] = False
+    streamers3.export_to_csv('./test/streamers_parallel')
+    if (list(Streamers('./test/streamers_parallel').streamers.keys()) != list(streamers2.streamers.keys())):
+        tests['shards2'] = False
+
+    # shards 3: -> re-adding a stream that was already recorded doesn't mark its shard as needing to be exported again
+    streamers4 = Streamers(folderpath)
+    streamers4.add_stream_data(Stream(livestreams[0]))
+    if (streamers4.dirty_shards != set()):
+        tests['shards3'] = False
+    streamers4.add_stream_data(Stream(dict(livestreams[0], game_id='99999'))) # <- a game they haven't played yet
+    if (len(streamers4.dirty_shards) != 1):
+        tests['shards3'] = False
+
+    # cassette 0: -> record requests to the server, then replay them from a second server that only has the cassette
+    cassette_file = './test/cassette.json'
+    recorder = RecordingTransport()
+    recorder.get(server.get_url() + '/helix/streams', params={'first': '100'})
+    recorder.get(server.get_url() + '/helix/streams', params={'first': '100', 'after': '100'})
+    recorder.post(server.get_url() + '/oauth2/token', params={'client_id': 'stand-in', 'client_secret': 'stand-in-secret'})
+    recorder.cassette.export_to_json(cassette_file)
+
+    replay_server = StandInServer([Cassette(cassette_file)]).start()
+    twitchAPI = TwitchAPI(offline_credentials['twitch'], False, StandInTransport(replay_server), 8, token_store)
+    page1, cursor = twitchAPI.get_livestreams()
+    page2, cursor = twitchAPI.get_livestreams(cursor)
+    if ((page1 != livestreams[:100]) or (page2 != livestreams[100:200])):
+        tests['cassette0'] = False
+
+    # cassette 1: -> secrets never make it into the cassette
+    with open(cassette_file) as f:
+        content = f.read()
+    if (('stand-in-secret' in content) or ('stand-in-token' in content)):
+        tests['cassette1'] = False
+
+    # cassette 2: -> every request was answered by a collection or a cassette
+    if ((len(server.misses) > 0) or (len(replay_server.misses) > 0)):
+        tests['cassette2'] = False
+
+    server.stop()
+    replay_server.stop()
+    for filename in [token_store.filename, token_store.filename + '.lock']:
+        if (os.path.exists(filename)):
+            os.remove(filename)
+    print_test_results(tests)
+
+
+# returns a tuple ([list of helix livestreams], [list of helix users]) sorted by viewer_count, like helix/streams returns them
+def get_stand_in_livestreams(n):
+    livestreams, users = [], []
+    languages = ['en', 'es', 'de', 'ko', 'ja']
+    for i in range(n):
+        user_id = str(50000 + i)
+        livestreams.append({
+            'id': str(1000 + i), 'user_id': user_id, 'user_name': 'streamer' + user_id, 'game_id': str(i % 37),
+            'type': 'live', 'title': 'stream ' + str(i), 'viewer_count': (n - i) // 40, 'language': languages[i % len(languages)],
+            'started_at': '2020-03-0' + str(i % 9 + 1) + 'T10:00:00Z', 'thumbnail_url': ''
+        })
+        users.append({
+            'id': user_id, 'login': 'streamer' + user_id, 'display_name': 'streamer' + user_id, 'type': '', 'broadcaster_type': '',
+            'description': '', 'profile_image_url': 'https://static-cdn.jtvnw.net/' + user_id + '.png', 'offline_image_url': '', 'view_count': i
+        })
+    return livestreams, users
+
+
+# ==============================================================================
+# Test Offline Games
+# ==============================================================================
+
+# runs the IGDB side of the scraper against a local StandInServer that answers IGDB queries
+def test_offline_games(credentials):
+    print_test_title("Offline Games")
+    test_names = [
+        'crawl0', 'crawl1', 'crawl2', 'crawl3',
+        'covers0', 'covers1',
+        'resolve0', 'resolve1', 'resolve2', 'resolve3', 'resolve4'
+    ]
+    tests = get_empty_test(test_names)
+
+    offline_credentials = {'twitch': {'client_id': 'stand-in', 'client_secret': 'stand-in-secret', 'v5_client_id': 'stand-in'}, 'igdb': 'stand-in'}
+    n = 2600
+    igdb_games, igdb_covers = get_stand_in_games(n)
+    server = StandInServer().start()
+    server.add_igdb_collection('/games', igdb_games)
+    server.add_igdb_collection('/covers', igdb_covers)
+
+    # -> uses its own TokenStore, so the stand-in tokens never end up in (or replace the real tokens in) ./tokens.json
+    token_store = TokenStore('./test/tokens.json')
+    scraper = Scraper(offline_credentials, 'testing', StandInTransport(server))
+    scraper.twitchAPI.token_store = token_store
+    scraper.set_print_mode(False)
+    scraper.games_checkpoint_every = 2
+    for filename in [scraper.filepaths['games'], scraper.filepaths['games_checkpoint'], scraper.filepaths['twitch_to_igdb']]:
+        if (os.path.exists(filename)):
+            os.remove(filename)
+
+    # crawl 0: -> a crawl that is interrupted has saved the games and the offset of its last checkpoint (every 2 pages of 500)
+    search_for_games = scraper.igdbAPI.search_for_games
+    def search_for_games_until_interrupted(offset = 0, updated_since = False):
+        if (offset >= 2500):
+            raise _CrawlInterrupted()
+        return search_for_games(offset, updated_since)
+    scraper.igdbAPI.search_for_games = search_for_games_until_interrupted
+    try:
+        scraper.compile_games_db(9999999, True)
+        tests['crawl0'] = False
+    except _CrawlInterrupted:
+        pass
+    del scraper.igdbAPI.search_for_games
+    checkpoint = load_games_checkpoint(scraper)
+    if ((checkpoint['offset'] != 2000) or (checkpoint['last_synced'] != False) or (sorted(Games(scraper.filepaths['games']).get_ids()) != list(range(1, 2001)))):
+        tests['crawl0'] = False
+
+    # crawl 1: -> resuming only requests the pages after the checkpoint, and ends up with every game exactly once
+    num_requests = server.counts['/games']
+    games = scraper.compile_games_db(9999999, True)
+    checkpoint = load_games_checkpoint(scraper)
+    if ((sorted(games.get_ids()) != list(range(1, n + 1))) or (server.counts['/games'] - num_requests != 3)):
+        tests['crawl1'] = False
+    if ((checkpoint['offset'] != 0) or (checkpoint['last_synced'] == False) or (games.get(1).igdb_box_art_url != 'https:' + igdb_covers[0]['url'])):
+        tests['crawl1'] = False
+
+    # crawl 2: -> once a crawl is complete, the next run only requests the games updated since it started
+    last_synced = checkpoint['last_synced']
+    for game in igdb_games[10:13]:
+        game['name'] += ' (Remastered)'
+        game['updated_at'] = last_synced + 1
+    igdb_games.append({'id': n + 100, 'name': 'Game ' + str(n + 100), 'updated_at': last_synced + 1})
+    igdb_covers.append({'id': n + 100, 'game': n + 100, 'url': '//images.igdb.com/igdb/image/upload/t_cover_big/co' + str(n + 100) + '.jpg'})
+    num_requests = server.counts['/games']
+    games = scraper.compile_games_db(9999999, True)
+    if ((server.counts['/games'] - num_requests != 2) or (len(games.get_ids()) != n + 1) or (games.get(11).name != 'Game 11 (Remastered)')):
+        tests['crawl2'] = False
+    if ((games.get(n + 100) == False) or (games.get(n + 100).igdb_box_art_url != 'https:' + igdb_covers[-1]['url'])):
+        tests['crawl2'] = False
+    if (load_games_checkpoint(scraper)['last_synced'] < last_synced):
+        tests['crawl2'] = False
+
+    # crawl 3: -> a failed request isn't mistaken for the end of IGDB, so the sync isn't saved as complete
+    checkpoint = load_games_checkpoint(scraper)
+    checkpoint['last_synced'] -= 60 # <- so a sync that is saved as complete (which sets it to when the sync started) changes it
+    with open(scraper.filepaths['games_checkpoint'], 'w') as f:
+        json.dump(checkpoint, f)
+    server.remove_collection('/games')
+    scraper.compile_games_db(9999999, True)
+    server.add_igdb_collection('/games', igdb_games)
+    if ((load_games_checkpoint(scraper)['last_synced'] != checkpoint['last_synced']) or (len(Games(scraper.filepaths['games']).get_ids()) != n + 1)):
+        tests['crawl3'] = False
+
+    # covers 0: -> looking up the covers of 250 games sends ceil(250 / 100) = 3 requests, and picks the largest cover for each game
+    igdbAPI = IGDBAPI('stand-in', StandInTransport(server), LRUCache())
+    game_ids = list(range(1, 251))
+    num_requests = server.counts['/covers']
+    covers = igdbAPI.search_for_game_covers_by_ids(game_ids)
+    if ((server.counts['/covers'] - num_requests != 3) or (sorted(covers.keys()) != game_ids)):
+        tests['covers0'] = False
+    if ((covers[5] != 'https://images.igdb.com/igdb/image/upload/t_cover_big/co5.jpg') or (covers[7] != '')):
+        tests['covers0'] = False
+
+    # covers 1: -> looking them up again is answered by the cover cache, without sending any requests
+    num_requests = server.counts['/covers']
+    if ((igdbAPI.search_for_game_covers_by_ids(game_ids) != covers) or (server.counts['/covers'] != num_requests)):
+        tests['covers1'] = False
+
+    # resolve 0: -> names that aren't exact matches resolve to the game that shares at least 75% of their tokens
+    games = Games()
+    for igdb_game_obj in [{'id': 1, 'name': 'Witcher 3: Wild Hunt'}, {'id': 2, 'name': 'Grand Theft Auto V'}, {'id': 3, 'name': 'The Arena'}]:
+        games.add_new_game(igdb_game_obj)
+    twitch_to_igdb = TwitchToIGDB(games)
+    if ((twitch_to_igdb.resolve_name('The Witcher 3 - Wild Hunt') != 1) or (twitch_to_igdb.resolve_name('Witcher 3 Wild Hunt GOTY') != 1)):
+        tests['resolve0'] = False
+    if ((twitch_to_igdb.resolve_name('Witcher 3') != False) or (twitch_to_igdb.resolve_name('Grand Theft Auto 5') != False)):
+        tests['resolve0'] = False
+
+    # resolve 1: -> tokens shared by more than max_games_per_token games aren't used to find matches
+    if (twitch_to_igdb.resolve_name('Arena') != 3):
+        tests['resolve1'] = False
+    crowded_twitch_to_igdb = TwitchToIGDB(games)
+    for i in range(max_games_per_token):
+        crowded_twitch_to_igdb.add_game(Game({'id': 1000 + i, 'name': 'Arena ' + str(i)}))
+    if (crowded_twitch_to_igdb.resolve_name('Arena') != False):
+        tests['resolve1'] = False
+
+    # resolve 2: -> exporting and loading the lookup table doesn't change it
+    twitch_to_igdb.add_twitch_game(33, 'The Witcher 3: Wild Hunt')
+    twitch_to_igdb.add_resolved_name('Not A Real Game', 0)
+    twitch_to_igdb.export_to_csv(scraper.filepaths['twitch_to_igdb'])
+    loaded = TwitchToIGDB(False, scraper.filepaths['twitch_to_igdb'])
+    if ((loaded.twitch_ids != twitch_to_igdb.twitch_ids) or (loaded.twitch_names != twitch_to_igdb.twitch_names)):
+        tests['resolve2'] = False
+    os.remove(scraper.filepaths['twitch_to_igdb'])
+
+    # resolve 3: -> every game a streamer played is resolved, from games.csv first and then from IGDB
+    #    (Twitch game ids are named by helix/games). Names IGDB doesn't have are stored with igdb_id 0
+    server.add_collection('/helix/games', [{'id': '33', 'name': 'The Witcher 3: Wild Hunt'}, {'id': '44', 'name': 'Hades'}])
+    igdb_games += [{'id': 9001, 'name': 'Hades'}, {'id': 9002, 'name': 'Celeste'}]
+    streamers = Streamers()
+    streamers.add_or_update_streamer({'id': '50000', 'login': 'streamer', 'display_name': 'streamer', 'description': '', 'profile_image_url': '', 'view_count': 0})
+    stream = {'id': '1', 'user_id': '50000', 'language': 'en', 'title': '', 'started_at': '2020-03-01T10:00:00Z', 'created_at': '2020-03-01T10:00:00Z', 'viewer_count': 10, 'view_count': 10}
+    for game_id in ['33', '44']:
+        streamers.add_stream_data(Stream(dict(stream, game_id=game_id)))
+    for game_name in ['Grand Theft Auto V', 'Celeste', 'Not A Real Game']:
+        streamers.add_stream_data(Stream(dict(stream, game_name=game_name), False))
+    twitch_to_igdb = scraper.resolve_games_to_igdb(streamers, games)
+    resolved = [twitch_to_igdb.resolve(game_key) for game_key in [33, 44, 'Grand Theft Auto V', 'Celeste', 'Not A Real Game']]
+    if ((resolved != [1, 9001, 2, 9002, False]) or (twitch_to_igdb.twitch_names.get(normalize_game_name('Not A Real Game')) != 0)):
+        tests['resolve3'] = False
+    if ((games.get(9001) == False) or (games.get(9002) == False)):
+        tests['resolve3'] = False
+
+    # resolve 4: -> resolving again with the saved lookup table doesn't send any requests, not even for the name IGDB didn't have
+    twitch_to_igdb.export_to_csv(scraper.filepaths['twitch_to_igdb'])
+    num_requests = (server.counts['/games'], server.counts['/helix/games'])
+    twitch_to_igdb = scraper.resolve_games_to_igdb(streamers, games)
+    if (((server.counts['/games'], server.counts['/helix/games']) != num_requests) or (twitch_to_igdb.resolve('Celeste') != 9002)):
+        tests['resolve4'] = False
+
+    server.stop()
+    for filename in [token_store.filename, token_store.filename + '.lock']:
+        if (os.path.exists(filename)):
+            os.remove(filename)
+    print_test_results(tests)
+
+
+# raised by test_offline_games() to interrupt a crawl
+class _CrawlInterrupted(Exception):
+    pass
+
+# returns the games checkpoint that scraper saved
+def load_games_checkpoint(scraper):
+    with open(scraper.filepaths['games_checkpoint']) as f:
+        return json.load(f)
+
+# returns a tuple ([list of IGDB games with ids 1 to n], [list of their IGDB covers])
+# -> every 7th game doesn't have a cover, and every 5th has two (the larger one is the one that should be picked)
+def get_stand_in_games(n):
+    games, covers = [], []
+    for i in range(1, n + 1):
+        games.append({'id': i, 'name': 'Game ' + str(i), 'updated_at': 0, 'genres': [i % 20], 'first_release_date': 1262304000 + i})
+        if (i % 7 == 0):
+            continue
+        covers.append({'id': i, 'game': i, 'url': '//images.igdb.com/igdb/image/upload/t_cover_big/co' + str(i) + '.jpg', 'width': 264, 'height': 374})
+        if (i % 5 == 0):
+            covers.append({'id': n + i, 'game': i, 'url': '//images.igdb.com/igdb/image/upload/t_thumb/co' + str(i) + '.jpg', 'width': 90, 'height': 128})
+    return games, covers
+
+
+# ==============================================================================
+# Test Memory
+# ==============================================================================
+
+# benchmarks the memory used per Streamer and per Stream
+# -> compares them against objects that hold the same values in a __dict__ (like Streamer and Stream used to)
+def test_memory(credentials):
+    print_test_title("Memory")
+    test_names = ['streamer0', 'stream0', 'history0', 'intern0', 'intern1']
+    tests = get_empty_test(test_names)
+    n = 2000
+
+    livestreams, users = get_stand_in_livestreams(n)
+    streams = [Stream(livestream) for livestream in livestreams]
+
+    # build the collection while tracing, to get the memory used per streamer
+    tracemalloc.start()
+    start_size = tracemalloc.get_traced_memory()[0]
+    streamers = Streamers()
+    for user in users:
+        user['language'] = livestreams[int(user['id']) - 50000]['language']
+        streamers.add_or_update_streamer(user)
+    for stream in streams:
+        streamers.add_stream_data(stream)
+    bytes_per_streamer = (tracemalloc.get_traced_memory()[0] - start_size) / n
+
+    # streamer 0: -> a Streamer (and its timestamps) takes less memory than the same values in __dict__s
+    slotted_size = get_traced_size(lambda: [copy_to_object(streamer, Streamer.__new__(Streamer), True) for streamer in streamers.streamers.values()])
+    dict_size    = get_traced_size(lambda: [copy_to_object(streamer, _DictBackedObject(), True) for streamer in streamers.streamers.values()])
+    if (slotted_size >= dict_size):
+        tests['streamer0'] = False
+
+    # stream 0: -> same for Streams
+    slotted_stream_size = get_traced_size(lambda: [copy_to_object(stream, Stream.__new__(Stream)) for stream in streams])
+    dict_stream_size    = get_traced_size(lambda: [copy_to_object(stream, _DictBackedObject()) for stream in streams])
+    if (slotted_stream_size >= dict_stream_size):
+        tests['stream0'] = False
+
+    # history 0: -> a stream_history of GameHistory objects takes less memory than its dict form
+    for stream in streams:
+        stream.date -= 60 * 60 * 24 # <- a second day of livestreams, so every game has more than one date
+        streamers.add_stream_data(stream)
+    history_size      = get_traced_size(lambda: [{game: history.copy() for game, history in streamer.stream_history.items()} for streamer in streamers.streamers.values()])
+    dict_history_size = get_traced_size(lambda: [{game: history.to_dict() for game, history in streamer.stream_history.items()} for streamer in streamers.streamers.values()])
+    if (history_size >= dict_history_size):
+        tests['history0'] = False
+    tracemalloc.stop()
+
+    print('bytes per streamer:', round(bytes_per_streamer), '(all data)')
+    print('bytes per streamer object:', round(slotted_size / n), 'vs', round(dict_size / n), 'with __dict__s')
+    print('bytes per stream object:', round(slotted_stream_size / n), 'vs', round(dict_stream_size / n), 'with a __dict__')
+    print('bytes per stream_history:', round(history_size / n), 'vs', round(dict_history_size / n), 'as dicts')
+
+    # intern 0: -> every streamer with the same language shares one copy of it
+    languages = set([streamer.language for streamer in streamers.streamers.values()])
+    if (len(set([id(streamer.language) for streamer in streamers.streamers.values()])) != len(languages)):
+        tests['intern0'] = False
+
+    # intern 1: -> that is still true after loading the streamers from a file
+    folderpath = './test/streamers'
+    streamers.export_to_csv(folderpath)
+    loaded = Streamers(folderpath)
+    if (len(set([id(streamer.language) for streamer in loaded.streamers.values()])) != len(languages)):
+        tests['intern1'] = False
+
+    print_test_results(tests)
+
+
+# stands in for the __dict__ based Streamer and Stream objects in test_memory()
+class _DictBackedObject():
+    pass
+
+# sets every slot of obj on new_obj (and copies timestamps into a dict), then returns new_obj
+def copy_to_object(obj, new_obj, copy_timestamps = False):
+    for field in obj.__slots__:
+        setattr(new_obj, field, getattr(obj, field))
+    if (copy_timestamps):
+        new_obj.timestamps = obj.timestamps.copy() if (isinstance(new_obj, Streamer)) else obj.timestamps.to_dict()
+    return new_obj
+
+# returns the number of bytes allocated by function() that are still held by what it returns
+def get_traced_size(function):
+    start_size = tracemalloc.get_traced_memory()[0]
+    result = function()
+    size = tracemalloc.get_traced_memory()[0] - start_size
+    del result
+    return size
+
+
 # ==============================================================================
 # Main Functions
 # ==============================================================================
@@ -740,6 +1212,12 @@ def main():
         test_add_videos(credentials)
     if ((len(testing) == 0) or ("Merge Streamers" in testing)):
         test_merge_streamers(credentials)
+    if ((len(testing) == 0) or ("Offline" in testing)):
+        test_offline(credentials)
+    if ((len(testing) == 0) or ("Offline Games" in testing)):
+        test_offline_games(credentials)
+    if ((len(testing) == 0) or ("Memory" in testing)):
+        test_memory(credentials)
 
 
 # Run --------------------------------------------------------------------------